@@ -12,5 +12,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DDI_backend_final.settings')
+# a serving process: start the DDI background threads (see settings)
+os.environ.setdefault('DDI_BACKGROUND_THREADS', '1')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# after get_asgi_application(): the apps are loaded
+from interactions.async_views import lifespan  # noqa: E402
+
+
+async def application(scope, receive, send):
+    # lifespan: lets the server close the DDI backend's connections at shutdown
+    if scope["type"] == "lifespan":
+        await lifespan(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,109 @@
+# DDI_backend_final/listing.py
+"""
+Opt-in cursor pagination and sparse fieldsets for the list endpoints
+(patients, medications, notifications).
+
+Query parameters:
+  page_size=N     paginate: {"next", "previous", "results"}, newest first
+  cursor=...      the opaque position from a previous page's next/previous link
+  fields=a,b      only these fields (plus id)
+  expand=x        include an expandable field (PatientSerializer: medications)
+
+Requests without any of them get the old response (every field, no
+pagination), so existing clients keep working. Requests that use them, and
+a view's lightweight_actions (e.g. patient search), get lightweight rows:
+expandable fields are left out unless asked for.
+Pages are keyed on the id, so rows inserted meanwhile don't shift or repeat
+the ones already read.
+"""
+import os
+from typing import Iterable, List, Sequence, Set
+
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import SAFE_METHODS
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "50"))
+LIST_MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "200"))
+
+LIST_PARAMS = ("cursor", "page_size", "fields", "expand")
+
+
+class OptInCursorPagination(CursorPagination):
+    """CursorPagination that only kicks in when the request asks for a page."""
+    ordering = "-id"
+    page_size = LIST_PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = LIST_MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+# -----------------------------------------------------------------------------
+# Sparse fieldsets
+# -----------------------------------------------------------------------------
+def _names(params, param: str) -> Set[str]:
+    return {name.strip() for value in params.getlist(param) for name in value.split(",") if name.strip()}
+
+
+def visible_fields(request, declared: Iterable[str], expandable: Sequence[str] = (),
+                   lightweight: bool = False) -> List[str]:
+    """The declared fields this request should get back."""
+    declared = list(declared)
+    if request is None or request.method not in SAFE_METHODS:
+        return declared
+    params = request.query_params
+    if not lightweight and not any(param in params for param in LIST_PARAMS):
+        return declared
+    fields, expand = _names(params, "fields"), _names(params, "expand")
+    return [
+        name for name in declared
+        if name in expand or name in fields
+        or (name not in expandable and (not fields or name == "id"))
+    ]
+
+
+class SparseFieldsetSerializerMixin:
+    """Drops the fields visible_fields() leaves out; set Meta.expandable for opt-in fields."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expandable = getattr(self.Meta, "expandable", ())
+        keep = set(visible_fields(self.context.get("request"), self.fields, expandable,
+                                  lightweight=self.context.get("lightweight", False)))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+
+class ListingViewMixin:
+    """Opt-in pagination, plus helpers to load only what the serializer will show."""
+    pagination_class = OptInCursorPagination
+    # actions that always get lightweight rows
+    lightweight_actions: Sequence[str] = ()
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["lightweight"] = self.action in self.lightweight_actions
+        return context
+
+    def visible_fields(self) -> List[str]:
+        meta = self.get_serializer_class().Meta
+        return visible_fields(self.request, meta.fields, getattr(meta, "expandable", ()),
+                              lightweight=self.action in self.lightweight_actions)
+
+    def includes(self, name: str) -> bool:
+        return name in self.visible_fields()
+
+    def only_visible(self, queryset):
+        """Defers the columns in the serializer's Meta.deferrable (long free text) that won't be shown."""
+        visible = set(self.visible_fields())
+        deferrable = getattr(self.get_serializer_class().Meta, "deferrable", ())
+        deferred = [name for name in deferrable if name not in visible]
+        return queryset.defer(*deferred) if deferred else queryset
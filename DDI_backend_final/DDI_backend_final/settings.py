@@ -36,6 +36,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "django.contrib.sites",
+    "django.contrib.postgres",  # trigram lookups for patient search
 
     "corsheaders",
     "rest_framework",
@@ -61,7 +62,7 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    "whitenoise.middleware.WhiteNoiseMiddleware",  # Add Whitenoise for static files
+    "DDI_backend_final.middleware.AsyncWhiteNoiseMiddleware",  # Whitenoise for static files (ASGI-capable)
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -111,6 +112,23 @@ else:
         }
     }
 
+# Cache: per-process memory by default. Set REDIS_URL to share it between
+# gunicorn workers (login lockouts, cross-worker DDI request coalescing).
+REDIS_URL = os.getenv("REDIS_URL")
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
+# Background threads of the DDI pipeline (keep-warm scheduler, Space endpoint
+# discovery) only belong in serving processes: wsgi.py and asgi.py turn them
+# on, manage.py commands (migrate, shell, tests...) leave them off. Set
+# DDI_BACKGROUND_THREADS=1 to get them under `manage.py runserver`.
+DDI_BACKGROUND_THREADS = os.getenv("DDI_BACKGROUND_THREADS", "0") == "1"
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator", "OPTIONS": {"min_length": 12}},
@@ -156,9 +174,26 @@ LOGGING = {
             'level': 'DEBUG',
             'propagate': False,
         },
+        # HF clients are built with verbose=False and never print; keep their
+        # (and their HTTP stack's per-request) logging to warnings and up
         'gradio_client': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'httpx': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'httpcore': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'huggingface_hub': {
+            'handlers': ['console'],
+            'level': 'WARNING',
             'propagate': False,
         },
     },
@@ -229,11 +264,11 @@ FRONTEND_ORIGIN = os.getenv("FRONTEND_ORIGIN", "http://localhost:5173")
 # CORS settings
 CORS_ALLOWED_ORIGINS = [origin.rstrip('/') for origin in os.getenv("CORS_ALLOWED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3000,http://127.0.0.1:3000").split(",")]
 CORS_ALLOW_CREDENTIALS = True
+# Let the frontend read DDI cache diagnostics
+CORS_EXPOSE_HEADERS = ["X-DDI-Cache", "X-DDI-Cache-Source", "X-DDI-Cache-State", "Server-Timing", "X-Dashboard-Cache"]
 
 # CSRF settings
 CSRF_TRUSTED_ORIGINS = os.getenv("CSRF_TRUSTED_ORIGINS", "http://localhost:5173,http://127.0.0.1:5173,http://localhost:3000,http://127.0.0.1:3000").split(",")
 
-# HF Spaces config used by your DDI endpoints
+# HF Spaces token used by your DDI endpoints (Space URLs: interactions/gateway.py)
 HF_TOKEN = os.getenv("HF_TOKEN", "")
-HF_SPACE_FREDA   = os.getenv("HF_SPACE_FREDA",   "Fredaaaaaa/smilesssssss")
-HF_SPACE_BERNICE = os.getenv("HF_SPACE_BERNICE", "Bernice775/t5-ddi-api")
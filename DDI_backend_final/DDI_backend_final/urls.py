@@ -36,7 +36,15 @@ from accounts.passkeys import (
 )
 
 # DDI
-from interactions.views import DDICheckView, AdminDashboardView
+from interactions.views import (
+    DDICheckView, DDIBatchCheckView, AdminDashboardView,
+    DDIJobCreateView, DDIJobDetailView, DDIJobStreamView, DDIStatusView,
+    DDI_CHECK_IMPL,
+)
+if DDI_CHECK_IMPL == "async":
+    from interactions.async_views import ddi_check_async as ddi_check_view
+else:
+    ddi_check_view = DDICheckView.as_view()
 from notifications.views import NotificationViewSet
 router = DefaultRouter()
 router.register(r"patients", PatientViewSet, basename="patients")
@@ -44,6 +52,7 @@ router.register(r"medications", MedicationViewSet, basename="medications")
 router.register(r"notifications", NotificationViewSet, basename="notifications")
 # ---- ViewSet aliases for pharmacist UI (same handlers, different prefixes) ----
 patient_list = PatientViewSet.as_view({"get": "list", "post": "create"})
+patient_search = PatientViewSet.as_view({"get": "search"})
 patient_detail = PatientViewSet.as_view({
     "get": "retrieve", "put": "update", "patch": "partial_update", "delete": "destroy"
 })
@@ -86,13 +95,19 @@ urlpatterns = [
 
     # ----- Pharmacist aliases (to satisfy existing frontend calls) -----
     path("api/pharmacist/patients/", patient_list),
+    path("api/pharmacist/patients/search/", patient_search),
     path("api/pharmacist/patient/<int:pk>/", patient_detail),
 
     path("api/pharmacist/drugs/", med_list),
     path("api/pharmacist/drugs/<int:pk>/", med_detail),
 
     # ----- DDI -----
-    path("api/ddi/check/", DDICheckView.as_view()),
+    path("api/ddi/check/", ddi_check_view),
+    path("api/ddi/batch/", DDIBatchCheckView.as_view()),
+    path("api/ddi/jobs/", DDIJobCreateView.as_view()),
+    path("api/ddi/jobs/<uuid:job_id>/", DDIJobDetailView.as_view()),
+    path("api/ddi/jobs/<uuid:job_id>/stream/", DDIJobStreamView.as_view()),
+    path("api/ddi/status/", DDIStatusView.as_view()),
 
     # ----- Admin Dashboard -----
     path("api/admin/dashboard/", AdminDashboardView.as_view()),
@@ -12,5 +12,7 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'DDI_backend_final.settings')
+# a serving process: start the DDI background threads (see settings)
+os.environ.setdefault('DDI_BACKGROUND_THREADS', '1')
 
 application = get_wsgi_application()
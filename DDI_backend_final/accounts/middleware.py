@@ -2,19 +2,18 @@
 import time
 from django.contrib.auth import logout
 from django.http import HttpResponseForbidden
+from django.utils.deprecation import MiddlewareMixin
 
 IDLE_TIMEOUT_SECONDS = 15 * 60  # 15 minutes
-class AdminSuperuserOnlyMiddleware:
+class AdminSuperuserOnlyMiddleware(MiddlewareMixin):
     """
     Blocks access to /admin/* for anyone who isn't a superuser or admin.
     - Anonymous users can still see the admin login page, but once they log in
       as a non-superuser/non-admin they'll get blocked immediately.
     - Superusers and admin role users proceed as normal.
+    (MiddlewareMixin keeps it usable in async request chains.)
     """
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
+    def process_request(self, request):
         path = request.path or ""
         if path.startswith("/admin/"):
             user = getattr(request, "user", None)
@@ -23,16 +22,13 @@ class AdminSuperuserOnlyMiddleware:
                 # Allow superusers and admin role users
                 if not (user.is_superuser or getattr(user, 'role', None) == 'ADMIN'):
                     return HttpResponseForbidden("Admin site is restricted to superusers and admins.")
-        return self.get_response(request)
-class IdleSessionTimeoutMiddleware:
+        return None
+class IdleSessionTimeoutMiddleware(MiddlewareMixin):
     """
     Logs out authenticated users after IDLE_TIMEOUT_SECONDS of inactivity.
     Works with session auth and JWT-backed views that still use request.user.
     """
-    def __init__(self, get_response):
-        self.get_response = get_response
-
-    def __call__(self, request):
+    def process_request(self, request):
         if request.user.is_authenticated:
             now = int(time.time())
             last = request.session.get("last_activity", now)
@@ -41,4 +37,4 @@ class IdleSessionTimeoutMiddleware:
                 # Optionally clear session entirely:
                 # request.session.flush()
             request.session["last_activity"] = now
-        return self.get_response(request)
+        return None
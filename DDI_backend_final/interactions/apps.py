@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class InteractionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'interactions'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import signals  # noqa: F401  (dashboard cache invalidation)
+        # Serving processes only (settings.DDI_BACKGROUND_THREADS)
+        if not settings.DDI_BACKGROUND_THREADS:
+            return
+        # No-op unless DDI_KEEPWARM_INTERVAL_S > 0
+        from .keepwarm import start_background_scheduler
+        start_background_scheduler()
+        # Resolve each Space's endpoint signature once, off the request path
+        from .gateway import start_discovery
+        start_discovery()
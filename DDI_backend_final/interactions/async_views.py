@@ -0,0 +1,173 @@
+# interactions/async_views.py
+"""
+Native async DDI check (DDI_CHECK_IMPL=async).
+
+Calls the Spaces through the gateway's async path (InferenceGateway.acall
+on the configured backend's acall), so a process under an ASGI server holds
+many slow checks on a single loop instead of a thread each: the http and
+fake backends are natively async, gradio calls still take a worker thread.
+Signatures, targets, breakers, adaptive timeouts, hedging and the deadline
+are the gateway's; caching works as in the sync path (interactions.views)
+and so does the Server-Timing header. Coalescing of identical checks is
+per process here, without the cross-worker lock.
+"""
+import json
+import time
+import asyncio
+import logging
+import weakref
+from concurrent.futures import Future
+from typing import Any, Dict, Tuple
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from . import timing
+from .backends import aclose_backend
+from .cache import result_cache
+from .gateway import gateway
+from .utils import pair_key
+from .views import (
+    DDI_MODEL_VERSION,
+    _both_models_failed, _cached_result, _collect_pair, _log_check,
+    _pair_payload, _parse_pair_payload, _set_cache_headers,
+)
+
+logger = logging.getLogger(__name__)
+
+# Identical checks in flight, per event loop
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Task]]" = weakref.WeakKeyDictionary()
+
+# -----------------------------------------------------------------------------
+# Pair pipeline
+# -----------------------------------------------------------------------------
+def _settled(value: Any) -> Future:
+    """Wraps an asyncio.gather outcome so views._collect_pair can map it."""
+    future: Future = Future()
+    if isinstance(value, BaseException):
+        future.set_exception(value)
+    else:
+        future.set_result(value)
+    return future
+
+async def _acompute_pair(user, drug1: str, drug2: str) -> Tuple[Dict[str, str], str, str]:
+    with timing.span("cache"):
+        failed = await sync_to_async(result_cache.get_failure)(drug1, drug2, DDI_MODEL_VERSION)
+    if failed is not None:
+        await sync_to_async(_log_check)(user, drug1, drug2, failed["result"], status=failed["status"],
+                                        error_message=failed["error_message"], cache_source="negative")
+        return failed["result"], failed["status"], "negative"
+
+    if not gateway.spaces_available():
+        stale = await sync_to_async(result_cache.last_known)(drug1, drug2, DDI_MODEL_VERSION)
+        if stale is not None:
+            await sync_to_async(_log_check)(user, drug1, drug2, stale, status="success", cache_source="stale")
+            return stale, "success", "stale"
+
+    freda, bernice = await asyncio.gather(
+        gateway.aseverity(drug1, drug2),
+        gateway.adetails(drug1, drug2),
+        return_exceptions=True,
+    )
+    result, check_status, error_msg = await sync_to_async(_collect_pair)((_settled(freda), _settled(bernice)))
+    await sync_to_async(_log_check)(user, drug1, drug2, result, status=check_status, error_message=error_msg)
+    if check_status == 'success':
+        result_cache.set(drug1, drug2, DDI_MODEL_VERSION, result)
+    elif _both_models_failed(result):
+        await sync_to_async(result_cache.set_failure)(
+            drug1, drug2, DDI_MODEL_VERSION, result, check_status, error_msg
+        )
+    return result, check_status, ""
+
+async def _afinish_pair(user, drug1: str, drug2: str) -> Tuple[Dict[str, str], str, str]:
+    """Identical checks in flight on this loop share one computation (see views._finish_pair)."""
+    key = f"{pair_key(drug1, drug2)}|{DDI_MODEL_VERSION}"
+    flights = _inflight.setdefault(asyncio.get_running_loop(), {})
+    task = flights.get(key)
+    if task is not None:
+        started = time.perf_counter()
+        result, check_status, _ = await asyncio.shield(task)
+        timing.add("coalesce", time.perf_counter() - started)
+        await sync_to_async(_log_check)(user, drug1, drug2, result, status=check_status, cache_source="coalesced")
+        return result, check_status, "coalesced"
+
+    task = flights[key] = asyncio.ensure_future(_acompute_pair(user, drug1, drug2))
+    task.add_done_callback(lambda _: flights.pop(key, None))
+    # shielded: a client disconnecting must not cancel a call others may share
+    return await asyncio.shield(task)
+
+# -----------------------------------------------------------------------------
+# View
+# -----------------------------------------------------------------------------
+def _authenticate(request):
+    """Runs DRF's configured authenticators, like DDICheckView (AllowAny) would."""
+    drf_request = Request(request, authenticators=[a() for a in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    user = drf_request.user
+    return user if user.is_authenticated else None
+
+@csrf_exempt
+async def ddi_check_async(request):
+    """
+    Same contract as DDICheckView:
+      POST { "drug1": "...", "drug2": "..." }  or  { "selected_pair": "drug A, drug B" }
+    """
+    if request.method != "POST":
+        return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+    try:
+        user = await sync_to_async(_authenticate)(request)
+    except exceptions.APIException as e:
+        detail = e.detail if isinstance(e.detail, (dict, list)) else {"detail": e.detail}
+        return JsonResponse(detail, status=e.status_code, safe=False)
+    try:
+        payload = json.loads(request.body or b"{}")
+        if not isinstance(payload, dict):
+            raise ValueError("expected a JSON object")
+    except ValueError as e:
+        return JsonResponse({"detail": f"JSON parse error - {e}"}, status=400)
+    try:
+        d1, d2 = _parse_pair_payload(payload)
+    except exceptions.ValidationError as e:
+        return JsonResponse(e.detail, status=400, safe=False)
+
+    with timing.record() as timings:
+        response = await _acheck(user, d1, d2)
+    response["Server-Timing"] = timings.server_timing()
+    return response
+
+async def _acheck(user, d1: str, d2: str) -> JsonResponse:
+    with timing.span("cache"):
+        cached, source, refreshing = await sync_to_async(_cached_result)(d1, d2)
+    if cached is not None:
+        await sync_to_async(_log_check)(user, d1, d2, cached, status="success", cache_source=source)
+        return _set_cache_headers(
+            JsonResponse(_pair_payload(d1, d2, cached)), cache_status="HIT", cache_source=source,
+            cache_state="refreshing" if refreshing else "fresh",
+        )
+
+    result, _, source = await _afinish_pair(user, d1, d2)
+    response = JsonResponse(_pair_payload(d1, d2, result))
+    if source:
+        return _set_cache_headers(response, cache_status=source.upper(), cache_source=source,
+                                  cache_state="stale" if source == "stale" else "")
+    return _set_cache_headers(response, cache_status="MISS")
+
+# -----------------------------------------------------------------------------
+# ASGI lifespan (see asgi.py): Django's handler only speaks HTTP
+# -----------------------------------------------------------------------------
+async def lifespan(scope, receive, send) -> None:
+    """Answers the server's startup/shutdown events; closes the backend's connections at shutdown."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            try:
+                await aclose_backend()
+            except Exception:
+                logger.exception("Closing the DDI backend's connections failed")
+            await send({"type": "lifespan.shutdown.complete"})
+            return
@@ -0,0 +1,532 @@
+# interactions/backends.py
+"""
+Pluggable model backends: the one place a Space endpoint actually gets
+called. Everything above it (retries, breakers, adaptive timeouts, caching,
+coalescing) stays the same whichever backend is selected with
+DDI_MODEL_BACKEND:
+
+  gradio  gradio_client against the real Spaces (default)
+  http    Gradio's REST API over plain httpx; works against the real Spaces
+          and against `manage.py ddi_fake_space`
+  fake    in-process simulation with configurable latency/error rates,
+          for offline development, tests and load tests
+
+Each backend also has an async call (acall) for the async check view: http
+and fake are natively async, gradio runs its blocking call on a thread.
+"""
+import os
+import json
+import math
+import time
+import random
+import socket
+import asyncio
+import hashlib
+import logging
+import threading
+import weakref
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from . import timing
+from .client_pool import HF_TOKEN, client_pool
+from .utils import canonical_pair, repo_to_url
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+DDI_MODEL_BACKEND = os.getenv("DDI_MODEL_BACKEND", "gradio").lower()
+
+# Fake backend / stand-in server: lognormal latency around the median,
+# failure and hang probabilities, and an optional seed for repeatable runs
+DDI_FAKE_LATENCY_MS    = float(os.getenv("DDI_FAKE_LATENCY_MS", "300"))
+DDI_FAKE_LATENCY_SIGMA = float(os.getenv("DDI_FAKE_LATENCY_SIGMA", "0.5"))
+DDI_FAKE_ERROR_RATE    = float(os.getenv("DDI_FAKE_ERROR_RATE", "0"))
+DDI_FAKE_TIMEOUT_RATE  = float(os.getenv("DDI_FAKE_TIMEOUT_RATE", "0"))
+DDI_FAKE_SEED          = os.getenv("DDI_FAKE_SEED")
+# Targets (URL or repo id, comma-separated) answering DDI_FAKE_COLD_FACTOR times slower
+DDI_FAKE_COLD_TARGETS  = [t.strip() for t in os.getenv("DDI_FAKE_COLD_TARGETS", "").split(",") if t.strip()]
+DDI_FAKE_COLD_FACTOR   = float(os.getenv("DDI_FAKE_COLD_FACTOR", "20"))
+
+# Connections per event loop for HttpBackend.acall
+DDI_ASYNC_MAX_CONNECTIONS = int(os.getenv("DDI_ASYNC_MAX_CONNECTIONS", "200"))
+
+# Gradio 5 serves the REST API under /gradio_api, Gradio 4 at the root
+CALL_PREFIXES = ("/gradio_api/call", "/call")
+INFO_PATHS    = ("/gradio_api/info", "/info")
+
+SEVERITY_APIS = ("/lambda", "/predict_interaction")
+DETAIL_APIS   = ("/run_interaction_check", "/generate_selected_pair_output")
+
+
+def space_base_url(target: str) -> str:
+    """'Owner/name' or URL -> base URL without a trailing slash."""
+    if target.startswith(("http://", "https://")):
+        return target.rstrip("/")
+    return repo_to_url(target) or f"https://{target}"
+
+
+def endpoints_from_api_info(info: Any) -> Dict[str, List[str]]:
+    """Gradio's API description (view_api / GET <prefix>/info) -> {api_name: [parameter names]}."""
+    named = (info or {}).get("named_endpoints") or {}
+    return {
+        api: [p.get("parameter_name") or p.get("label") or "" for p in (spec or {}).get("parameters", [])]
+        for api, spec in named.items()
+    }
+
+
+def parse_result_stream(lines: Iterable[str]) -> List[Any]:
+    """Reads Gradio's call-result SSE stream up to the complete/error event."""
+    event = None
+    for line in lines:
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:") and event in ("complete", "error"):
+            data = line[5:].strip()
+            if event == "error":
+                raise RuntimeError(f"Space error: {data if data and data != 'null' else 'unknown error'}")
+            return json.loads(data)
+    raise RuntimeError("Space closed the result stream without a result")
+
+
+async def aparse_result_stream(lines: AsyncIterable[str]) -> List[Any]:
+    """parse_result_stream for an async stream."""
+    event = None
+    async for line in lines:
+        if line.startswith("event:"):
+            event = line[6:].strip()
+        elif line.startswith("data:") and event in ("complete", "error"):
+            data = line[5:].strip()
+            if event == "error":
+                raise RuntimeError(f"Space error: {data if data and data != 'null' else 'unknown error'}")
+            return json.loads(data)
+    raise RuntimeError("Space closed the result stream without a result")
+
+
+class CallCancelled(RuntimeError):
+    pass
+
+
+class CancelToken:
+    """
+    Lets a caller abandon a call in flight (e.g. the losing side of a hedged
+    request). Backends register how to stop their own work with on_cancel().
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            try:
+                fn()
+            except Exception as e:
+                logger.debug("Cancel callback failed: %s", e)
+
+    def on_cancel(self, fn) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(fn)
+                return
+        fn()
+
+    def wait(self, timeout_s: Optional[float]) -> bool:
+        return self._event.wait(timeout_s)
+
+
+class ModelBackend:
+    """One prediction on one Space endpoint; raises on failure, timeout or cancellation."""
+
+    name = ""
+
+    def call(self, target: str, api_name: str, timeout_s: Optional[float], *,
+             cancel: Optional[CancelToken] = None, **kwargs) -> Any:
+        raise NotImplementedError
+
+    async def acall(self, target: str, api_name: str, timeout_s: Optional[float], **kwargs) -> Any:
+        """
+        call() for async callers; cancelling the awaiting task cancels the call.
+        By default the blocking call() runs on a worker thread.
+        """
+        cancel = CancelToken()
+        try:
+            return await sync_to_async(self.call, thread_sensitive=False)(
+                target, api_name, timeout_s, cancel=cancel, **kwargs
+            )
+        except asyncio.CancelledError:
+            cancel.cancel()
+            raise
+
+    async def aclose(self) -> None:
+        """Releases what acall() holds for the running event loop (at its shutdown)."""
+
+    def describe(self, target: str) -> Optional[Dict[str, List[str]]]:
+        """{api_name: [parameter names]} of the target's named endpoints; None if not known."""
+        return None
+
+    def connect(self, target: str) -> None:
+        """Sets up per-target state ahead of the first call; raises if unreachable."""
+
+    def invalidate(self, target: str, reason: Any = None) -> None:
+        """Called after a failed call; drop any per-target connection state."""
+
+
+class GradioBackend(ModelBackend):
+    name = "gradio"
+
+    def client(self, target: str):
+        """
+        Long-lived client from the shared pool. Construction (which also wakes a
+        cold Space) happens once per target, not on every attempt.
+
+        Pooled clients are built with verbose=False, so gradio never prints to
+        stdout (its '✔' banner crashed Windows consoles); anything else it has to
+        say goes through the 'gradio_client' logger configured in settings.
+        """
+        return client_pool.get(target)
+
+    # How often a cancellable (or timed) call checks whether it was abandoned
+    # and whether the Space has picked it up yet
+    CANCEL_POLL_S = 0.25
+
+    # Job states before the Space starts running the call
+    QUEUED_STATES = frozenset({"STARTING", "JOINING_QUEUE", "QUEUE_FULL", "IN_QUEUE", "SENDING_DATA"})
+
+    def call(self, target: str, api_name: str, timeout_s: Optional[float], *,
+             cancel: Optional[CancelToken] = None, **kwargs) -> Any:
+        # Queue API (submit) so cold starts and long inferences can be waited
+        # on with a timeout; don't leave abandoned jobs queued
+        with timing.span("client"):
+            client = self.client(target)
+        with timing.span("submit"):
+            job = client.submit(api_name=api_name, **kwargs)
+        if cancel is None and timing.current() is None:
+            try:
+                return job.result(timeout=timeout_s)
+            except TimeoutError:
+                job.cancel()
+                raise
+
+        if cancel is not None:
+            cancel.on_cancel(job.cancel)
+        started = time.monotonic()
+        ends_at = None if timeout_s is None else started + timeout_s
+        queued_s, running = 0.0, False
+        try:
+            while True:
+                step = self.CANCEL_POLL_S if ends_at is None else min(self.CANCEL_POLL_S, ends_at - time.monotonic())
+                try:
+                    return job.result(timeout=max(step, 0.0))
+                except TimeoutError:
+                    if not running:
+                        # queue wait lasts at least until the last poll that saw the job queued
+                        if job.status().code.name in self.QUEUED_STATES:
+                            queued_s = time.monotonic() - started
+                        else:
+                            running = True
+                    if cancel is not None and cancel.cancelled:
+                        raise CallCancelled(f"{api_name} on {target} cancelled") from None
+                    if ends_at is not None and time.monotonic() >= ends_at:
+                        job.cancel()
+                        raise
+        finally:
+            timing.add("queue", queued_s)
+            timing.add("inference", time.monotonic() - started - queued_s)
+
+    def describe(self, target: str) -> Optional[Dict[str, List[str]]]:
+        return endpoints_from_api_info(self.client(target).view_api(print_info=False, return_format="dict"))
+
+    def connect(self, target: str) -> None:
+        self.client(target)
+
+    def invalidate(self, target: str, reason: Any = None) -> None:
+        client_pool.invalidate(target, reason)
+
+
+def _abort_stream(response: httpx.Response) -> None:
+    """
+    Unblocks a read in progress on another thread: closing the response isn't
+    enough for sync httpx, shutting the socket down is.
+    """
+    network_stream = response.extensions.get("network_stream")
+    sock = network_stream.get_extra_info("socket") if network_stream is not None else None
+    if sock is not None:
+        sock.shutdown(socket.SHUT_RDWR)
+    else:
+        response.close()
+
+
+class HttpBackend(ModelBackend):
+    """
+    Gradio REST API: POST <prefix>/<api> {"data": [...]} -> event_id, then
+    GET <prefix>/<api>/<event_id> streams the result. Inputs are sent
+    positionally in keyword order.
+    """
+    name = "http"
+
+    def __init__(self):
+        self._headers = {"Authorization": f"Bearer {HF_TOKEN}"} if HF_TOKEN else {}
+        self._http = httpx.Client(headers=self._headers, follow_redirects=True, timeout=30.0)
+        # acall: one AsyncClient per event loop (they can't be shared across
+        # loops; under uvicorn there is one loop per process)
+        self._async_http: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._prefix: Dict[str, str] = {}  # base URL -> prefix that answered
+
+    def call(self, target: str, api_name: str, timeout_s: Optional[float], *,
+             cancel: Optional[CancelToken] = None, **kwargs) -> Any:
+        base = space_base_url(target)
+        name = api_name.lstrip("/")
+        started = time.monotonic()
+        prefixes = [self._prefix[base]] if base in self._prefix else list(CALL_PREFIXES)
+        with timing.span("submit"):
+            for prefix in prefixes:
+                r = self._http.post(f"{base}{prefix}/{name}", json={"data": list(kwargs.values())})
+                if r.status_code == 404 and prefix != prefixes[-1]:
+                    continue
+                r.raise_for_status()
+                self._prefix[base] = prefix
+                event_id = r.json()["event_id"]
+                break
+
+        remaining = None if timeout_s is None else max(0.1, timeout_s - (time.monotonic() - started))
+        try:
+            # the result stream doesn't say when the queue wait ends
+            with timing.span("inference"), \
+                    self._http.stream("GET", f"{base}{prefix}/{name}/{event_id}",
+                                      timeout=httpx.Timeout(30.0, read=remaining)) as stream:
+                stream.raise_for_status()
+                if cancel is not None:
+                    cancel.on_cancel(lambda: _abort_stream(stream))
+                out = parse_result_stream(stream.iter_lines())
+        except httpx.ReadTimeout:
+            raise TimeoutError(f"{api_name} on {target} timed out after {timeout_s:.0f}s") from None
+        except (httpx.HTTPError, RuntimeError):
+            if cancel is not None and cancel.cancelled:
+                raise CallCancelled(f"{api_name} on {target} cancelled") from None
+            raise
+        return out[0] if len(out) == 1 else out
+
+    def _ahttp(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_http.get(loop)
+        if client is None or client.is_closed:
+            client = self._async_http[loop] = httpx.AsyncClient(
+                headers=self._headers, follow_redirects=True, timeout=30.0,
+                limits=httpx.Limits(max_connections=DDI_ASYNC_MAX_CONNECTIONS,
+                                    max_keepalive_connections=DDI_ASYNC_MAX_CONNECTIONS),
+            )
+        return client
+
+    async def acall(self, target: str, api_name: str, timeout_s: Optional[float], **kwargs) -> Any:
+        base = space_base_url(target)
+        name = api_name.lstrip("/")
+        http = self._ahttp()
+        started = time.monotonic()
+        prefixes = [self._prefix[base]] if base in self._prefix else list(CALL_PREFIXES)
+        with timing.span("submit"):
+            for prefix in prefixes:
+                r = await http.post(f"{base}{prefix}/{name}", json={"data": list(kwargs.values())})
+                if r.status_code == 404 and prefix != prefixes[-1]:
+                    continue
+                r.raise_for_status()
+                self._prefix[base] = prefix
+                event_id = r.json()["event_id"]
+                break
+
+        remaining = None if timeout_s is None else max(0.1, timeout_s - (time.monotonic() - started))
+        try:
+            with timing.span("inference"):
+                async with http.stream("GET", f"{base}{prefix}/{name}/{event_id}",
+                                       timeout=httpx.Timeout(30.0, read=remaining)) as stream:
+                    stream.raise_for_status()
+                    out = await aparse_result_stream(stream.aiter_lines())
+        except httpx.ReadTimeout:
+            raise TimeoutError(f"{api_name} on {target} timed out after {timeout_s:.0f}s") from None
+        return out[0] if len(out) == 1 else out
+
+    async def aclose(self) -> None:
+        client = self._async_http.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def describe(self, target: str) -> Optional[Dict[str, List[str]]]:
+        base = space_base_url(target)
+        for path in INFO_PATHS:
+            r = self._http.get(f"{base}{path}")
+            if r.status_code == 404 and path != INFO_PATHS[-1]:
+                continue
+            r.raise_for_status()
+            return endpoints_from_api_info(r.json())
+        return None
+
+
+class FakeBackend(ModelBackend):
+    """
+    In-process stand-in. Latency is lognormal around DDI_FAKE_LATENCY_MS;
+    DDI_FAKE_ERROR_RATE of calls fail and DDI_FAKE_TIMEOUT_RATE hang until
+    their timeout. Results are derived from the drug pair, so the same pair
+    always gets the same answer. With DDI_FAKE_SEED set, the latency/failure
+    sequence for each (endpoint, input) is repeatable too. Targets listed in
+    DDI_FAKE_COLD_TARGETS are DDI_FAKE_COLD_FACTOR times slower, like a Space
+    route that has gone cold.
+    """
+    name = "fake"
+
+    # A hang without a caller timeout still has to end somewhere
+    HANG_S = 300.0
+
+    # What the real Spaces expose (see gateway.FREDA_SIGNATURES / BERNICE_SIGNATURES)
+    ENDPOINTS = {
+        "/lambda": ["x"],
+        "/run_interaction_check": ["drug_input"],
+    }
+
+    def __init__(self, latency_ms: float = DDI_FAKE_LATENCY_MS, sigma: float = DDI_FAKE_LATENCY_SIGMA,
+                 error_rate: float = DDI_FAKE_ERROR_RATE, timeout_rate: float = DDI_FAKE_TIMEOUT_RATE,
+                 seed: Optional[str] = DDI_FAKE_SEED, cold_targets: Iterable[str] = DDI_FAKE_COLD_TARGETS,
+                 cold_factor: float = DDI_FAKE_COLD_FACTOR):
+        self.latency_ms = latency_ms
+        self.cold_targets = set(cold_targets)
+        self.cold_factor = cold_factor
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.seed = seed
+        self._rng = random.Random()
+        self._calls: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+
+    def plan(self, api_name: str, value: str, target: str = "") -> Tuple[str, float]:
+        """('ok'|'error'|'hang', latency_s) for the next call of this endpoint/input on target."""
+        with self._lock:
+            if self.seed is None:
+                rng = self._rng
+                u, z = rng.random(), rng.gauss(0.0, 1.0)
+            else:
+                n = self._calls[(api_name, value)] = self._calls.get((api_name, value), 0) + 1
+                rng = random.Random(f"{self.seed}|{api_name}|{value}|{n}")
+                u, z = rng.random(), rng.gauss(0.0, 1.0)
+        latency_s = self.latency_ms / 1000.0 * math.exp(self.sigma * z)
+        if target in self.cold_targets:
+            latency_s *= self.cold_factor
+        if u < self.timeout_rate:
+            return "hang", self.HANG_S
+        if u < self.timeout_rate + self.error_rate:
+            return "error", latency_s
+        return "ok", latency_s
+
+    @staticmethod
+    def output(api_name: str, value: str) -> Any:
+        drugs = [d for d in (p.strip() for p in value.split(",")) if d]
+        a, b = canonical_pair(*(drugs + ["", ""])[:2])
+        digest = int(hashlib.sha1(f"{a}|{b}".encode()).hexdigest(), 16)
+        if api_name in SEVERITY_APIS:
+            return ("Minor", "Moderate", "Major")[digest % 3]
+        if api_name in DETAIL_APIS:
+            return (
+                f"Simulated interaction between {a} and {b}.",
+                f"Simulated explanation for {a} + {b} (fake backend).",
+                "Simulated recommendation: monitor the patient.",
+            )
+        if api_name == "/collect_drug_features":
+            return [[f"{a}, {b}"]]
+        raise ValueError(f"Fake backend has no endpoint {api_name}")
+
+    def describe(self, target: str) -> Optional[Dict[str, List[str]]]:
+        return {api: list(params) for api, params in self.ENDPOINTS.items()}
+
+    @classmethod
+    def api_info(cls) -> Dict[str, Any]:
+        """ENDPOINTS in the shape of Gradio's GET /info (served by ddi_fake_space)."""
+        return {
+            "named_endpoints": {
+                api: {"parameters": [{"parameter_name": p} for p in params]}
+                for api, params in cls.ENDPOINTS.items()
+            },
+            "unnamed_endpoints": {},
+        }
+
+    def call(self, target: str, api_name: str, timeout_s: Optional[float], *,
+             cancel: Optional[CancelToken] = None, **kwargs) -> Any:
+        value = str(next(iter(kwargs.values()), ""))
+        outcome, latency_s = self.plan(api_name, value, target)
+        wait = time.sleep if cancel is None else cancel.wait
+
+        def sleep(seconds: float):
+            with timing.span("inference"):
+                return wait(seconds)
+
+        if outcome == "hang" or (timeout_s is not None and latency_s > timeout_s):
+            waited = latency_s if timeout_s is None else min(latency_s, timeout_s)
+            if sleep(waited):
+                raise CallCancelled(f"{api_name} on {target} cancelled")
+            raise TimeoutError(f"{api_name} on {target} timed out after {waited:.0f}s")
+        if sleep(latency_s):
+            raise CallCancelled(f"{api_name} on {target} cancelled")
+        if outcome == "error":
+            raise RuntimeError(f"Simulated failure of {api_name} on {target}")
+        return self.output(api_name, value)
+
+    async def acall(self, target: str, api_name: str, timeout_s: Optional[float], **kwargs) -> Any:
+        value = str(next(iter(kwargs.values()), ""))
+        outcome, latency_s = self.plan(api_name, value, target)
+        if outcome == "hang" or (timeout_s is not None and latency_s > timeout_s):
+            waited = latency_s if timeout_s is None else min(latency_s, timeout_s)
+            with timing.span("inference"):
+                await asyncio.sleep(waited)
+            raise TimeoutError(f"{api_name} on {target} timed out after {waited:.0f}s")
+        with timing.span("inference"):
+            await asyncio.sleep(latency_s)
+        if outcome == "error":
+            raise RuntimeError(f"Simulated failure of {api_name} on {target}")
+        return self.output(api_name, value)
+
+
+BACKENDS = {cls.name: cls for cls in (GradioBackend, HttpBackend, FakeBackend)}
+
+_backend: Optional[ModelBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> ModelBackend:
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if DDI_MODEL_BACKEND not in BACKENDS:
+                    raise ValueError(
+                        f"Unknown DDI_MODEL_BACKEND {DDI_MODEL_BACKEND!r}; expected one of {sorted(BACKENDS)}"
+                    )
+                _backend = BACKENDS[DDI_MODEL_BACKEND]()
+                logger.info("DDI model backend: %s", _backend.name)
+    return _backend
+
+
+async def aclose_backend() -> None:
+    """Closes the backend's connections on the running event loop (ASGI lifespan shutdown)."""
+    if _backend is not None:
+        await _backend.aclose()
+
+
+def set_backend(backend: Optional[ModelBackend]) -> None:
+    """Swap the process-wide backend (tests, benchmarks); None resets to DDI_MODEL_BACKEND."""
+    global _backend
+    with _backend_lock:
+        _backend = backend
@@ -0,0 +1,338 @@
+# interactions/benchmark.py
+"""
+Load harness for the DDI endpoints (`manage.py ddi_benchmark`).
+
+Drives POST /api/ddi/check/ and /api/ddi/batch/ either in-process through
+the Django test client (DB query counts and model-pool saturation are
+measured) or against a live server over HTTP. Drug names are unique per run,
+so the cold workload really misses every cache tier, even on a live server
+with a persistent database.
+
+Workloads:
+  cold   every request is a pair nobody has checked
+  warm   a primed set of pairs, requested over and over
+  mixed  `hit_ratio` of requests from the warm set, the rest new pairs
+  batch  regimens of `batch_size` drugs: all but one from the warm set
+
+In-process runs also EXPLAIN the dashboard and cache lookup queries and
+report whether they use DDICheck's composite indexes.
+"""
+import re
+import time
+import queue
+import random
+import secrets
+import threading
+from datetime import timedelta
+from itertools import combinations
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from django.db import connection, connections, models, transaction
+from django.utils import timezone
+
+from .stats import percentiles
+
+CHECK_PATH = "/api/ddi/check/"
+BATCH_PATH = "/api/ddi/batch/"
+
+WORKLOADS = ("cold", "warm", "mixed", "batch")
+
+Request = Tuple[str, Dict[str, Any]]               # (path, JSON body)
+Outcome = Tuple[int, Dict[str, str], Optional[int]]  # (status, headers, DB queries)
+Sender = Callable[[str, Dict[str, Any]], Outcome]
+
+REPORTED_HEADERS = ("X-DDI-Cache", "X-DDI-Cache-Source", "X-DDI-Cache-State")
+
+
+# -----------------------------------------------------------------------------
+# Workloads
+# -----------------------------------------------------------------------------
+class WorkloadBuilder:
+    """Request lists for each workload; names carry a per-run tag."""
+
+    def __init__(self, requests: int, warm_pairs: int = 50, hit_ratio: float = 0.8,
+                 batch_size: int = 5, seed: Optional[int] = None):
+        self.requests = requests
+        self.hit_ratio = hit_ratio
+        self.batch_size = max(2, batch_size)
+        self.tag = secrets.token_hex(3)
+        self._rng = random.Random(seed)
+        self._fresh = 0
+
+        # Enough warm drugs that their pairs cover warm_pairs
+        n = 2
+        while n * (n - 1) // 2 < warm_pairs:
+            n += 1
+        self.warm_drugs = [f"bench{self.tag}w{i}" for i in range(max(n, self.batch_size))]
+        self.warm_set = list(combinations(self.warm_drugs, 2))[:warm_pairs]
+
+    def _new_drug(self) -> str:
+        self._fresh += 1
+        return f"bench{self.tag}n{self._fresh}"
+
+    @staticmethod
+    def _check(pair: Tuple[str, str]) -> Request:
+        return CHECK_PATH, {"drug1": pair[0], "drug2": pair[1]}
+
+    def prime(self) -> List[Request]:
+        """Requests that put the warm set into the caches (not measured)."""
+        return [self._check(pair) for pair in self.warm_set]
+
+    def build(self, workload: str) -> List[Request]:
+        if workload == "cold":
+            return [self._check((self._new_drug(), self._new_drug())) for _ in range(self.requests)]
+        if workload == "warm":
+            return [self._check(self.warm_set[i % len(self.warm_set)]) for i in range(self.requests)]
+        if workload == "mixed":
+            return [
+                self._check(self._rng.choice(self.warm_set) if self._rng.random() < self.hit_ratio
+                            else (self._new_drug(), self._new_drug()))
+                for _ in range(self.requests)
+            ]
+        if workload == "batch":
+            return [
+                (BATCH_PATH, {"drugs": self._rng.sample(self.warm_drugs, self.batch_size - 1) + [self._new_drug()]})
+                for _ in range(self.requests)
+            ]
+        raise ValueError(f"Unknown workload {workload!r}; expected one of {WORKLOADS}")
+
+
+# -----------------------------------------------------------------------------
+# Senders
+# -----------------------------------------------------------------------------
+def in_process_sender(user=None) -> Sender:
+    """Django test client per thread; counts the DB queries each request runs on its thread."""
+    from rest_framework.test import APIClient
+
+    local = threading.local()
+
+    def send(path: str, body: Dict[str, Any]) -> Outcome:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = APIClient()
+            if user is not None:
+                client.force_authenticate(user)
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            response = client.post(path, body, format="json")
+        return response.status_code, {h: response.get(h, "") for h in REPORTED_HEADERS}, queries
+
+    return send
+
+
+def http_sender(base_url: str, token: Optional[str] = None, timeout_s: float = 300.0) -> Sender:
+    """Live server over HTTP; DB query counts are not observable from here."""
+    import httpx
+
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    client = httpx.Client(base_url=base_url.rstrip("/"), headers=headers, timeout=timeout_s)
+
+    def send(path: str, body: Dict[str, Any]) -> Outcome:
+        try:
+            response = client.post(path, json=body)
+        except httpx.HTTPError:
+            return 0, {}, None
+        return response.status_code, {h: response.headers.get(h, "") for h in REPORTED_HEADERS}, None
+
+    return send
+
+
+# -----------------------------------------------------------------------------
+# Saturation
+# -----------------------------------------------------------------------------
+class SaturationSampler:
+    """
+    Samples the shared Freda/Bernice pool (views._model_pool) while a
+    workload runs: how many calls wait for a free worker, and how often any
+    do. Only meaningful in-process.
+    """
+
+    def __init__(self, interval_s: float = 0.01):
+        from .views import DDI_MODEL_WORKERS, _model_pool
+
+        self.workers = DDI_MODEL_WORKERS
+        self._pool = _model_pool
+        self.interval_s = interval_s
+        self._samples: List[int] = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="ddi-bench-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            # ThreadPoolExecutor has no public queue depth
+            self._samples.append(self._pool._work_queue.qsize())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def report(self) -> Dict[str, Any]:
+        samples = self._samples or [0]
+        return {
+            "model_workers": self.workers,
+            "max_queued_calls": max(samples),
+            "mean_queued_calls": round(sum(samples) / len(samples), 2),
+            "saturated_share": round(sum(1 for s in samples if s > 0) / len(samples), 4),
+        }
+
+
+# -----------------------------------------------------------------------------
+# Runner
+# -----------------------------------------------------------------------------
+def run_requests(requests: List[Request], send: Sender, concurrency: int) -> Dict[str, Any]:
+    """Sends every request with `concurrency` threads and summarises the outcomes."""
+    todo: "queue.Queue[Request]" = queue.Queue()
+    for r in requests:
+        todo.put(r)
+    latencies: List[float] = []
+    query_counts: List[int] = []
+    statuses: Dict[str, int] = {}
+    headers: Dict[str, Dict[str, int]] = {h: {} for h in REPORTED_HEADERS}
+    in_flight = max_in_flight = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal in_flight, max_in_flight
+        try:
+            while True:
+                try:
+                    path, body = todo.get_nowait()
+                except queue.Empty:
+                    return
+                with lock:
+                    in_flight += 1
+                    max_in_flight = max(max_in_flight, in_flight)
+                started = time.perf_counter()
+                status, response_headers, queries = send(path, body)
+                elapsed_ms = (time.perf_counter() - started) * 1000.0
+                with lock:
+                    in_flight -= 1
+                    latencies.append(elapsed_ms)
+                    statuses[str(status)] = statuses.get(str(status), 0) + 1
+                    if queries is not None:
+                        query_counts.append(queries)
+                    for h, value in response_headers.items():
+                        if value:
+                            headers[h][value] = headers[h].get(value, 0) + 1
+        finally:
+            # worker threads open their own DB connections
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, name=f"ddi-bench-{i}") for i in range(max(1, concurrency))]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall_s = time.perf_counter() - started
+
+    return {
+        "requests": len(requests),
+        "concurrency": concurrency,
+        "wall_s": round(wall_s, 3),
+        "throughput_rps": round(len(requests) / wall_s, 2) if wall_s else None,
+        "latency_ms": percentiles(latencies),
+        "status": statuses,
+        "cache": {h: counts for h, counts in headers.items() if counts},
+        "db_queries": {
+            "total": sum(query_counts),
+            "per_request": percentiles([float(q) for q in query_counts]),
+        } if query_counts else None,
+        "max_in_flight": max_in_flight,
+    }
+
+
+def run_workload(name: str, builder: WorkloadBuilder, send: Sender, concurrency: int,
+                 sample_saturation: bool = False) -> Dict[str, Any]:
+    requests = builder.build(name)
+    if not sample_saturation:
+        return dict(run_requests(requests, send, concurrency), workload=name, saturation=None)
+    with SaturationSampler() as sampler:
+        stats = run_requests(requests, send, concurrency)
+    return dict(stats, workload=name, saturation=sampler.report())
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-workload change in throughput and latency percentiles against an earlier report."""
+    before = {w["workload"]: w for w in baseline.get("workloads", [])}
+    rows = []
+    for w in current.get("workloads", []):
+        old = before.get(w["workload"])
+        if old is None:
+            continue
+        row = {"workload": w["workload"]}
+        for metric, new_value, old_value in (
+            ("throughput_rps", w["throughput_rps"], old["throughput_rps"]),
+            ("p50_ms", w["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+            ("p95_ms", w["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            ("p99_ms", w["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+        ):
+            change = None
+            if new_value is not None and old_value:
+                change = round((new_value - old_value) / old_value * 100.0, 1)
+            row[metric] = {"before": old_value, "after": new_value, "change_pct": change}
+        rows.append(row)
+    return rows
+
+
+# -----------------------------------------------------------------------------
+# Query plans
+# -----------------------------------------------------------------------------
+def _explain(qs) -> str:
+    if connection.vendor == "sqlite":
+        # without statistics SQLite can't tell a pair from a status apart
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+    elif connection.vendor == "postgresql":
+        # benchmark tables are small enough for a sequential scan to win;
+        # what matters here is that the index can serve the query
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            return qs.explain()
+    return qs.explain()
+
+
+def query_plans(user_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """
+    EXPLAINs the admin dashboard's filters and the result cache's DB lookup
+    and reports, for each, whether the plan uses the index meant for it,
+    which indexes it does use and whether it falls back to a full scan.
+    """
+    from .cache import result_cache
+    from .models import DDICheck
+
+    since = timezone.now() - timedelta(hours=24)
+    user_filter = models.Q(user__in=user_ids or [0]) | models.Q(user__isnull=True)
+    checks = [
+        ("dashboard_checks", "ddicheck_user_created_idx",
+         DDICheck.objects.filter(created_at__gte=since).filter(user_filter)),
+        ("dashboard_errors", "ddicheck_status_created_idx",
+         DDICheck.objects.filter(created_at__gte=since, status="error")),
+        ("cache_lookup", "ddicheck_pair_created_idx",
+         result_cache.db_query(("aspirin", "warfarin", "benchmark"))),
+    ]
+    indexes = [i.name for i in DDICheck._meta.indexes]
+    out = []
+    for name, index, qs in checks:
+        plan = _explain(qs)
+        out.append({
+            "query": name,
+            "index": index,
+            "uses_index": index in plan,
+            # the planner weighs the data it sees: in a one-user benchmark
+            # the user index isn't selective, so another one may win
+            "indexes_used": [i for i in indexes if i in plan],
+            "full_scan": bool(re.search(r"\bSCAN interactions_ddicheck\b(?! USING)|Seq Scan", plan)),
+            "plan": plan,
+        })
+    return out
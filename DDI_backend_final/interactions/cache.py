@@ -0,0 +1,250 @@
+# interactions/cache.py
+import os
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.core.cache import cache
+from django.db import models
+from django.utils import timezone
+
+from .models import DDICheck
+from .utils import canonical_pair, pair_key
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+DDI_CACHE_TTL_S       = int(os.getenv("DDI_CACHE_TTL_S", str(7 * 24 * 3600)))  # 7 days
+DDI_CACHE_MAX_ENTRIES = int(os.getenv("DDI_CACHE_MAX_ENTRIES", "2048"))
+DDI_CACHE_DB_TIER     = os.getenv("DDI_CACHE_DB_TIER", "1") == "1"
+# Older than this (but inside the TTL) is served at once and refreshed in the background
+DDI_CACHE_FRESH_S     = int(os.getenv("DDI_CACHE_FRESH_S", str(24 * 3600)))    # 1 day
+# How long a pair whose models both failed is answered with that failure
+DDI_CACHE_ERROR_TTL_S = int(os.getenv("DDI_CACHE_ERROR_TTL_S", "30"))
+
+RESULT_FIELDS = ("severity", "description", "extended_explanation", "recommendation")
+# DDICheck.cache_source values of rows whose result came from the Spaces
+COMPUTED_SOURCES = ("", "refresh")
+
+CacheKey = Tuple[str, str, str]  # (drug_a, drug_b, model_version), drugs sorted
+
+
+class DDIResultCache:
+    """
+    Two-tier cache of successful pair results.
+
+    1) In-process LRU with TTL (fast path, lost on restart).
+    2) The DDICheck log itself: the newest successful live or refreshed row
+       for the same canonical pair + model version inside the TTL, joined to
+       its InteractionResult texts (survives restarts and is shared by every
+       gunicorn worker).
+
+    Keys are order-independent, so "warfarin,aspirin" and "aspirin,warfarin"
+    hit the same entry. Only successful results are kept here; failures go
+    to a short-lived negative cache in Django's cache (see set_failure).
+    """
+
+    def __init__(self, ttl_s: int, max_entries: int, use_db: bool = True,
+                 fresh_s: int = DDI_CACHE_FRESH_S, error_ttl_s: int = DDI_CACHE_ERROR_TTL_S):
+        self.ttl_s = ttl_s
+        self.fresh_s = fresh_s
+        self.error_ttl_s = error_ttl_s
+        self.max_entries = max_entries
+        self.use_db = use_db
+        # key -> (stored_at, result, source reported on a memory hit)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, Dict[str, str], str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = {"memory": 0, "db": 0}
+        self._misses = 0
+
+    @staticmethod
+    def _key(drug1: str, drug2: str, version: str) -> CacheKey:
+        a, b = canonical_pair(drug1, drug2)
+        return a, b, version
+
+    def get(self, drug1: str, drug2: str, version: str,
+            record: bool = True) -> Tuple[Optional[Dict[str, str]], str]:
+        """
+        Returns (result, source) where source is 'memory', 'db' or '' on a miss.
+        record=False skips the hit/miss counters (used when polling).
+        """
+        result, source, _ = self.lookup(drug1, drug2, version, record=record)
+        return result, source
+
+    def lookup(self, drug1: str, drug2: str, version: str, record: bool = True,
+               memory_only: bool = False) -> Tuple[Optional[Dict[str, str]], str, Optional[float]]:
+        """
+        Like get(), plus the result's age in seconds (None on a miss).
+        memory_only=True skips the DB tier and doesn't count a miss.
+        """
+        return self.lookup_many([(drug1, drug2)], version, record=record, memory_only=memory_only).get(
+            (drug1, drug2), (None, "", None)
+        )
+
+    def lookup_many(self, pairs: Iterable[Tuple[str, str]], version: str, record: bool = True,
+                    memory_only: bool = False) -> Dict[Tuple[str, str], Tuple[Dict[str, str], str, float]]:
+        """lookup() for many pairs, with one DB query for those not in memory; misses are left out."""
+        now = time.monotonic()
+        found: Dict[Tuple[str, str], Tuple[Dict[str, str], str, float]] = {}
+        rest: Dict[CacheKey, List[Tuple[str, str]]] = {}
+        with self._lock:
+            for pair in pairs:
+                key = self._key(*pair, version)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    stored_at, result, source = entry
+                    if now - stored_at <= self.ttl_s:
+                        self._entries.move_to_end(key)
+                        if record:
+                            self._hits["memory"] += 1
+                        found[pair] = (dict(result), source, now - stored_at)
+                        continue
+                    del self._entries[key]
+                rest.setdefault(key, []).append(pair)
+        if memory_only or not rest:
+            return found
+
+        rows = self._db_lookup_many(list(rest), version) if self.use_db else {}
+        for key, row in rows.items():
+            result = row.result.as_dict()
+            age_s = max((timezone.now() - row.created_at).total_seconds(), 0.0)
+            self._store(key, result, stored_at=now - age_s)
+            for pair in rest[key]:
+                found[pair] = (dict(result), "db", age_s)
+        if record:
+            with self._lock:
+                self._hits["db"] += sum(len(rest[key]) for key in rows)
+                self._misses += sum(len(pairs) for key, pairs in rest.items() if key not in rows)
+        return found
+
+    def is_fresh(self, age_s: Optional[float]) -> bool:
+        return age_s is not None and age_s <= self.fresh_s
+
+    def set(self, drug1: str, drug2: str, version: str, result: Dict[str, str],
+            source: str = "memory") -> None:
+        """source: what a memory hit on this entry reports ('precomputed' for precomputed rows)."""
+        key = self._key(drug1, drug2, version)
+        self._store(key, {f: str(result.get(f, "") or "") for f in RESULT_FIELDS}, source=source)
+
+    def last_known(self, drug1: str, drug2: str, version: str) -> Optional[Dict[str, str]]:
+        """Newest successful result regardless of TTL (fallback when the Spaces are down)."""
+        if not self.use_db:
+            return None
+        row = self._db_lookup(self._key(drug1, drug2, version), max_age_s=None)
+        return row.result.as_dict() if row is not None else None
+
+    def invalidate(self, drug1: str, drug2: str, version: str) -> None:
+        with self._lock:
+            self._entries.pop(self._key(drug1, drug2, version), None)
+
+    # -- negative cache ---------------------------------------------------------
+    def _failure_key(self, key: CacheKey) -> str:
+        return "ddi:failed:" + hashlib.sha1("|".join(key).encode()).hexdigest()
+
+    def set_failure(self, drug1: str, drug2: str, version: str, result: Dict[str, str],
+                    status: str, error_message: str) -> None:
+        """Remembers a failed pair for error_ttl_s so retries don't hit a broken Space."""
+        if self.error_ttl_s <= 0:
+            return
+        try:
+            cache.set(
+                self._failure_key(self._key(drug1, drug2, version)),
+                {"result": result, "status": status, "error_message": error_message},
+                timeout=self.error_ttl_s,
+            )
+        except Exception as e:
+            logger.warning("DDI negative cache write failed: %s", e)
+
+    def get_failure(self, drug1: str, drug2: str, version: str) -> Optional[Dict[str, object]]:
+        """{'result', 'status', 'error_message'} of a recent failure, or None."""
+        if self.error_ttl_s <= 0:
+            return None
+        try:
+            return cache.get(self._failure_key(self._key(drug1, drug2, version)))
+        except Exception:
+            return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            hits = self._hits["memory"] + self._hits["db"]
+            total = hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self._hits["memory"],
+                "db_hits": self._hits["db"],
+                "misses": self._misses,
+                "hit_rate": round(hits / total, 4) if total else 0.0,
+            }
+
+    # -- internals --------------------------------------------------------------
+    def _store(self, key: CacheKey, result: Dict[str, str], stored_at: Optional[float] = None,
+               source: str = "memory") -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() if stored_at is None else stored_at, result, source)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def db_query(self, key: CacheKey, max_age_s: Optional[float] = -1) -> "models.QuerySet[DDICheck]":
+        """The DB tier's lookup for one pair (served by the (pair_key, created_at) index)."""
+        a, b, version = key
+        return self._db_rows([pair_key(a, b)], version, max_age_s).order_by("-created_at")
+
+    def _db_rows(self, pair_keys: List[str], version: str,
+                 max_age_s: Optional[float] = -1) -> "models.QuerySet[DDICheck]":
+        if max_age_s == -1:
+            max_age_s = self.ttl_s
+        if len(pair_keys) == 1:
+            qs = DDICheck.objects.filter(pair_key=pair_keys[0])
+        else:
+            qs = DDICheck.objects.filter(pair_key__in=pair_keys)
+        qs = (
+            qs
+            .filter(status="success", model_version=version)
+            # only rows produced by a model call: cache hits log copies
+            # with a new timestamp, which would make old results look fresh
+            .filter(cache_source__in=COMPUTED_SOURCES)
+        )
+        if max_age_s is not None:
+            qs = qs.filter(created_at__gte=timezone.now() - timedelta(seconds=max_age_s))
+        return (
+            qs.select_related("result")
+            .only("pair_key", "created_at", "result", *(f"result__{f}" for f in RESULT_FIELDS))
+        )
+
+    def _db_lookup_many(self, keys: List[CacheKey], version: str) -> Dict[CacheKey, DDICheck]:
+        """Newest row per key, in one query."""
+        by_pair_key = {pair_key(a, b): (a, b, v) for a, b, v in keys}
+        try:
+            rows = self._db_rows(list(by_pair_key), version).order_by("pair_key", "-created_at")
+            if len(by_pair_key) == 1:
+                rows = rows[:1]
+            newest: Dict[CacheKey, DDICheck] = {}
+            for row in rows:
+                newest.setdefault(by_pair_key[row.pair_key], row)
+            return newest
+        except Exception as e:
+            logger.warning("DDI cache DB lookup failed: %s", e)
+            return {}
+
+    def _db_lookup(self, key: CacheKey, max_age_s: Optional[float] = -1) -> Optional[DDICheck]:
+        try:
+            return self.db_query(key, max_age_s).first()
+        except Exception as e:
+            # Never let the cache break a check; fall through to the models.
+            logger.warning("DDI cache DB lookup failed: %s", e)
+            return None
+
+
+# Process-wide instance used by the DDI views
+result_cache = DDIResultCache(DDI_CACHE_TTL_S, DDI_CACHE_MAX_ENTRIES, use_db=DDI_CACHE_DB_TIER)
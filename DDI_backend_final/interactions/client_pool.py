@@ -0,0 +1,165 @@
+# interactions/client_pool.py
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from django.conf import settings
+from gradio_client import Client
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+DDI_CLIENT_IDLE_S    = int(os.getenv("DDI_CLIENT_IDLE_S", "1800"))     # drop clients unused for 30 min
+DDI_CLIENT_MAX_AGE_S = int(os.getenv("DDI_CLIENT_MAX_AGE_S", "21600"))  # rebuild after 6 h regardless
+
+HF_TOKEN = getattr(settings, "HF_TOKEN", "") or None
+
+
+def _build_client(target: str) -> Client:
+    # verbose=False keeps gradio from printing to stdout on construction
+    return Client(target, hf_token=HF_TOKEN, verbose=False)
+
+
+class _Entry:
+    __slots__ = ("client", "created_at", "last_used", "healthy")
+
+    def __init__(self, client: Client):
+        now = time.monotonic()
+        self.client = client
+        self.created_at = now
+        self.last_used = now
+        self.healthy = True
+
+
+class _TargetStats:
+    __slots__ = ("builds", "build_failures", "build_s", "reuses", "invalidations")
+
+    def __init__(self):
+        self.builds = 0
+        self.build_failures = 0
+        self.build_s = 0.0
+        self.reuses = 0
+        self.invalidations = 0
+
+
+class ClientPool:
+    """
+    Process-wide pool of long-lived gradio Clients, one per Space target.
+
+    - Clients are built lazily on first use and reused by every thread.
+    - A failed call marks the client unhealthy; the next get() reconnects.
+    - Clients idle for longer than idle_s, or older than max_age_s, are
+      dropped and rebuilt on demand.
+    - Construction time is recorded so stats() can report the setup time
+      saved by reuse.
+    """
+
+    def __init__(self, factory: Callable[[str], Client] = _build_client,
+                 idle_s: int = DDI_CLIENT_IDLE_S, max_age_s: int = DDI_CLIENT_MAX_AGE_S):
+        self._factory = factory
+        self.idle_s = idle_s
+        self.max_age_s = max_age_s
+        self._entries: Dict[str, _Entry] = {}
+        self._stats: Dict[str, _TargetStats] = {}
+        self._lock = threading.Lock()
+        self._build_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, target: str) -> Client:
+        self.evict_idle()
+        entry = self._usable(target)
+        if entry is not None:
+            return entry.client
+
+        # One builder per target; other targets are not blocked meanwhile.
+        with self._build_lock(target):
+            entry = self._usable(target)  # another thread may have built it
+            if entry is not None:
+                return entry.client
+            logger.info("Initializing HF client for %s", target)
+            started = time.monotonic()
+            try:
+                client = self._factory(target)
+            except Exception:
+                with self._lock:
+                    self._target_stats(target).build_failures += 1
+                raise
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self._entries[target] = _Entry(client)
+                stats = self._target_stats(target)
+                stats.builds += 1
+                stats.build_s += elapsed
+            logger.info("HF client for %s ready in %.2fs", target, elapsed)
+            return client
+
+    def invalidate(self, target: str, reason: Any = None) -> None:
+        """Mark the target's client unhealthy so the next get() reconnects."""
+        with self._lock:
+            entry = self._entries.get(target)
+            if entry is not None and entry.healthy:
+                entry.healthy = False
+                self._target_stats(target).invalidations += 1
+                logger.info("HF client for %s invalidated: %s", target, reason)
+
+    def evict_idle(self) -> None:
+        now = time.monotonic()
+        with self._lock:
+            for target, entry in list(self._entries.items()):
+                if (not entry.healthy
+                        or now - entry.last_used > self.idle_s
+                        or now - entry.created_at > self.max_age_s):
+                    del self._entries[target]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-target counters, including setup time saved by reusing clients."""
+        now = time.monotonic()
+        out: Dict[str, Dict[str, Any]] = {}
+        with self._lock:
+            for target, s in self._stats.items():
+                avg_build_s = s.build_s / s.builds if s.builds else 0.0
+                entry = self._entries.get(target)
+                out[target] = {
+                    "connected": entry is not None and entry.healthy,
+                    "idle_s": round(now - entry.last_used, 1) if entry else None,
+                    "builds": s.builds,
+                    "build_failures": s.build_failures,
+                    "reuses": s.reuses,
+                    "invalidations": s.invalidations,
+                    "avg_build_s": round(avg_build_s, 3),
+                    "saved_s": round(avg_build_s * s.reuses, 3),
+                }
+        return out
+
+    # -- internals --------------------------------------------------------------
+    def _usable(self, target: str) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entries.get(target)
+            if entry is None or not entry.healthy:
+                return None
+            entry.last_used = time.monotonic()
+            stats = self._target_stats(target)
+            stats.reuses += 1
+            if stats.builds:
+                logger.debug("Reusing HF client for %s (saved ~%.2fs setup)",
+                             target, stats.build_s / stats.builds)
+            return entry
+
+    def _build_lock(self, target: str) -> threading.Lock:
+        with self._lock:
+            return self._build_locks.setdefault(target, threading.Lock())
+
+    def _target_stats(self, target: str) -> _TargetStats:
+        # caller holds self._lock
+        return self._stats.setdefault(target, _TargetStats())
+
+
+# Shared by every gradio model call (interactions.backends.GradioBackend)
+client_pool = ClientPool()
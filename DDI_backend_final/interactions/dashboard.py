@@ -0,0 +1,143 @@
+# interactions/dashboard.py
+"""
+Cached admin dashboard payloads, one per hospital.
+
+A payload lives for DASHBOARD_CACHE_TTL_S under the hospital's current
+generation; interactions/signals.py moves the generation on when a check by
+one of the hospital's users, one of its profiles, or a user field the
+payload shows (USER_FIELDS) is saved, so the next refresh recomputes.
+Anonymous checks only show up once the TTL runs out. Concurrent refreshes
+share one computation: within a process via single-flight, across workers
+via a lock in the shared cache (REDIS_URL).
+"""
+import os
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.core.cache import cache
+
+from .singleflight import SingleFlight, SharedLock
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+DASHBOARD_CACHE_TTL_S = int(os.getenv("DASHBOARD_CACHE_TTL_S", "30"))  # 0 disables
+
+# user id -> hospital id (None: no hospital), so saving a check doesn't cost a lookup
+HOSPITAL_MEMO_SIZE = 4096
+
+# User fields the payload shows; saves of other fields (2FA codes, password)
+# leave it cached
+USER_FIELDS = frozenset({"email", "role", "is_active", "last_login", "date_joined"})
+
+# moved on by forget_user(), so every worker drops its memo
+_MEMO_GENERATION_KEY = "ddi:dashboard:hospitals:gen"
+
+_inflight = SingleFlight()
+_locks = SharedLock("ddi:dashboard:lock", ttl_s=60, wait_s=30, poll_s=0.2)
+
+# user id -> (memo generation, hospital id)
+_hospitals: "OrderedDict[int, Tuple[str, Optional[int]]]" = OrderedDict()
+_hospitals_lock = threading.Lock()
+
+
+def _generation_key(hospital_id: int) -> str:
+    return f"ddi:dashboard:{hospital_id}:gen"
+
+
+def _payload_key(hospital_id: int, generation: str) -> str:
+    return f"ddi:dashboard:{hospital_id}:{generation}"
+
+
+def _generation(hospital_id: int) -> str:
+    return cache.get_or_set(_generation_key(hospital_id), lambda: uuid.uuid4().hex, timeout=None)
+
+
+def payload(hospital_id: int, compute: Callable[[], Dict[str, Any]]) -> Tuple[Dict[str, Any], str]:
+    """Returns (payload, 'HIT' | 'MISS' | 'COALESCED')."""
+    if DASHBOARD_CACHE_TTL_S <= 0:
+        return compute(), "MISS"
+    try:
+        generation = _generation(hospital_id)
+        key = _payload_key(hospital_id, generation)
+        cached = cache.get(key)
+    except Exception as e:
+        logger.warning("Dashboard cache unavailable (%s); computing", e)
+        return compute(), "MISS"
+    if cached is not None:
+        return cached, "HIT"
+
+    def build():
+        with _locks.hold(key) as owner:
+            if not owner:
+                shared = _locks.wait(key, lambda: cache.get(key))
+                if shared is not None:
+                    return shared, "COALESCED"
+            data = compute()
+            # keyed by the generation read before computing: an invalidation
+            # that lands meanwhile makes this payload unreachable
+            cache.set(key, data, timeout=DASHBOARD_CACHE_TTL_S)
+            return data, "MISS"
+
+    (data, status), shared = _inflight.do(key, build)
+    return data, "COALESCED" if shared else status
+
+
+def invalidate(hospital_id: Optional[int]) -> None:
+    if hospital_id is None:
+        return
+    try:
+        cache.set(_generation_key(hospital_id), uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.warning("Dashboard cache invalidation failed for hospital %s: %s", hospital_id, e)
+
+
+# -----------------------------------------------------------------------------
+# Which hospital a user belongs to
+# -----------------------------------------------------------------------------
+def _memo_generation() -> Optional[str]:
+    try:
+        return cache.get_or_set(_MEMO_GENERATION_KEY, lambda: uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.warning("Dashboard cache unavailable (%s); looking the hospital up", e)
+        return None
+
+
+def hospital_of(user_id: Optional[int]) -> Optional[int]:
+    if user_id is None:
+        return None
+    generation = _memo_generation()
+    with _hospitals_lock:
+        memo = _hospitals.get(user_id)
+        if memo is not None and generation is not None and memo[0] == generation:
+            _hospitals.move_to_end(user_id)
+            return memo[1]
+    from accounts.models import AdminProfile, ProfessionalProfile
+
+    hospital_id = (
+        AdminProfile.objects.filter(user_id=user_id).values_list("hospital_id", flat=True).first()
+        or ProfessionalProfile.objects.filter(user_id=user_id).values_list("hospital_id", flat=True).first()
+    )
+    if generation is None:
+        return hospital_id
+    with _hospitals_lock:
+        _hospitals[user_id] = (generation, hospital_id)
+        _hospitals.move_to_end(user_id)
+        while len(_hospitals) > HOSPITAL_MEMO_SIZE:
+            _hospitals.popitem(last=False)
+    return hospital_id
+
+
+def forget_user(user_id: Optional[int]) -> None:
+    """A profile changed: look the user's hospital up again next time, in every worker."""
+    with _hospitals_lock:
+        _hospitals.pop(user_id, None)
+    try:
+        cache.set(_MEMO_GENERATION_KEY, uuid.uuid4().hex, timeout=None)
+    except Exception as e:
+        logger.warning("Dashboard memo invalidation failed for user %s: %s", user_id, e)
@@ -0,0 +1,697 @@
+# interactions/gateway.py
+"""
+Inference gateway: the one way the app calls Freda (severity) and Bernice
+(description / explanation / recommendation).
+
+Each Space's endpoint signature (API name and input parameter) is discovered
+once, from its API description, and remembered per target; calls then go
+straight to it instead of trying endpoint shapes per request. The gateway
+also owns target order, retries with backoff, circuit breakers, adaptive
+timeouts, the per-call deadline and per-model metrics. The model backend
+(interactions/backends.py) owns connections and client pooling.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from asgiref.sync import sync_to_async
+
+from . import timing
+from .backends import CallCancelled, CancelToken, get_backend
+from .keepwarm import order_targets
+from .resilience import (
+    DDI_LATENCY_MIN_SAMPLES, CircuitOpenError, Deadline, DeadlineExceeded, LatencyTracker,
+    targets as resilience_targets,
+)
+from .utils import repo_to_url
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# HF Space config (override via environment variables)
+# -----------------------------------------------------------------------------
+# Bernice
+BERNICE_URL       = os.getenv("BERNICE_URL", "https://bernice775-transformer-model-ddi.hf.space")
+BERNICE_API_NAME  = "/run_interaction_check"    # param: drug_input
+BERNICE_TIMEOUT_S = int(os.getenv("BERNICE_TIMEOUT_S", "120"))
+BERNICE_RETRIES   = int(os.getenv("BERNICE_RETRIES", "2"))
+
+# Freda — SIX 'a's
+FREDA_URL         = os.getenv("FREDA_URL", "https://fredaaaaaa-severity.hf.space")
+FREDA_REPO_ID     = os.getenv("FREDA_REPO_ID", "Fredaaaaaa/severity")
+FREDA_API_NAME    = "/lambda"                   # param: x
+FREDA_TIMEOUT_S   = int(os.getenv("FREDA_TIMEOUT_S", "150"))
+FREDA_RETRIES     = int(os.getenv("FREDA_RETRIES", "3"))
+
+# Total time budget per model call chain (all targets, attempts and backoff
+# sleeps); keep it under the gunicorn --timeout
+DDI_DEADLINE_S = int(os.getenv("DDI_DEADLINE_S", "110"))
+
+# Hedged Freda requests: when the target in flight hasn't answered within its
+# p90 latency, the same request also goes to the next target; first answer wins
+DDI_HEDGE             = os.getenv("DDI_HEDGE", "0") == "1"
+DDI_HEDGE_PERCENTILE  = float(os.getenv("DDI_HEDGE_PERCENTILE", "90"))
+DDI_HEDGE_DELAY_S     = float(os.getenv("DDI_HEDGE_DELAY_S", "10"))    # until enough samples exist
+DDI_HEDGE_MIN_DELAY_S = float(os.getenv("DDI_HEDGE_MIN_DELAY_S", "0.5"))
+DDI_HEDGE_WORKERS     = int(os.getenv("DDI_HEDGE_WORKERS", "16"))
+
+# Discover signatures in the background when a web worker starts
+DDI_GATEWAY_DISCOVER_ON_START = os.getenv("DDI_GATEWAY_DISCOVER_ON_START", "1") == "1"
+# A Space whose API description could not be read is asked again after this long
+DDI_GATEWAY_DISCOVER_RETRY_S  = int(os.getenv("DDI_GATEWAY_DISCOVER_RETRY_S", "300"))
+
+
+# -----------------------------------------------------------------------------
+# Endpoint signatures
+# -----------------------------------------------------------------------------
+class Signature(NamedTuple):
+    """One way of asking a Space about a pair: endpoint, its text parameter, how the pair is joined."""
+    api_name: str
+    param: str
+    sep: str = ","
+    # Two-step Bernice Spaces: /collect_drug_features lists the pair labels
+    # the Space knows, and the endpoint is then called with the matching one
+    select: bool = False
+
+    def __str__(self) -> str:
+        return f"{self.api_name}({self.param})"
+
+
+# Known shapes, most preferred first; the first is used until discovery succeeds
+FREDA_SIGNATURES = (
+    Signature(FREDA_API_NAME, "x"),
+    Signature("/predict_interaction", "drug_names", ", "),
+)
+BERNICE_SIGNATURES = (
+    Signature(BERNICE_API_NAME, "drug_input"),
+    Signature("/generate_selected_pair_output", "selected_pair", ", ", select=True),
+    Signature("/run_interaction_check", "input_text", ", "),
+    Signature("/run_interaction_check", "drug_names", ", "),
+    Signature("/predict", "drug_names", ", "),
+    Signature("/predict", "input_text", ", "),
+    Signature("/predict", "text", ", "),
+)
+SELECT_API_NAME, SELECT_PARAM = "/collect_drug_features", "drug_names_input"
+
+
+def _as_str(x: Any) -> str:
+    if isinstance(x, (list, tuple)):
+        return _as_str(x[0]) if x else ""
+    return "" if x is None else str(x)
+
+
+def parse_severity(out: Any) -> str:
+    return _as_str(out)
+
+
+def parse_details(out: Any) -> Dict[str, str]:
+    """(description, explanation, recommendation) as a tuple/list, or a plain string."""
+    parts = [_as_str(x) for x in out] if isinstance(out, (list, tuple)) else [_as_str(out)]
+    interaction, explanation, recommendations = (parts + ["", "", ""])[:3]
+    return {"interaction": interaction, "explanation": explanation, "recommendations": recommendations}
+
+
+def freda_targets() -> List[Tuple[str, str]]:
+    """URL -> repo_id -> derived URL, as configured."""
+    attempts_targets = []
+    if FREDA_URL:
+        attempts_targets.append(("URL", FREDA_URL))
+    if FREDA_REPO_ID:
+        attempts_targets.append(("REPO_ID", FREDA_REPO_ID))
+        derived = repo_to_url(FREDA_REPO_ID)
+        if derived and (not FREDA_URL or derived != FREDA_URL):
+            attempts_targets.append(("DERIVED_URL", derived))
+    return attempts_targets
+
+
+def bernice_targets() -> List[Tuple[str, str]]:
+    return [("URL", BERNICE_URL)] if BERNICE_URL else []
+
+
+class Model(NamedTuple):
+    name: str
+    targets: Callable[[], List[Tuple[str, str]]]
+    signatures: Tuple[Signature, ...]
+    parse: Callable[[Any], Any]
+    timeout_s: int
+    retries: int
+    backoff: float
+    hedge: bool = False
+
+
+FREDA = Model("FREDA", freda_targets, FREDA_SIGNATURES, parse_severity,
+              FREDA_TIMEOUT_S, FREDA_RETRIES, 2.0, hedge=DDI_HEDGE)
+BERNICE = Model("Bernice", bernice_targets, BERNICE_SIGNATURES, parse_details,
+                BERNICE_TIMEOUT_S, BERNICE_RETRIES, 1.6)
+MODELS = (FREDA, BERNICE)
+
+
+def select_label(options: Any, drug1: str, drug2: str, default: str) -> str:
+    """The /collect_drug_features option naming both drugs, else `default`."""
+    labels: List[str] = []
+    if isinstance(options, (list, tuple)) and options:
+        first = options[0]
+        if isinstance(first, (list, tuple)):
+            labels = [str(x) for x in first]
+    t1, t2 = drug1.lower().replace(" ", ""), drug2.lower().replace(" ", "")
+    for label in labels:
+        s = label.lower().replace(" ", "")
+        if t1 in s and t2 in s:
+            return label
+    return default
+
+
+def match_signature(model: Model, endpoints: Dict[str, List[str]]) -> Optional[Signature]:
+    """First known signature the Space's API description offers, or None."""
+    for sig in model.signatures:
+        params = endpoints.get(sig.api_name)
+        if params is None:
+            continue
+        if sig.select and SELECT_API_NAME not in endpoints:
+            continue
+        if not params or sig.param in params:
+            return sig
+    return None
+
+
+class _ModelStats:
+    __slots__ = ("calls", "failures", "attempts", "hedged", "hedge_wins", "latency")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.attempts = 0
+        self.hedged = 0      # calls that started a hedge
+        self.hedge_wins = 0  # calls answered by a hedge rather than the first attempt
+        self.latency = LatencyTracker()
+
+
+def hedge_delay(target: str) -> float:
+    """How long an attempt on target may run before a hedge is started."""
+    latency = resilience_targets.latency(target)
+    if latency.count() < DDI_LATENCY_MIN_SAMPLES:
+        return DDI_HEDGE_DELAY_S
+    return max(DDI_HEDGE_MIN_DELAY_S, latency.percentile(DDI_HEDGE_PERCENTILE) or DDI_HEDGE_DELAY_S)
+
+
+class _CallPlan:
+    """
+    One model call's attempts and their outcome, shared by the sync and async
+    paths: which target to try next and with what timeout, when to back off,
+    which hedge answered, and what to raise once nothing is left.
+    """
+
+    def __init__(self, model: Model, attempts_targets: List[Tuple[str, str]], deadline: Deadline):
+        self.model = model
+        self.attempts_targets = attempts_targets
+        self.deadline = deadline
+        self.hedged = model.hedge and len(attempts_targets) > 1
+        # sequential calls retry a target before moving on; hedged ones try
+        # each target once in order, then the remaining retries round-robin
+        rounds = range(1, model.retries + 1)
+        if self.hedged:
+            self.todo = [(kind, target, n) for n in rounds for kind, target in attempts_targets]
+        else:
+            self.todo = [(kind, target, n) for kind, target in attempts_targets for n in rounds]
+        self.backoff = model.backoff
+        self.last_err: Optional[Exception] = None
+        self.circuit_open = False
+        self.out_of_time = False
+        self.newest_target = ""
+        self.waited_s = 0.0
+        self.hedges: set = set()  # attempts started while another was still running
+        self.hedge_won = False
+
+    def next(self) -> Optional[Tuple[str, str, int, float]]:
+        """(kind, target, attempt, timeout) to start next, or None when nothing is left."""
+        while self.todo:
+            kind, target, n = self.todo.pop(0)
+            timeout = self.deadline.clamp(resilience_targets.latency(target).timeout_for(self.model.timeout_s))
+            if timeout < 1:
+                self.todo.clear()
+                self.out_of_time = True
+                return None
+            if not resilience_targets.breaker(target).allow():
+                logger.info("%s circuit open for %s; skipping", self.model.name, target)
+                self.circuit_open = True
+                self.todo = [t for t in self.todo if t[1] != target]
+                continue
+            self.newest_target = target
+            return kind, target, n, timeout
+        return None
+
+    def started(self, handle: Any, hedge: bool) -> None:
+        if hedge:
+            self.hedges.add(handle)
+            logger.info("%s hedging: %s after %.1fs without an answer",
+                        self.model.name, self.newest_target, self.waited_s)
+
+    def wait_s(self) -> float:
+        """How long to wait on the attempts in flight before hedging (or giving up)."""
+        self.waited_s = hedge_delay(self.newest_target) if self.todo else self.deadline.remaining()
+        return max(0.0, min(self.waited_s, self.deadline.remaining()))
+
+    def failed(self, e: Exception) -> None:
+        if not isinstance(e, CallCancelled):
+            self.last_err = e
+
+    def settle(self, done: Any) -> Tuple[bool, Any]:
+        """(True, output) for the first finished attempt that answered, else (False, None)."""
+        for handle in done:
+            try:
+                out = handle.result()
+            except Exception as e:
+                self.failed(e)
+                continue
+            self.hedge_won = handle in self.hedges
+            return True, out
+        return False, None
+
+    def backoff_s(self) -> Optional[float]:
+        """The pause before the next attempt when it retries a target already tried."""
+        if not self.todo or self.todo[0][2] == 1 or self.deadline.expired():
+            return None
+        delay = min(self.backoff, self.deadline.remaining())
+        self.backoff *= 1.6
+        return delay
+
+    def raise_exhausted(self):
+        """Raises once every attempt failed, was skipped or ran out of time."""
+        if self.out_of_time or self.deadline.expired():
+            raise DeadlineExceeded(
+                f"{self.model.name} timed out: no answer within the {DDI_DEADLINE_S}s budget"
+            ) from self.last_err
+        if self.last_err is None and self.circuit_open:
+            retry_after = min(resilience_targets.breaker(t).retry_after_s() for _, t in self.attempts_targets)
+            raise CircuitOpenError(
+                f"{self.model.name} is temporarily unavailable (circuit open); retry in {retry_after:.0f}s"
+            )
+        # All attempts failed
+        raise self.last_err if self.last_err else RuntimeError(f"{self.model.name} client creation failed")
+
+
+# -----------------------------------------------------------------------------
+# Gateway
+# -----------------------------------------------------------------------------
+class InferenceGateway:
+
+    def __init__(self):
+        self._signatures: Dict[Tuple[str, str], Signature] = {}  # (model, target) -> discovered
+        self._attempted_at: Dict[Tuple[str, str], float] = {}
+        self._stats: Dict[str, _ModelStats] = {m.name: _ModelStats() for m in MODELS}
+        self._lock = threading.Lock()
+
+    # -- discovery --------------------------------------------------------------
+    def known_signature(self, model: Model, target: str) -> Optional[Signature]:
+        with self._lock:
+            return self._signatures.get((model.name, target))
+
+    def signature(self, model: Model, target: str) -> Signature:
+        """
+        The remembered signature for this target. Without one, asks the Space
+        for its API description (at most once per DDI_GATEWAY_DISCOVER_RETRY_S)
+        and falls back to the model's default signature meanwhile.
+        """
+        key = (model.name, target)
+        with self._lock:
+            sig = self._signatures.get(key)
+            if sig is not None:
+                return sig
+            last = self._attempted_at.get(key)
+            if last is not None and time.monotonic() - last < DDI_GATEWAY_DISCOVER_RETRY_S:
+                return model.signatures[0]
+            self._attempted_at[key] = time.monotonic()
+        return self.discover(model, target) or model.signatures[0]
+
+    def discover(self, model: Model, target: str) -> Optional[Signature]:
+        try:
+            with timing.span("discover"):
+                endpoints = get_backend().describe(target)
+        except Exception as e:
+            logger.warning("%s: could not read the API of %s: %s", model.name, target, e)
+            return None
+        if endpoints is None:
+            return None
+        sig = match_signature(model, endpoints)
+        if sig is None:
+            logger.warning("%s: no known endpoint on %s (offers %s); using %s",
+                           model.name, target, sorted(endpoints), model.signatures[0])
+            return None
+        with self._lock:
+            self._signatures[(model.name, target)] = sig
+        logger.info("%s: %s answers on %s", model.name, target, sig)
+        return sig
+
+    def discover_all(self) -> Dict[str, Dict[str, str]]:
+        """Resolves every configured target now (startup, `ddi_keepwarm`)."""
+        for model in MODELS:
+            for _, target in model.targets():
+                if self.known_signature(model, target) is None:
+                    self.signature(model, target)
+        return self.signatures()
+
+    def forget(self, target: Optional[str] = None) -> None:
+        """Drops remembered signatures (all, or one target's) so they are discovered again."""
+        with self._lock:
+            for key in [k for k in self._signatures if target is None or k[1] == target]:
+                del self._signatures[key]
+            for key in [k for k in self._attempted_at if target is None or k[1] == target]:
+                del self._attempted_at[key]
+
+    def signatures(self) -> Dict[str, Dict[str, str]]:
+        with self._lock:
+            out: Dict[str, Dict[str, str]] = {m.name: {} for m in MODELS}
+            for (name, target), sig in self._signatures.items():
+                out[name][target] = str(sig)
+            return out
+
+    # -- calls ------------------------------------------------------------------
+    def invoke(self, target: str, sig: Signature, drug1: str, drug2: str, timeout_s: Optional[float],
+               cancel: Optional[CancelToken] = None) -> Any:
+        """One call of one signature on one target (no retries)."""
+        backend = get_backend()
+        value = f"{drug1}{sig.sep}{drug2}"
+        if sig.select:
+            started = time.monotonic()
+            options = backend.call(target, SELECT_API_NAME, timeout_s, cancel=cancel, **{SELECT_PARAM: value})
+            value = select_label(options, drug1, drug2, value)
+            if timeout_s is not None:
+                timeout_s = max(1.0, timeout_s - (time.monotonic() - started))
+        return backend.call(target, sig.api_name, timeout_s, cancel=cancel, **{sig.param: value})
+
+    def _attempt_started(self, model: Model, kind: str, target: str, attempt: int, sig: Signature,
+                         timeout: float, how: str = "") -> float:
+        logger.info("%s %sattempt %d/%d (%s): %s %s, timeout %.0fs",
+                    model.name, how, attempt, model.retries, kind, target, sig, timeout)
+        with self._lock:
+            self._stats[model.name].attempts += 1
+        return time.monotonic()
+
+    @staticmethod
+    def _attempt_failed(model: Model, kind: str, target: str, attempt: int, e: Exception, how: str = "") -> None:
+        resilience_targets.breaker(target).record_failure()
+        get_backend().invalidate(target, e)
+        logger.warning("%s %scall failed (attempt %d, %s): %s", model.name, how, attempt, kind, e)
+
+    @staticmethod
+    def _attempt_succeeded(model: Model, target: str, started: float, out: Any) -> Any:
+        resilience_targets.latency(target).record(time.monotonic() - started)
+        resilience_targets.breaker(target).record_success()
+        return model.parse(out)
+
+    def _attempt(self, model: Model, kind: str, target: str, attempt: int, drug1: str, drug2: str,
+                 timeout: float, cancel: Optional[CancelToken] = None) -> Any:
+        """
+        One attempt with breaker/latency bookkeeping, after breaker.allow() let
+        it through. A cancelled attempt counts as neither success nor failure,
+        but gives back the half-open probe slot it may hold.
+        """
+        settled = False
+        try:
+            sig = self.signature(model, target)
+            started = self._attempt_started(model, kind, target, attempt, sig, timeout)
+            try:
+                out = self.invoke(target, sig, drug1, drug2, timeout, cancel=cancel)
+            except Exception as e:
+                if cancel is not None and cancel.cancelled:
+                    raise CallCancelled(f"{model.name} attempt on {target} cancelled") from e
+                settled = True
+                self._attempt_failed(model, kind, target, attempt, e)
+                raise
+            settled = True
+            return self._attempt_succeeded(model, target, started, out)
+        finally:
+            if not settled:
+                resilience_targets.breaker(target).release_probe()
+
+    def call(self, model: Model, drug1: str, drug2: str,
+             attempts_targets: Optional[List[Tuple[str, str]]] = None) -> Any:
+        """
+        Walks the targets (warm ones first) with per-target retries and
+        backoff, guarded by:
+          - a circuit breaker per target (open targets are skipped outright),
+          - a per-attempt timeout adapted to the target's observed p95 latency,
+          - a total deadline (DDI_DEADLINE_S) covering every attempt and sleep.
+        Models with hedging enabled race the targets instead (see _call_hedged).
+        Returns the parsed output.
+        """
+        if attempts_targets is None:
+            attempts_targets = order_targets(model.targets())
+        plan = _CallPlan(model, attempts_targets, Deadline(DDI_DEADLINE_S))
+        started_call = time.monotonic()
+        try:
+            with timing.model(model.name.lower()):
+                if plan.hedged:
+                    out = self._call_hedged(plan, drug1, drug2)
+                else:
+                    out = self._call_sequential(plan, drug1, drug2)
+        except Exception:
+            self._record(plan, started_call, ok=False)
+            raise
+        self._record(plan, started_call, ok=True)
+        return out
+
+    def _call_sequential(self, plan: _CallPlan, drug1: str, drug2: str) -> Any:
+        while True:
+            attempt = plan.next()
+            if attempt is None:
+                plan.raise_exhausted()
+            kind, target, n, timeout = attempt
+            try:
+                return self._attempt(plan.model, kind, target, n, drug1, drug2, timeout)
+            except Exception as e:
+                plan.failed(e)
+                delay = plan.backoff_s()
+                if delay is not None:
+                    with timing.span("backoff"):
+                        time.sleep(delay)
+
+    def _call_hedged(self, plan: _CallPlan, drug1: str, drug2: str) -> Any:
+        """
+        Hedged requests: each target once in order, then the remaining retries
+        round-robin. When the newest attempt hasn't answered after its target's
+        p90 latency (DDI_HEDGE_DELAY_S until enough samples exist), the next one
+        is started alongside it; after a failure the next starts at once (with
+        backoff if it retries a target already tried). The first answer wins
+        and the attempts still running are cancelled.
+        """
+        pending: Dict[Future, CancelToken] = {}
+
+        def launch(hedge: bool = False) -> None:
+            attempt = plan.next()
+            if attempt is not None:
+                kind, target, n, timeout = attempt
+                token = CancelToken()
+                future = timing.submit(_hedge_pool, self._attempt, plan.model, kind, target, n,
+                                       drug1, drug2, timeout, token)
+                pending[future] = token
+                plan.started(future, hedge)
+
+        try:
+            launch()
+            while pending and not plan.deadline.expired():
+                done, _ = wait(list(pending), timeout=plan.wait_s(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    pending.pop(future)
+                answered, out = plan.settle(done)
+                if answered:
+                    return out
+                if not done:
+                    launch(hedge=True)
+                elif not pending:
+                    # another target right away; a retry of one already tried backs off first
+                    delay = plan.backoff_s()
+                    if delay is not None:
+                        with timing.span("backoff"):
+                            time.sleep(delay)
+                    launch()
+        finally:
+            for token in pending.values():
+                token.cancel()
+        plan.raise_exhausted()
+
+    # -- async calls (the async check view) --------------------------------------
+    # Twins of the methods above on the backend's acall(): the same _CallPlan
+    # decides targets, timeouts, backoff and hedging; only the awaiting differs.
+    # Cancelling the awaiting task cancels the attempts in flight.
+    async def ainvoke(self, target: str, sig: Signature, drug1: str, drug2: str,
+                      timeout_s: Optional[float]) -> Any:
+        backend = get_backend()
+        value = f"{drug1}{sig.sep}{drug2}"
+        if sig.select:
+            started = time.monotonic()
+            options = await backend.acall(target, SELECT_API_NAME, timeout_s, **{SELECT_PARAM: value})
+            value = select_label(options, drug1, drug2, value)
+            if timeout_s is not None:
+                timeout_s = max(1.0, timeout_s - (time.monotonic() - started))
+        return await backend.acall(target, sig.api_name, timeout_s, **{sig.param: value})
+
+    async def _aattempt(self, model: Model, kind: str, target: str, attempt: int, drug1: str, drug2: str,
+                        timeout: float) -> Any:
+        settled = False
+        try:
+            # remembered after the first discovery; only that one needs a thread
+            sig = (self.known_signature(model, target)
+                   or await sync_to_async(self.signature, thread_sensitive=False)(model, target))
+            started = self._attempt_started(model, kind, target, attempt, sig, timeout, how="async ")
+            try:
+                try:
+                    out = await asyncio.wait_for(self.ainvoke(target, sig, drug1, drug2, timeout), timeout)
+                except asyncio.TimeoutError as e:
+                    raise TimeoutError(str(e) or f"{model.name} timed out after {timeout:.0f}s") from None
+            except Exception as e:
+                # (a cancelled task raises CancelledError, which is no Exception)
+                settled = True
+                self._attempt_failed(model, kind, target, attempt, e, how="async ")
+                raise
+            settled = True
+            return self._attempt_succeeded(model, target, started, out)
+        finally:
+            if not settled:
+                resilience_targets.breaker(target).release_probe()
+
+    async def acall(self, model: Model, drug1: str, drug2: str,
+                    attempts_targets: Optional[List[Tuple[str, str]]] = None) -> Any:
+        if attempts_targets is None:
+            attempts_targets = order_targets(model.targets())
+        plan = _CallPlan(model, attempts_targets, Deadline(DDI_DEADLINE_S))
+        started_call = time.monotonic()
+        try:
+            with timing.model(model.name.lower()):
+                if plan.hedged:
+                    out = await self._acall_hedged(plan, drug1, drug2)
+                else:
+                    out = await self._acall_sequential(plan, drug1, drug2)
+        except Exception:
+            self._record(plan, started_call, ok=False)
+            raise
+        self._record(plan, started_call, ok=True)
+        return out
+
+    async def _acall_sequential(self, plan: _CallPlan, drug1: str, drug2: str) -> Any:
+        while True:
+            attempt = plan.next()
+            if attempt is None:
+                plan.raise_exhausted()
+            kind, target, n, timeout = attempt
+            try:
+                return await self._aattempt(plan.model, kind, target, n, drug1, drug2, timeout)
+            except Exception as e:
+                plan.failed(e)
+                delay = plan.backoff_s()
+                if delay is not None:
+                    with timing.span("backoff"):
+                        await asyncio.sleep(delay)
+
+    async def _acall_hedged(self, plan: _CallPlan, drug1: str, drug2: str) -> Any:
+        """_call_hedged with tasks on the running loop instead of the hedge pool."""
+        pending: set = set()
+
+        def launch(hedge: bool = False) -> None:
+            attempt = plan.next()
+            if attempt is not None:
+                kind, target, n, timeout = attempt
+                task = asyncio.ensure_future(self._aattempt(plan.model, kind, target, n, drug1, drug2, timeout))
+                pending.add(task)
+                plan.started(task, hedge)
+
+        try:
+            launch()
+            while pending and not plan.deadline.expired():
+                done, _ = await asyncio.wait(pending, timeout=plan.wait_s(), return_when=asyncio.FIRST_COMPLETED)
+                pending.difference_update(done)
+                answered, out = plan.settle(done)
+                if answered:
+                    return out
+                if not done:
+                    launch(hedge=True)
+                elif not pending:
+                    delay = plan.backoff_s()
+                    if delay is not None:
+                        with timing.span("backoff"):
+                            await asyncio.sleep(delay)
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        plan.raise_exhausted()
+
+    async def aseverity(self, drug1: str, drug2: str) -> str:
+        return await self.acall(FREDA, drug1, drug2)
+
+    async def adetails(self, drug1: str, drug2: str) -> Dict[str, str]:
+        return await self.acall(BERNICE, drug1, drug2)
+
+    def severity(self, drug1: str, drug2: str) -> str:
+        """Freda's severity label for the pair."""
+        return self.call(FREDA, drug1, drug2)
+
+    def details(self, drug1: str, drug2: str) -> Dict[str, str]:
+        """Bernice's {'interaction', 'explanation', 'recommendations'} for the pair."""
+        return self.call(BERNICE, drug1, drug2)
+
+    def spaces_available(self) -> bool:
+        """False when every Freda target's circuit is open (checks would fail fast)."""
+        return any(not resilience_targets.breaker(t).is_open for _, t in FREDA.targets())
+
+    # -- metrics ----------------------------------------------------------------
+    def _record(self, plan: _CallPlan, started: float, ok: bool) -> None:
+        stats = self._stats[plan.model.name]
+        with self._lock:
+            stats.calls += 1
+            if not ok:
+                stats.failures += 1
+            if plan.hedges:
+                stats.hedged += 1
+            if plan.hedge_won:
+                stats.hedge_wins += 1
+        if ok:
+            stats.latency.record(time.monotonic() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        signatures = self.signatures()
+        out = {}
+        for model in MODELS:
+            s = self._stats[model.name]
+            with self._lock:
+                calls, failures, attempts = s.calls, s.failures, s.attempts
+                hedged, hedge_wins = s.hedged, s.hedge_wins
+            p50, p95 = s.latency.percentile(50), s.latency.percentile(95)
+            out[model.name] = {
+                "signatures": signatures[model.name],
+                "calls": calls,
+                "failures": failures,
+                "attempts": attempts,
+                "hedging": model.hedge,
+                "hedged": hedged,
+                "hedge_rate": round(hedged / calls, 4) if calls else 0.0,
+                "hedge_wins": hedge_wins,
+                "p50_s": round(p50, 3) if p50 is not None else None,
+                "p95_s": round(p95, 3) if p95 is not None else None,
+            }
+        return out
+
+
+# Process-wide instance; hedged attempts run on their own pool so the
+# calling thread can wait on several at once
+gateway = InferenceGateway()
+_hedge_pool = ThreadPoolExecutor(max_workers=DDI_HEDGE_WORKERS, thread_name_prefix="ddi-hedge")
+
+
+def start_discovery() -> bool:
+    """Resolves every Space's signature on a background thread at worker start."""
+    if not DDI_GATEWAY_DISCOVER_ON_START:
+        return False
+
+    def run():
+        try:
+            gateway.discover_all()
+        except Exception:
+            logger.exception("Endpoint discovery failed")
+
+    threading.Thread(target=run, name="ddi-discover", daemon=True).start()
+    return True
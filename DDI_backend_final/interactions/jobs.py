@@ -0,0 +1,111 @@
+# interactions/jobs.py
+import os
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, Dict, Optional
+
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import DDIJob
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+DDI_JOB_WORKERS = int(os.getenv("DDI_JOB_WORKERS", "4"))
+# queued/running jobs older than this are assumed lost (e.g. worker restarted)
+DDI_JOB_STALE_S = int(os.getenv("DDI_JOB_STALE_S", "900"))
+
+# Local worker pool: job state lives in the DDIJob table, so any gunicorn
+# worker can answer a poll for a job that runs in another one.
+_job_pool = ThreadPoolExecutor(max_workers=DDI_JOB_WORKERS, thread_name_prefix="ddi-job")
+
+
+def submit_job(user, drug1: str, drug2: str) -> DDIJob:
+    """
+    Creates a job for an already-normalized pair and returns immediately.
+    Cache hits are completed inline; misses are queued on the local pool.
+    """
+    from .views import _cached_result, _log_check
+
+    cached, source, _ = _cached_result(drug1, drug2)
+    if cached is not None:
+        _log_check(user, drug1, drug2, cached, status="success", cache_source=source)
+        now = timezone.now()
+        return DDIJob.objects.create(
+            user=user, drug1=drug1, drug2=drug2,
+            status=DDIJob.STATUS_DONE,
+            result=_job_result(drug1, drug2, cached, "success", cached=True),
+            started_at=now, finished_at=now,
+        )
+
+    job = DDIJob.objects.create(user=user, drug1=drug1, drug2=drug2)
+    transaction.on_commit(lambda: _job_pool.submit(_run_job, job.pk))
+    return job
+
+
+def refresh_job(job: DDIJob) -> DDIJob:
+    """Marks a job failed if it has been queued/running for too long."""
+    if job.is_finished:
+        return job
+    since = job.started_at or job.created_at
+    if timezone.now() - since > timedelta(seconds=DDI_JOB_STALE_S):
+        updated = DDIJob.objects.filter(pk=job.pk, status=job.status).update(
+            status=DDIJob.STATUS_FAILED,
+            error_message="Job was interrupted before finishing; please resubmit.",
+            finished_at=timezone.now(),
+        )
+        if updated:
+            job.refresh_from_db()
+    return job
+
+
+def _run_job(job_id) -> None:
+    from .views import _finish_pair, _model_pool
+
+    # Worker threads get their own DB connection; release it when done.
+    close_old_connections()
+    try:
+        claimed = DDIJob.objects.filter(pk=job_id, status=DDIJob.STATUS_QUEUED).update(
+            status=DDIJob.STATUS_RUNNING, started_at=timezone.now()
+        )
+        if not claimed:
+            return
+        job = DDIJob.objects.select_related("user").get(pk=job_id)
+        try:
+            result, check_status, source = _finish_pair(job.user, job.drug1, job.drug2, _model_pool)
+        except Exception as e:
+            logger.exception("DDI job %s failed", job_id)
+            DDIJob.objects.filter(pk=job_id).update(
+                status=DDIJob.STATUS_FAILED, error_message=str(e), finished_at=timezone.now()
+            )
+            return
+        DDIJob.objects.filter(pk=job_id).update(
+            status=DDIJob.STATUS_DONE,
+            result=_job_result(job.drug1, job.drug2, result, check_status, cached=bool(source)),
+            finished_at=timezone.now(),
+        )
+    finally:
+        connections.close_all()
+
+
+def _job_result(drug1: str, drug2: str, result: Dict[str, str], check_status: str,
+                *, cached: bool) -> Dict[str, Any]:
+    return {"drug1": drug1, "drug2": drug2, **result, "status": check_status, "cached": cached}
+
+
+def job_payload(job: DDIJob) -> Dict[str, Optional[Any]]:
+    return {
+        "id": str(job.pk),
+        "status": job.status,
+        "drug1": job.drug1,
+        "drug2": job.drug2,
+        "result": job.result,
+        "error": job.error_message or None,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
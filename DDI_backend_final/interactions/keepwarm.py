@@ -0,0 +1,169 @@
+# interactions/keepwarm.py
+import os
+import time
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .client_pool import HF_TOKEN
+from .backends import get_backend, space_base_url
+
+logger = logging.getLogger(__name__)
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+# 0 disables the in-process scheduler; `manage.py ddi_keepwarm` works regardless
+DDI_KEEPWARM_INTERVAL_S = int(os.getenv("DDI_KEEPWARM_INTERVAL_S", "0"))
+DDI_KEEPWARM_TIMEOUT_S  = float(os.getenv("DDI_KEEPWARM_TIMEOUT_S", "60"))
+# a ping slower than this means the Space had to wake up
+DDI_WARM_THRESHOLD_S    = float(os.getenv("DDI_WARM_THRESHOLD_S", "10"))
+
+WARM, COLD, UNKNOWN = "warm", "cold", "unknown"
+
+
+# Cache backends that live inside one process
+_LOCAL_CACHES = ("django.core.cache.backends.locmem.LocMemCache", "django.core.cache.backends.dummy.DummyCache")
+
+
+def shared_cache() -> bool:
+    """Whether warm/cold state written here is seen by the web workers (REDIS_URL set)."""
+    return settings.CACHES["default"]["BACKEND"] not in _LOCAL_CACHES
+
+def _state_key(target: str) -> str:
+    return f"ddi:warmth:{hashlib.sha1(target.encode()).hexdigest()}"
+
+def _state_ttl_s() -> int:
+    # forget a target's state if nobody has pinged it for a few intervals
+    return max(3 * DDI_KEEPWARM_INTERVAL_S, 900)
+
+def configured_targets() -> List[str]:
+    """Every Space target the gateway may call, de-duplicated."""
+    from .gateway import MODELS
+
+    seen: List[str] = []
+    for model in MODELS:
+        for _, target in model.targets():
+            if target and target not in seen:
+                seen.append(target)
+    return seen
+
+
+def ping_target(target: str) -> Dict[str, Any]:
+    """
+    Wakes one Space (GET /config, which blocks through a cold start), then
+    lets the model backend connect (gradio pre-builds its pooled client) and
+    the gateway resolve the endpoint signature, so user requests skip both.
+    A Space that had to wake up may have been redeployed, so its signature
+    is resolved afresh. Records wake latency and warm/cold state in the
+    shared cache.
+    """
+    headers = {"Authorization": f"Bearer {HF_TOKEN}"} if HF_TOKEN else {}
+    started = time.monotonic()
+    error = ""
+    try:
+        with httpx.Client(timeout=DDI_KEEPWARM_TIMEOUT_S, follow_redirects=True) as h:
+            r = h.get(f"{space_base_url(target)}/config", headers=headers)
+        ok = r.status_code < 500
+        if not ok:
+            error = f"HTTP {r.status_code}"
+        else:
+            get_backend().connect(target)
+            _discover(target, again=time.monotonic() - started > DDI_WARM_THRESHOLD_S)
+    except Exception as e:
+        ok = False
+        error = str(e)
+    wake_s = time.monotonic() - started
+
+    state = {
+        "target": target,
+        "state": WARM if ok and wake_s <= DDI_WARM_THRESHOLD_S else COLD,
+        "reachable": ok,
+        "wake_s": round(wake_s, 3),
+        "error": error,
+        "checked_at": timezone.now().isoformat(),
+    }
+    try:
+        cache.set(_state_key(target), state, timeout=_state_ttl_s())
+    except Exception as e:
+        logger.warning("Could not store keep-warm state for %s: %s", target, e)
+    log = logger.info if ok else logger.warning
+    log("Keep-warm %s: %s in %.2fs %s", target, state["state"], wake_s, error)
+    return state
+
+
+def _discover(target: str, again: bool = False) -> None:
+    from .gateway import MODELS, gateway
+
+    if again:
+        gateway.forget(target)
+    for model in MODELS:
+        if target in (t for _, t in model.targets()) and gateway.known_signature(model, target) is None:
+            gateway.discover(model, target)
+
+
+def ping_all() -> List[Dict[str, Any]]:
+    return [ping_target(t) for t in configured_targets()]
+
+
+def target_state(target: str) -> Optional[Dict[str, Any]]:
+    try:
+        return cache.get(_state_key(target))
+    except Exception:
+        return None
+
+
+def order_targets(attempts_targets: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """Stable sort: warm targets first, unknown next, cold last."""
+    rank = {WARM: 0, UNKNOWN: 1, COLD: 2}
+
+    def key(item):
+        state = target_state(item[1]) or {}
+        return rank.get(state.get("state", UNKNOWN), 1)
+
+    return sorted(attempts_targets, key=key)
+
+
+def snapshot() -> Dict[str, Any]:
+    return {t: target_state(t) or {"state": UNKNOWN} for t in configured_targets()}
+
+
+# -----------------------------------------------------------------------------
+# Background scheduler (one daemon thread per process, one ping per interval
+# across workers when the cache is shared)
+# -----------------------------------------------------------------------------
+_scheduler: Optional[threading.Thread] = None
+_scheduler_lock = threading.Lock()
+
+
+def _scheduler_loop(interval_s: int) -> None:
+    while True:
+        try:
+            # cache.add makes sure only one worker pings per interval
+            if cache.add("ddi:keepwarm:tick", True, timeout=max(1, interval_s - 1)):
+                ping_all()
+        except Exception:
+            logger.exception("Keep-warm tick failed")
+        time.sleep(interval_s)
+
+
+def start_background_scheduler() -> bool:
+    global _scheduler
+    if DDI_KEEPWARM_INTERVAL_S <= 0:
+        return False
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return False
+        _scheduler = threading.Thread(
+            target=_scheduler_loop, args=(DDI_KEEPWARM_INTERVAL_S,),
+            name="ddi-keepwarm", daemon=True,
+        )
+        _scheduler.start()
+    logger.info("Keep-warm scheduler started (every %ss)", DDI_KEEPWARM_INTERVAL_S)
+    return True
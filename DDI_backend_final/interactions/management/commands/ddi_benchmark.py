@@ -0,0 +1,175 @@
+import json
+import logging
+import subprocess
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from interactions import benchmark
+from interactions.backends import (
+    DDI_FAKE_ERROR_RATE, DDI_FAKE_LATENCY_MS, DDI_FAKE_LATENCY_SIGMA, DDI_FAKE_TIMEOUT_RATE,
+    FakeBackend, set_backend,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the DDI endpoints under cold-cache, warm-cache and mixed load and print a JSON report '
+        '(throughput, p50/p95/p99 latency, DB queries per request, model pool saturation). '
+        'Runs in-process against the fake backend and a throwaway test database unless --url is given; '
+        'in-process runs also check that the dashboard and cache queries use their indexes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workloads', default='cold,warm,mixed',
+                            help=f'Comma-separated, from {", ".join(benchmark.WORKLOADS)} (default cold,warm,mixed)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per workload (default 200)')
+        parser.add_argument('--concurrency', type=int, default=16, help='Requests in flight (default 16)')
+        parser.add_argument('--warm-pairs', type=int, default=50, help='Size of the primed pair set (default 50)')
+        parser.add_argument('--hit-ratio', type=float, default=0.8, help='Warm share of the mixed workload')
+        parser.add_argument('--batch-size', type=int, default=5, help='Drugs per regimen in the batch workload')
+        parser.add_argument('--seed', type=int, help='Seed for workload mix and fake backend')
+        fake = parser.add_argument_group('fake backend (in-process runs)')
+        fake.add_argument('--latency-ms', type=float, default=DDI_FAKE_LATENCY_MS)
+        fake.add_argument('--sigma', type=float, default=DDI_FAKE_LATENCY_SIGMA)
+        fake.add_argument('--error-rate', type=float, default=DDI_FAKE_ERROR_RATE)
+        fake.add_argument('--timeout-rate', type=float, default=DDI_FAKE_TIMEOUT_RATE)
+        fake.add_argument('--use-current-db', action='store_true',
+                          help='Log checks into the configured database instead of a test database')
+        live = parser.add_argument_group('live server')
+        live.add_argument('--url', help='Benchmark a running server instead, e.g. http://127.0.0.1:8000')
+        live.add_argument('--token', help='JWT access token (needed for the batch workload)')
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+        parser.add_argument('--compare', help='Earlier JSON report; adds per-workload deltas')
+
+    def handle(self, *args, **options):
+        workloads = [w.strip() for w in options['workloads'].split(',') if w.strip()]
+        unknown = sorted(set(workloads) - set(benchmark.WORKLOADS))
+        if unknown:
+            raise CommandError(f'Unknown workloads: {", ".join(unknown)}')
+        if options['url'] and 'batch' in workloads and not options['token']:
+            raise CommandError('The batch workload needs --token against a live server')
+        if options['verbosity'] < 2:
+            # one INFO line per Space attempt would drown the report
+            logging.getLogger('interactions').setLevel(logging.WARNING)
+
+        builder = benchmark.WorkloadBuilder(
+            options['requests'], warm_pairs=options['warm_pairs'], hit_ratio=options['hit_ratio'],
+            batch_size=options['batch_size'], seed=options['seed'],
+        )
+        if options['url']:
+            report = self._run(builder, workloads, options,
+                               benchmark.http_sender(options['url'], options['token']), in_process=False)
+        else:
+            report = self._run_in_process(builder, workloads, options)
+
+        if options['compare']:
+            baseline = json.loads(Path(options['compare']).read_text())
+            report['comparison'] = {'baseline': baseline.get('meta', {}), 'workloads': benchmark.compare(report, baseline)}
+
+        text = json.dumps(report, indent=2)
+        if options['output']:
+            Path(options['output']).write_text(text + '\n')
+            self.stderr.write(f"Report written to {options['output']}")
+        else:
+            self.stdout.write(text)
+
+    def _run_in_process(self, builder, workloads, options):
+        from django.test.utils import (
+            setup_databases, setup_test_environment, teardown_databases, teardown_test_environment,
+        )
+        from accounts.models import User
+        from interactions.cache import result_cache
+
+        old_config = None
+        setup_test_environment()
+        try:
+            if not options['use_current_db']:
+                if connection.vendor == 'sqlite':
+                    # the default in-memory test DB locks whole tables under concurrent writers
+                    test_settings = connection.settings_dict.setdefault('TEST', {})
+                    test_settings['NAME'] = test_settings.get('NAME') or str(
+                        Path(tempfile.gettempdir()) / f'ddi_benchmark_{builder.tag}.sqlite3')
+                old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+            set_backend(FakeBackend(
+                latency_ms=options['latency_ms'], sigma=options['sigma'], error_rate=options['error_rate'],
+                timeout_rate=options['timeout_rate'],
+                seed=None if options['seed'] is None else str(options['seed']),
+            ))
+            result_cache.clear()
+            user = User.objects.create_user(f'bench-{builder.tag}@example.com')
+            try:
+                report = self._run(builder, workloads, options, benchmark.in_process_sender(user), in_process=True)
+                report['query_plans'] = plans = benchmark.query_plans([user.pk])
+                for plan in plans:
+                    used = ', '.join(plan['indexes_used']) or 'no index'
+                    self.stderr.write(
+                        f"{plan['query']}: {'FULL SCAN' if plan['full_scan'] else used} (meant for {plan['index']})"
+                    )
+                return report
+            finally:
+                if options['use_current_db']:
+                    user.delete()
+        finally:
+            set_backend(None)
+            result_cache.clear()
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def _run(self, builder, workloads, options, send, in_process):
+        if any(w != 'cold' for w in workloads):
+            primed = benchmark.run_requests(builder.prime(), send, options['concurrency'])
+            self.stderr.write(f"Primed {primed['requests']} warm pairs in {primed['wall_s']}s")
+
+        results = []
+        for name in workloads:
+            stats = benchmark.run_workload(name, builder, send, options['concurrency'], sample_saturation=in_process)
+            self.stderr.write(
+                f"{name}: {stats['throughput_rps']} req/s, p50 {stats['latency_ms']['p50']} ms, "
+                f"p95 {stats['latency_ms']['p95']} ms, p99 {stats['latency_ms']['p99']} ms"
+            )
+            results.append(stats)
+
+        return {'meta': self._meta(options, in_process), 'workloads': results}
+
+    @staticmethod
+    def _meta(options, in_process):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5,
+            ).stdout.strip() or None
+        except Exception:
+            commit = None
+        from interactions.views import DDI_MODEL_WORKERS
+
+        meta = {
+            'commit': commit,
+            'finished_at': timezone.now().isoformat(),
+            'mode': 'in-process' if in_process else 'live',
+            'target': options['url'] if not in_process else None,
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'warm_pairs': options['warm_pairs'],
+            'hit_ratio': options['hit_ratio'],
+            'batch_size': options['batch_size'],
+            'seed': options['seed'],
+        }
+        if in_process:
+            from interactions.gateway import gateway
+
+            meta.update({
+                'database': connection.vendor,
+                'model_workers': DDI_MODEL_WORKERS,
+                'gateway': gateway.stats(),
+                'fake_backend': {
+                    'latency_ms': options['latency_ms'], 'sigma': options['sigma'],
+                    'error_rate': options['error_rate'], 'timeout_rate': options['timeout_rate'],
+                },
+            })
+        return meta
@@ -0,0 +1,122 @@
+import json
+import time
+import uuid
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from interactions.backends import (
+    DDI_FAKE_ERROR_RATE, DDI_FAKE_LATENCY_MS, DDI_FAKE_LATENCY_SIGMA, DDI_FAKE_SEED,
+    DDI_FAKE_TIMEOUT_RATE, FakeBackend,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a local stand-in for the Freda/Bernice Spaces that speaks Gradio's REST queue API "
+        "(POST <prefix>/call/<api>, then stream GET <prefix>/call/<api>/<event_id>). "
+        "Point FREDA_URL/BERNICE_URL at it with DDI_MODEL_BACKEND=http."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=7861)
+        parser.add_argument('--latency-ms', type=float, default=DDI_FAKE_LATENCY_MS, help='Median latency')
+        parser.add_argument('--sigma', type=float, default=DDI_FAKE_LATENCY_SIGMA, help='Lognormal spread')
+        parser.add_argument('--error-rate', type=float, default=DDI_FAKE_ERROR_RATE)
+        parser.add_argument('--timeout-rate', type=float, default=DDI_FAKE_TIMEOUT_RATE,
+                            help='Share of calls that never answer')
+        parser.add_argument('--seed', default=DDI_FAKE_SEED)
+        parser.add_argument('--gradio4', action='store_true',
+                            help='Serve only the Gradio 4 paths (/call/...), not /gradio_api/call/...')
+
+    def handle(self, *args, **options):
+        fake = FakeBackend(
+            latency_ms=options['latency_ms'], sigma=options['sigma'],
+            error_rate=options['error_rate'], timeout_rate=options['timeout_rate'], seed=options['seed'],
+        )
+        prefixes = ('/call',) if options['gradio4'] else ('/gradio_api/call', '/call')
+        events = {}
+        events_lock = threading.Lock()
+        stdout = self.stdout
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def _json(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _route(self):
+                for prefix in prefixes:
+                    if self.path.startswith(prefix + '/'):
+                        return self.path[len(prefix) + 1:].split('?', 1)[0].split('/')
+                return None
+
+            def do_POST(self):
+                parts = self._route()
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                if not parts or len(parts) != 1:
+                    return self._json(404, {'detail': 'Not Found'})
+                event_id = uuid.uuid4().hex
+                with events_lock:
+                    events[event_id] = ('/' + parts[0], body.get('data') or [''])
+                self._json(200, {'event_id': event_id})
+
+            def do_GET(self):
+                path = self.path.split('?', 1)[0]
+                if path in ('/', '/config'):
+                    return self._json(200, {'version': 'fake', 'api_prefix': prefixes[0].rsplit('/call', 1)[0]})
+                if path in tuple(p.rsplit('/call', 1)[0] + '/info' for p in prefixes):
+                    return self._json(200, FakeBackend.api_info())
+                parts = self._route()
+                with events_lock:
+                    event = events.pop(parts[1], None) if parts and len(parts) == 2 else None
+                if event is None:
+                    return self._json(404, {'detail': 'Not Found'})
+                api_name, data = event
+                value = str(data[0]) if data else ''
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Cache-Control', 'no-cache')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                outcome, latency_s = fake.plan(api_name, value)
+                time.sleep(latency_s)
+                if outcome == 'ok':
+                    try:
+                        out = fake.output(api_name, value)
+                        payload = json.dumps(list(out) if isinstance(out, tuple) else [out])
+                        message = f'event: complete\ndata: {payload}\n\n'
+                    except ValueError as e:
+                        outcome, message = 'error', f'event: error\ndata: {json.dumps(str(e))}\n\n'
+                else:
+                    message = 'event: error\ndata: null\n\n'
+                self.wfile.write(message.encode())
+                self.wfile.flush()
+                self.close_connection = True
+
+            def log_message(self, fmt, *args):
+                stdout.write(f'{self.address_string()} {fmt % args}')
+
+        server = ThreadingHTTPServer((options['host'], options['port']), Handler)
+        server.daemon_threads = True
+        url = f"http://{options['host']}:{options['port']}"
+        self.stdout.write(self.style.SUCCESS(
+            f"Fake Space on {url} (median {options['latency_ms']:.0f} ms, "
+            f"errors {options['error_rate']:.0%}, hangs {options['timeout_rate']:.0%}); "
+            f"set FREDA_URL={url} BERNICE_URL={url} DDI_MODEL_BACKEND=http"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
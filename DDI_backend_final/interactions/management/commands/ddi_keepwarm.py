@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from interactions.keepwarm import DDI_KEEPWARM_INTERVAL_S, ping_all, shared_cache
+
+
+class Command(BaseCommand):
+    help = 'Ping every configured HF Space so it stays awake; records warm/cold state and wake latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=DDI_KEEPWARM_INTERVAL_S or 600,
+                            help='Seconds between rounds (default: DDI_KEEPWARM_INTERVAL_S or 600)')
+        parser.add_argument('--once', action='store_true', help='Run a single round and exit')
+        parser.add_argument('--local', action='store_true',
+                            help='Run without a shared cache: the Spaces are woken, but the web workers '
+                                 'never see the warm/cold state recorded here')
+
+    def handle(self, *args, **options):
+        # the state is handed to the web workers through Django's cache
+        if not shared_cache():
+            if not options['local']:
+                raise CommandError('ddi_keepwarm needs a cache shared with the web workers; set REDIS_URL '
+                                   '(or pass --local to only wake the Spaces)')
+            self.stdout.write(self.style.WARNING('No shared cache: warm/cold state stays in this process'))
+        interval = max(1, options['interval'])
+        while True:
+            for state in ping_all():
+                line = f"{state['target']}: {state['state']} in {state['wake_s']:.2f}s"
+                if state['error']:
+                    self.stdout.write(self.style.WARNING(f"{line} ({state['error']})"))
+                else:
+                    self.stdout.write(self.style.SUCCESS(line))
+            if options['once']:
+                return
+            time.sleep(interval)
@@ -0,0 +1,73 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from interactions import precompute
+from interactions.views import DDI_MODEL_VERSION
+
+
+class Command(BaseCommand):
+    help = 'Precompute DDI results for common drug pairs so DDICheckView can serve them without calling the Spaces'
+
+    def add_arguments(self, parser):
+        source = parser.add_mutually_exclusive_group()
+        source.add_argument('--drugs', type=str, help='Comma-separated drug names; every pair is precomputed')
+        source.add_argument('--from-drug-table', action='store_true',
+                            help='Use every pair of drugs.Drug names (see --limit)')
+        source.add_argument('--top-checked', type=int, metavar='N',
+                            help='Use the N most frequently checked pairs in DDICheck')
+        parser.add_argument('--limit', type=int, help='Only the first N drugs of the drug table')
+        parser.add_argument('--days', type=int, default=30,
+                            help='Window for --top-checked, and for --report (default 30)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Pairs in flight at once (default 4)')
+        parser.add_argument('--dry-run', action='store_true', help='List the pairs that would be computed')
+        parser.add_argument('--report', action='store_true',
+                            help='Print how many live checks were served from the precomputed table')
+
+    def handle(self, *args, **options):
+        if options['report']:
+            self._report(options['days'])
+            if not (options['drugs'] or options['from_drug_table'] or options['top_checked']):
+                return
+
+        if options['drugs']:
+            pairs = precompute.pairs_from_drugs(options['drugs'].split(','))
+        elif options['from_drug_table']:
+            pairs = precompute.pairs_from_drug_table(options['limit'])
+        elif options['top_checked']:
+            pairs = precompute.top_checked_pairs(options['top_checked'], options['days'])
+        else:
+            raise CommandError('Give --drugs, --from-drug-table or --top-checked (or --report)')
+
+        # Resume: pairs already stored for this model version are skipped
+        todo = precompute.missing_pairs(pairs, DDI_MODEL_VERSION)
+        self.stdout.write(
+            f'{len(pairs)} pairs, {len(pairs) - len(todo)} already precomputed, '
+            f'{len(todo)} to compute (model version {DDI_MODEL_VERSION})'
+        )
+        if options['dry_run']:
+            for d1, d2 in todo:
+                self.stdout.write(f'  {d1} + {d2}')
+            return
+        if not todo:
+            return
+
+        def progress(pair, check_status, error_msg):
+            line = f'{pair[0]} + {pair[1]}: {check_status}'
+            if check_status == 'success':
+                self.stdout.write(line)
+            else:
+                self.stdout.write(self.style.WARNING(f'{line} ({error_msg})'))
+
+        counts = precompute.precompute_pairs(todo, DDI_MODEL_VERSION, options['concurrency'], progress)
+        style = self.style.SUCCESS if not counts['failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f"Stored {counts['stored']} pairs, {counts['failed']} failed"
+            + (' (re-run to retry them)' if counts['failed'] else '')
+        ))
+
+    def _report(self, days):
+        stats = precompute.coverage(DDI_MODEL_VERSION, days)
+        self.stdout.write(
+            f"Last {stats['days']} days: {stats['precomputed']} of {stats['checks']} checks "
+            f"served from precompute ({stats['coverage']:.1%}); "
+            f"{stats['pairs_stored']} pairs stored for model version {DDI_MODEL_VERSION}"
+        )
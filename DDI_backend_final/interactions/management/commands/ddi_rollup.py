@@ -0,0 +1,38 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from interactions import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the DailyDDIStats rollups the admin dashboard reads (default: yesterday and today). '
+        'Days are recomputed whole, so re-running is safe; run it from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2, help='Roll up the last N days, today included (default 2)')
+        parser.add_argument('--since', help='Backfill every day from YYYY-MM-DD through today')
+        parser.add_argument('--all', action='store_true', help='Backfill from the first logged check')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        if options['all']:
+            first = rollups.first_check_day()
+            if first is None:
+                self.stdout.write('No checks logged yet')
+                return
+        elif options['since']:
+            try:
+                first = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since expects YYYY-MM-DD')
+        else:
+            first = today - timedelta(days=max(1, options['days']) - 1)
+
+        days = rollups.days_since(first, today)
+        for day, rows in rollups.rollup_days(days).items():
+            self.stdout.write(f'{day}: {rows} hospital rows')
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {len(days)} days'))
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ddicheck',
+            name='cache_source',
+            field=models.CharField(blank=True, choices=[('', 'Live'), ('memory', 'Memory cache'), ('db', 'Database cache')], max_length=20),
+        ),
+        migrations.AddField(
+            model_name='ddicheck',
+            name='model_version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
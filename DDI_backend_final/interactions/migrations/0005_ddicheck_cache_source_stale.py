@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0004_ddicheck_cache_source_coalesced'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ddicheck',
+            name='cache_source',
+            field=models.CharField(blank=True, choices=[('', 'Live'), ('memory', 'Memory cache'), ('db', 'Database cache'), ('coalesced', 'Coalesced'), ('stale', 'Stale cache')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0005_ddicheck_cache_source_stale'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ddicheck',
+            name='cache_source',
+            field=models.CharField(blank=True, choices=[('', 'Live'), ('memory', 'Memory cache'), ('db', 'Database cache'), ('precomputed', 'Precomputed'), ('coalesced', 'Coalesced'), ('stale', 'Stale cache')], max_length=20),
+        ),
+        migrations.CreateModel(
+            name='PrecomputedInteraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drug1', models.CharField(max_length=255)),
+                ('drug2', models.CharField(max_length=255)),
+                ('severity', models.CharField(max_length=100)),
+                ('description', models.TextField(blank=True)),
+                ('extended_explanation', models.TextField(blank=True)),
+                ('recommendation', models.TextField(blank=True)),
+                ('model_version', models.CharField(max_length=64)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['drug1', 'drug2'],
+                'unique_together': {('drug1', 'drug2', 'model_version')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0006_precomputedinteraction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ddicheck',
+            name='cache_source',
+            field=models.CharField(blank=True, choices=[('', 'Live'), ('memory', 'Memory cache'), ('db', 'Database cache'), ('precomputed', 'Precomputed'), ('coalesced', 'Coalesced'), ('stale', 'Stale cache'), ('negative', 'Cached failure'), ('refresh', 'Background refresh')], max_length=20),
+        ),
+    ]
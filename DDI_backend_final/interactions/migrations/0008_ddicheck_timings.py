@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0007_ddicheck_cache_source_negative_refresh'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ddicheck',
+            name='timings',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
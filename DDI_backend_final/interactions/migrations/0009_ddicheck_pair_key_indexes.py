@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0008_ddicheck_timings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ddicheck',
+            name='pair_key',
+            field=models.CharField(blank=True, editable=False, max_length=511),
+        ),
+        migrations.AddIndex(
+            model_name='ddicheck',
+            index=models.Index(fields=['user', 'created_at'], name='ddicheck_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddicheck',
+            index=models.Index(fields=['status', 'created_at'], name='ddicheck_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ddicheck',
+            index=models.Index(fields=['pair_key', 'created_at'], name='ddicheck_pair_created_idx'),
+        ),
+    ]
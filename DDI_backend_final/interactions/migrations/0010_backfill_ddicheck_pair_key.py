@@ -0,0 +1,36 @@
+from django.db import migrations
+
+BATCH_SIZE = 2000
+
+
+def _pair_key(drug1, drug2):
+    # frozen copy of interactions.utils.pair_key
+    a, b = sorted(" ".join(d.strip().lower().split()) for d in (drug1, drug2))
+    return f"{a}|{b}"
+
+
+def backfill_pair_key(apps, schema_editor):
+    DDICheck = apps.get_model('interactions', 'DDICheck')
+    rows = DDICheck.objects.filter(pair_key='').only('id', 'drug1', 'drug2').order_by('pk')
+    last_pk = None
+    # keyset batches rather than one cursor: SQLite doesn't isolate a read
+    # from writes to the same table on one connection
+    while True:
+        batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:BATCH_SIZE])
+        if not batch:
+            return
+        for row in batch:
+            row.pair_key = _pair_key(row.drug1, row.drug2)
+        DDICheck.objects.bulk_update(batch, ['pair_key'])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0009_ddicheck_pair_key_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_pair_key, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0010_backfill_ddicheck_pair_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InteractionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pair_key', models.CharField(max_length=511)),
+                ('model_version', models.CharField(blank=True, max_length=64)),
+                ('digest', models.CharField(max_length=64)),
+                ('severity', models.TextField(blank=True)),
+                ('description', models.TextField(blank=True)),
+                ('extended_explanation', models.TextField(blank=True)),
+                ('recommendation', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'unique_together': {('pair_key', 'model_version', 'digest')},
+            },
+        ),
+        migrations.AddField(
+            model_name='ddicheck',
+            name='result',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='checks', to='interactions.interactionresult'),
+        ),
+    ]
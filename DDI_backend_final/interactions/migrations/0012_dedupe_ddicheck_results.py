@@ -0,0 +1,93 @@
+import hashlib
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 2000
+FIELDS = ('severity', 'description', 'extended_explanation', 'recommendation')
+TEXT_FIELDS = FIELDS[1:]  # the columns leaving DDICheck
+
+
+def _digest(content):
+    # frozen copy of InteractionResult.content_digest
+    return hashlib.sha256("\x1f".join(content[f] for f in FIELDS).encode()).hexdigest()
+
+
+def _size(content, fields):
+    return sum(len(content[f].encode()) for f in fields)
+
+
+def dedupe_results(apps, schema_editor):
+    """
+    Points every check at one shared InteractionResult per distinct text,
+    then logs how much result text the check log no longer carries.
+    """
+    DDICheck = apps.get_model('interactions', 'DDICheck')
+    InteractionResult = apps.get_model('interactions', 'InteractionResult')
+
+    ids = {}  # (pair_key, model_version, digest) -> InteractionResult id
+    checks = stored = text_before = text_after = 0
+    rows = (
+        DDICheck.objects.filter(result__isnull=True)
+        .only('id', 'pair_key', 'model_version', 'created_at', *FIELDS).order_by('pk')
+    )
+    last_pk = None
+    while True:
+        batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:BATCH_SIZE])
+        if not batch:
+            break
+        for row in batch:
+            content = {f: getattr(row, f) or '' for f in FIELDS}
+            key = (row.pair_key, row.model_version, _digest(content))
+            if key not in ids:
+                result, created = InteractionResult.objects.get_or_create(
+                    pair_key=key[0], model_version=key[1], digest=key[2],
+                    defaults=dict(content, created_at=row.created_at),
+                )
+                ids[key] = result.pk
+                if created:
+                    stored += 1
+                    text_after += _size(content, TEXT_FIELDS)
+            row.result_id = ids[key]
+            text_before += _size(content, TEXT_FIELDS)
+            checks += 1
+        DDICheck.objects.bulk_update(batch, ['result'])
+        last_pk = batch[-1].pk
+
+    if checks:
+        saved = text_before - text_after
+        logger.info(
+            "DDICheck: %d rows now share %d InteractionResult rows; %.1f MB of result text stored once "
+            "as %.1f MB (%.1f MB, %.0f%% saved). Postgres returns the space after "
+            "VACUUM FULL interactions_ddicheck.",
+            checks, stored, text_before / 1e6, text_after / 1e6, saved / 1e6,
+            saved / text_before * 100 if text_before else 0,
+        )
+
+
+def restore_texts(apps, schema_editor):
+    DDICheck = apps.get_model('interactions', 'DDICheck')
+    rows = DDICheck.objects.filter(result__isnull=False).select_related('result').order_by('pk')
+    last_pk = None
+    while True:
+        batch = list((rows if last_pk is None else rows.filter(pk__gt=last_pk))[:BATCH_SIZE])
+        if not batch:
+            return
+        for row in batch:
+            for f in TEXT_FIELDS:
+                setattr(row, f, getattr(row.result, f))
+        DDICheck.objects.bulk_update(batch, list(TEXT_FIELDS))
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0011_interactionresult'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_results, restore_texts),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('interactions', '0012_dedupe_ddicheck_results'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='ddicheck',
+            name='description',
+        ),
+        migrations.RemoveField(
+            model_name='ddicheck',
+            name='extended_explanation',
+        ),
+        migrations.RemoveField(
+            model_name='ddicheck',
+            name='recommendation',
+        ),
+        migrations.AlterField(
+            model_name='ddicheck',
+            name='result',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='checks', to='interactions.interactionresult'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.6 on 2026-10-17 20:49
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_enable_2fa_for_existing_users'),
+        ('interactions', '0013_ddicheck_result_required'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDDIStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('checks', models.PositiveIntegerField(default=0)),
+                ('errors', models.PositiveIntegerField(default=0)),
+                ('unique_users', models.PositiveIntegerField(default=0)),
+                ('severity', models.JSONField(blank=True, default=dict)),
+                ('latency_p50_ms', models.FloatField(blank=True, null=True)),
+                ('latency_p95_ms', models.FloatField(blank=True, null=True)),
+                ('latency_p99_ms', models.FloatField(blank=True, null=True)),
+                ('computed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('hospital', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ddi_daily_stats', to='accounts.hospital')),
+            ],
+            options={
+                'verbose_name_plural': 'Daily DDI stats',
+                'ordering': ['-date'],
+                'unique_together': {('hospital', 'date')},
+            },
+        ),
+    ]
@@ -1,31 +1,227 @@
+import uuid
+import hashlib
+
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
+from .utils import pair_key
+
+
+class InteractionResult(models.Model):
+    """
+    Result texts for one pair and model version, stored once and shared by
+    every DDICheck that returned them. `digest` tells apart different texts
+    for the same pair (a retrained Space behind the same version, failures).
+    """
+    pair_key = models.CharField(max_length=511)
+    model_version = models.CharField(max_length=64, blank=True)
+    digest = models.CharField(max_length=64)
+    severity = models.TextField(blank=True)
+    description = models.TextField(blank=True)
+    extended_explanation = models.TextField(blank=True)
+    recommendation = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    FIELDS = ('severity', 'description', 'extended_explanation', 'recommendation')
+
+    class Meta:
+        unique_together = [('pair_key', 'model_version', 'digest')]
+
+    def __str__(self):
+        return f"{self.pair_key} ({self.severity[:40]})"
+
+    @classmethod
+    def content_digest(cls, result):
+        return hashlib.sha256("\x1f".join(str(result.get(f, "") or "") for f in cls.FIELDS).encode()).hexdigest()
+
+    @classmethod
+    def store(cls, drug1, drug2, model_version, result):
+        """The shared row holding these texts, created on first use."""
+        content = {f: str(result.get(f, "") or "") for f in cls.FIELDS}
+        row, _ = cls.objects.get_or_create(
+            pair_key=pair_key(drug1, drug2), model_version=model_version,
+            digest=cls.content_digest(content), defaults=content,
+        )
+        return row
+
+    @classmethod
+    def store_many(cls, model_version, items):
+        """
+        store() for many (drug1, drug2, result) at once, in order: one query
+        for the rows that exist, one insert (and re-read) for the others.
+        The rows returned only carry their keys.
+        """
+        wanted = []
+        for drug1, drug2, result in items:
+            content = {f: str(result.get(f, "") or "") for f in cls.FIELDS}
+            wanted.append((pair_key(drug1, drug2), cls.content_digest(content), content))
+
+        def existing():
+            rows = cls.objects.filter(
+                model_version=model_version,
+                pair_key__in={key for key, _, _ in wanted}, digest__in={digest for _, digest, _ in wanted},
+            ).only('id', 'pair_key', 'digest')
+            return {(row.pair_key, row.digest): row for row in rows}
+
+        found = existing()
+        missing = {(key, digest): content for key, digest, content in wanted if (key, digest) not in found}
+        if missing:
+            # a concurrent writer may insert the same row: keep theirs
+            cls.objects.bulk_create([
+                cls(pair_key=key, model_version=model_version, digest=digest, **content)
+                for (key, digest), content in missing.items()
+            ], ignore_conflicts=True)
+            found = existing()
+        return [found[(key, digest)] for key, digest, _ in wanted]
+
+    def as_dict(self):
+        return {f: getattr(self, f) for f in self.FIELDS}
+
 
 class DDICheck(models.Model):
     """Log of DDI checks performed by users"""
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='ddi_checks')
     drug1 = models.CharField(max_length=255)
     drug2 = models.CharField(max_length=255)
+    # Normalized, order-independent "drug_a|drug_b" (utils.pair_key), set on save
+    pair_key = models.CharField(max_length=511, blank=True, editable=False)
+    # Short label kept on the log for listings; the full texts live in `result`
     severity = models.CharField(max_length=100)
-    description = models.TextField(blank=True)
-    extended_explanation = models.TextField(blank=True)
-    recommendation = models.TextField(blank=True)
+    result = models.ForeignKey(InteractionResult, on_delete=models.PROTECT, related_name='checks')
     status = models.CharField(max_length=20, default='success', choices=[
         ('success', 'Success'),
         ('error', 'Error'),
         ('timeout', 'Timeout'),
     ])
     error_message = models.TextField(blank=True)
+    # Identifies the Freda/Bernice deployment that produced the result; cached
+    # results are only reused for the same version.
+    model_version = models.CharField(max_length=64, blank=True)
+    # Where the result came from: '' (live model call), 'memory' or 'db'
+    # cache, 'precomputed' (PrecomputedInteraction table), 'coalesced' (shared
+    # an identical in-flight call), 'stale' (expired result served while the
+    # Spaces were unavailable), 'negative' (recent failure replayed) or
+    # 'refresh' (background revalidation, not a user check)
+    cache_source = models.CharField(max_length=20, blank=True, choices=[
+        ('', 'Live'),
+        ('memory', 'Memory cache'),
+        ('db', 'Database cache'),
+        ('precomputed', 'Precomputed'),
+        ('coalesced', 'Coalesced'),
+        ('stale', 'Stale cache'),
+        ('negative', 'Cached failure'),
+        ('refresh', 'Background refresh'),
+    ])
+    # Per-stage milliseconds for checks made through DDICheckView, e.g.
+    # {"cache": 1.2, "freda_queue": 8100.0, "freda_inference": 950.3, ...};
+    # see interactions/timing.py
+    timings = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # admin dashboard: a hospital's checks / errors over a time window
+            models.Index(fields=['user', 'created_at'], name='ddicheck_user_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='ddicheck_status_created_idx'),
+            # result cache DB tier: newest result for a pair
+            models.Index(fields=['pair_key', 'created_at'], name='ddicheck_pair_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.drug1} + {self.drug2} by {self.user.email if self.user else 'Anonymous'}"
 
+    def save(self, *args, **kwargs):
+        self.pair_key = pair_key(self.drug1, self.drug2)
+        super().save(*args, **kwargs)
+
+
+class DailyDDIStats(models.Model):
+    """
+    One hospital's DDI checks on one day, rolled up from DDICheck by
+    `manage.py ddi_rollup` (see interactions/rollups.py). hospital is null
+    for anonymous checks, which every hospital's dashboard includes.
+    Background refreshes are not counted.
+    """
+    hospital = models.ForeignKey('accounts.Hospital', on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='ddi_daily_stats')
+    date = models.DateField()
+    checks = models.PositiveIntegerField(default=0)
+    errors = models.PositiveIntegerField(default=0)
+    unique_users = models.PositiveIntegerField(default=0)
+    # {"Major": 12, "Moderate": 30, ...} over successful checks
+    severity = models.JSONField(default=dict, blank=True)
+    # Request latency (DDICheck.timings["total"]) of the checks that recorded it
+    latency_p50_ms = models.FloatField(null=True, blank=True)
+    latency_p95_ms = models.FloatField(null=True, blank=True)
+    latency_p99_ms = models.FloatField(null=True, blank=True)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [('hospital', 'date')]
+        ordering = ['-date']
+        verbose_name_plural = 'Daily DDI stats'
+
+    def __str__(self):
+        return f"{self.hospital or 'Anonymous'} {self.date}: {self.checks} checks"
+
+
+class PrecomputedInteraction(models.Model):
+    """
+    Offline result for a commonly co-prescribed pair (see
+    `manage.py ddi_precompute`). drug1/drug2 are normalized and sorted.
+    """
+    drug1 = models.CharField(max_length=255)
+    drug2 = models.CharField(max_length=255)
+    severity = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    extended_explanation = models.TextField(blank=True)
+    recommendation = models.TextField(blank=True)
+    model_version = models.CharField(max_length=64)
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        unique_together = [('drug1', 'drug2', 'model_version')]
+        ordering = ['drug1', 'drug2']
+
+    def __str__(self):
+        return f"{self.drug1} + {self.drug2} ({self.severity})"
+
+
+class DDIJob(models.Model):
+    """DDI check submitted for background processing (see interactions/jobs.py)"""
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='ddi_jobs')
+    drug1 = models.CharField(max_length=255)
+    drug2 = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, default=STATUS_QUEUED, choices=[
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ])
+    result = models.JSONField(null=True, blank=True)
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.drug1} + {self.drug2} [{self.status}]"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
 
 class ErrorLog(models.Model):
     """Log of system errors for monitoring"""
@@ -0,0 +1,169 @@
+# interactions/precompute.py
+import os
+import logging
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from datetime import timedelta
+from itertools import combinations, islice
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.db import IntegrityError, connections, models
+from django.utils import timezone
+
+from .cache import RESULT_FIELDS
+from .models import DDICheck, PrecomputedInteraction
+from .utils import canonical_pair, normalize_drug
+
+logger = logging.getLogger(__name__)
+
+Pair = Tuple[str, str]
+
+# Offline runs queue at most this many pairs per worker; the rest are only
+# submitted as earlier ones finish
+DDI_PRECOMPUTE_QUEUE_PER_WORKER = int(os.getenv("DDI_PRECOMPUTE_QUEUE_PER_WORKER", "2"))
+
+
+def lookup(drug1: str, drug2: str, version: str) -> Optional[Dict[str, str]]:
+    """Precomputed result for the pair and model version, or None."""
+    return lookup_many([(drug1, drug2)], version).get((drug1, drug2))
+
+
+def lookup_many(pairs: Iterable[Pair], version: str) -> Dict[Pair, Dict[str, str]]:
+    """{pair: result} for the given pairs (in the order given) that are precomputed, in one query."""
+    wanted: Dict[Pair, List[Pair]] = {}
+    for pair in pairs:
+        wanted.setdefault(canonical_pair(*pair), []).append(pair)
+    if not wanted:
+        return {}
+    try:
+        rows = (
+            PrecomputedInteraction.objects
+            .filter(model_version=version,
+                    drug1__in={a for a, _ in wanted}, drug2__in={b for _, b in wanted})
+            .values_list("drug1", "drug2", *RESULT_FIELDS)
+        )
+        found = {}
+        for a, b, *texts in rows:
+            for pair in wanted.get((a, b), ()):
+                found[pair] = dict(zip(RESULT_FIELDS, texts))
+        return found
+    except Exception as e:
+        logger.warning("Precomputed lookup failed: %s", e)
+        return {}
+
+
+# -----------------------------------------------------------------------------
+# Candidate pairs
+# -----------------------------------------------------------------------------
+def pairs_from_drugs(names: Iterable[str]) -> List[Pair]:
+    """Every unordered pair of the given drug names (normalized, de-duplicated)."""
+    drugs = list(dict.fromkeys(n for n in (normalize_drug(x) for x in names) if n))
+    return sorted({canonical_pair(a, b) for a, b in combinations(drugs, 2) if a != b})
+
+
+def pairs_from_drug_table(limit: Optional[int] = None) -> List[Pair]:
+    from drugs.models import Drug
+
+    names = Drug.objects.order_by("name").values_list("name", flat=True)
+    return pairs_from_drugs(names[:limit] if limit else names)
+
+
+def top_checked_pairs(limit: int, days: Optional[int] = None) -> List[Pair]:
+    """Most frequently checked pairs in DDICheck, either drug order counted together."""
+    qs = DDICheck.objects.exclude(cache_source="refresh")
+    if days:
+        qs = qs.filter(created_at__gte=timezone.now() - timedelta(days=days))
+    counts: Dict[Pair, int] = {}
+    for d1, d2, n in qs.values_list("drug1", "drug2").annotate(n=models.Count("id")).order_by():
+        pair = canonical_pair(d1, d2)
+        if pair[0] != pair[1]:
+            counts[pair] = counts.get(pair, 0) + n
+    ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    return [pair for pair, _ in ranked[:limit]]
+
+
+# -----------------------------------------------------------------------------
+# Offline run
+# -----------------------------------------------------------------------------
+def missing_pairs(pairs: Iterable[Pair], version: str) -> List[Pair]:
+    """Pairs not yet precomputed for this version; re-running a command resumes here."""
+    pairs = list(pairs)
+    done = set(
+        PrecomputedInteraction.objects
+        .filter(model_version=version)
+        .values_list("drug1", "drug2")
+    )
+    return [p for p in pairs if p not in done]
+
+
+def precompute_pairs(pairs: List[Pair], version: str, concurrency: int,
+                     progress: Optional[Callable[[Pair, str, str], None]] = None) -> Dict[str, int]:
+    """
+    Runs the live Freda/Bernice pipeline for each pair with at most
+    `concurrency` pairs in flight, and DDI_PRECOMPUTE_QUEUE_PER_WORKER times
+    that many submitted, and stores every success as soon as it arrives, so
+    an interrupted run loses nothing already computed. Failures are only
+    reported; they are retried on the next run.
+    """
+    from .views import _collect_pair, _submit_pair
+
+    workers = max(1, concurrency)
+    counts = {"stored": 0, "failed": 0}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ddi-precompute") as pairs_pool, \
+            ThreadPoolExecutor(max_workers=2 * workers, thread_name_prefix="ddi-precompute-model") as model_pool:
+
+        def run(pair: Pair):
+            try:
+                return _collect_pair(_submit_pair(model_pool, *pair))
+            finally:
+                connections.close_all()
+
+        todo = iter(pairs)
+        futures: Dict[Future, Pair] = {}
+        window = workers * max(1, DDI_PRECOMPUTE_QUEUE_PER_WORKER)
+        while True:
+            for pair in islice(todo, window - len(futures)):
+                futures[pairs_pool.submit(run, pair)] = pair
+            if not futures:
+                break
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                pair = futures.pop(future)
+                try:
+                    result, check_status, error_msg = future.result()
+                except Exception as e:
+                    check_status, error_msg = "error", str(e)
+                if check_status == "success":
+                    try:
+                        PrecomputedInteraction.objects.create(
+                            drug1=pair[0], drug2=pair[1], model_version=version,
+                            **{f: result[f] for f in RESULT_FIELDS},
+                        )
+                    except IntegrityError:
+                        pass  # a concurrent run stored it first
+                    counts["stored"] += 1
+                else:
+                    counts["failed"] += 1
+                if progress:
+                    progress(pair, check_status, error_msg)
+    return counts
+
+
+def coverage(version: str, days: int = 7) -> Dict[str, float]:
+    """Share of logged checks in the window that were answered from the precomputed table."""
+    qs = (
+        DDICheck.objects
+        .filter(created_at__gte=timezone.now() - timedelta(days=days))
+        .exclude(cache_source="refresh")
+    )
+    agg = qs.aggregate(
+        total=models.Count("id"),
+        precomputed=models.Count("id", filter=models.Q(cache_source="precomputed")),
+    )
+    total, hits = agg["total"] or 0, agg["precomputed"] or 0
+    return {
+        "days": days,
+        "checks": total,
+        "precomputed": hits,
+        "coverage": round(hits / total, 4) if total else 0.0,
+        "pairs_stored": PrecomputedInteraction.objects.filter(model_version=version).count(),
+    }
@@ -0,0 +1,191 @@
+# interactions/resilience.py
+import os
+import math
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+DDI_BREAKER_FAILURES = int(os.getenv("DDI_BREAKER_FAILURES", "3"))     # consecutive failures to open
+DDI_BREAKER_RESET_S  = int(os.getenv("DDI_BREAKER_RESET_S", "60"))     # open -> half-open after this
+DDI_LATENCY_WINDOW   = int(os.getenv("DDI_LATENCY_WINDOW", "50"))      # samples kept per target
+DDI_LATENCY_MIN_SAMPLES = int(os.getenv("DDI_LATENCY_MIN_SAMPLES", "10"))
+DDI_TIMEOUT_P95_FACTOR  = float(os.getenv("DDI_TIMEOUT_P95_FACTOR", "2.0"))
+DDI_TIMEOUT_MIN_S       = float(os.getenv("DDI_TIMEOUT_MIN_S", "15"))
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when every target for a model is behind an open circuit."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call chain has used up its total time budget."""
+
+
+class CircuitBreaker:
+    """
+    Classic closed -> open -> half-open breaker for one Space target.
+
+    closed:    calls flow; DDI_BREAKER_FAILURES consecutive failures open it.
+    open:      calls are refused until reset_s has passed.
+    half_open: exactly one probe call is let through; success closes the
+               circuit, failure re-opens it for another reset_s.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = DDI_BREAKER_FAILURES, reset_s: float = DDI_BREAKER_RESET_S):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.OPEN:
+                if time.monotonic() - self._opened_at < self.reset_s:
+                    return False
+                self._state = self.HALF_OPEN
+                self._probe_in_flight = False
+            # half-open: a single probe at a time
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def release_probe(self) -> None:
+        """The call let through by allow() ended with no verdict (cancelled, or never made)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._state == self.OPEN and time.monotonic() - self._opened_at < self.reset_s
+
+    def retry_after_s(self) -> float:
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.reset_s - (time.monotonic() - self._opened_at))
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self._state
+            if state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_s:
+                state = self.HALF_OPEN  # will let the next call probe
+            return {"state": state, "consecutive_failures": self._failures}
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one target."""
+
+    def __init__(self, window: int = DDI_LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        # nearest-rank percentile
+        idx = max(0, math.ceil(pct / 100.0 * len(samples)) - 1)
+        return samples[min(idx, len(samples) - 1)]
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._samples)
+
+    def timeout_for(self, configured_s: float) -> float:
+        """
+        p95 * DDI_TIMEOUT_P95_FACTOR once enough samples exist, clamped to
+        [DDI_TIMEOUT_MIN_S, configured_s]; the configured timeout until then.
+        """
+        if self.count() < DDI_LATENCY_MIN_SAMPLES:
+            return configured_s
+        p95 = self.percentile(95) or configured_s
+        return max(DDI_TIMEOUT_MIN_S, min(configured_s, p95 * DDI_TIMEOUT_P95_FACTOR))
+
+    def snapshot(self) -> Dict[str, Any]:
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "samples": self.count(),
+            "p50_s": round(p50, 3) if p50 is not None else None,
+            "p95_s": round(p95, 3) if p95 is not None else None,
+        }
+
+
+class Deadline:
+    """Total time budget shared by every attempt/backoff of one call chain."""
+
+    def __init__(self, budget_s: float):
+        self.budget_s = budget_s
+        self._expires = time.monotonic() + budget_s
+
+    def remaining(self) -> float:
+        return max(0.0, self._expires - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0.0
+
+    def clamp(self, timeout_s: float) -> float:
+        return min(timeout_s, self.remaining())
+
+
+class TargetRegistry:
+    """Per-target breakers and latency trackers, created on first use."""
+
+    def __init__(self):
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latency: Dict[str, LatencyTracker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, target: str) -> CircuitBreaker:
+        with self._lock:
+            return self._breakers.setdefault(target, CircuitBreaker())
+
+    def latency(self, target: str) -> LatencyTracker:
+        with self._lock:
+            return self._latency.setdefault(target, LatencyTracker())
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            targets = sorted(set(self._breakers) | set(self._latency))
+        return {
+            t: {
+                "breaker": self.breaker(t).snapshot(),
+                "latency": self.latency(t).snapshot(),
+            }
+            for t in targets
+        }
+
+
+# Process-wide registry used by the Space calls in interactions.views
+targets = TargetRegistry()
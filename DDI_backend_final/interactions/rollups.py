@@ -0,0 +1,85 @@
+# interactions/rollups.py
+"""
+Daily per-hospital rollups of the DDICheck log (DailyDDIStats).
+
+`manage.py ddi_rollup` recomputes whole days, so it is idempotent: run it
+from cron (default: yesterday and today) or with --since to backfill. The
+admin dashboard reads these rows for past days and only counts the last
+24 hours (and any day not rolled up yet) from the log itself.
+"""
+import logging
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import DailyDDIStats, DDICheck
+from .stats import percentiles
+
+logger = logging.getLogger(__name__)
+
+
+def day_bounds(day: date):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def counted_checks():
+    """Checks the dashboard counts: user checks, not background refreshes."""
+    return DDICheck.objects.exclude(cache_source="refresh")
+
+
+def rollup_day(day: date) -> List[DailyDDIStats]:
+    """Recomputes every hospital's row for one day (rows for hospitals without checks are removed)."""
+    start, end = day_bounds(day)
+    rows = (
+        counted_checks().filter(created_at__gte=start, created_at__lt=end)
+        .annotate(hospital_id=Coalesce("user__admin_profile__hospital", "user__professional_profile__hospital"))
+        # checks by users outside any hospital belong to no dashboard
+        .filter(models.Q(user__isnull=True) | models.Q(hospital_id__isnull=False))
+        .values_list("hospital_id", "user_id", "status", "severity", "timings")
+    )
+    groups: Dict[Optional[int], dict] = {}
+    for hospital_id, user_id, status, severity, timings in rows.iterator():
+        g = groups.setdefault(hospital_id, {"checks": 0, "errors": 0, "users": set(), "severity": {}, "latency": []})
+        g["checks"] += 1
+        if status == "success":
+            g["severity"][severity] = g["severity"].get(severity, 0) + 1
+        else:
+            g["errors"] += 1
+        if user_id is not None:
+            g["users"].add(user_id)
+        if timings and isinstance(timings.get("total"), (int, float)):
+            g["latency"].append(float(timings["total"]))
+
+    now = timezone.now()
+    stats = []
+    for hospital_id, g in groups.items():
+        latency = percentiles(g["latency"])
+        stats.append(DailyDDIStats(
+            hospital_id=hospital_id, date=day, checks=g["checks"], errors=g["errors"],
+            unique_users=len(g["users"]), severity=g["severity"],
+            latency_p50_ms=latency["p50"], latency_p95_ms=latency["p95"], latency_p99_ms=latency["p99"],
+            computed_at=now,
+        ))
+    with transaction.atomic():
+        DailyDDIStats.objects.filter(date=day).delete()
+        DailyDDIStats.objects.bulk_create(stats)
+    return stats
+
+
+def rollup_days(days: Iterable[date]) -> Dict[date, int]:
+    """{day: rows written}; each day is its own transaction."""
+    return {day: len(rollup_day(day)) for day in days}
+
+
+def days_since(first: date, last: Optional[date] = None) -> List[date]:
+    last = last or timezone.localdate()
+    return [first + timedelta(days=i) for i in range((last - first).days + 1)]
+
+
+def first_check_day() -> Optional[date]:
+    first = counted_checks().order_by("created_at").values_list("created_at", flat=True).first()
+    return timezone.localdate(first) if first else None
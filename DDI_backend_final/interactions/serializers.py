@@ -2,6 +2,10 @@
 import re
 from rest_framework import serializers
 
+from patients.models import Patient
+from prescriptions.models import Medication
+from .utils import normalize_drug
+
 PAIR_SPLIT_RE = re.compile(r"\s*(?:\+|,)\s*")
 
 class PairCheckSerializer(serializers.Serializer):
@@ -29,3 +33,53 @@ class PairCheckSerializer(serializers.Serializer):
 
         data["drug1"], data["drug2"] = d1, d2
         return data
+
+
+MAX_BATCH_DRUGS = 20  # 190 pairs
+
+
+def _visible_patients(user):
+    """Same hospital scoping as PatientViewSet.get_queryset."""
+    if hasattr(user, "professional_profile"):
+        return Patient.objects.filter(hospital=user.professional_profile.hospital)
+    if hasattr(user, "admin_profile"):
+        return Patient.objects.filter(hospital=user.admin_profile.hospital)
+    if user.is_superuser:
+        return Patient.objects.all()
+    return Patient.objects.none()
+
+
+class BatchCheckSerializer(serializers.Serializer):
+    drugs = serializers.ListField(child=serializers.CharField(allow_blank=True), required=False)
+    patient = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        names = list(data.get("drugs") or [])
+        if data.get("patient") is not None:
+            user = self.context["request"].user
+            patient = _visible_patients(user).filter(pk=data["patient"]).first()
+            if patient is None:
+                raise serializers.ValidationError({"patient": "Patient not found."})
+            names += list(
+                Medication.objects
+                .filter(patient=patient, is_current=True)
+                .order_by("id")
+                .values_list("drug_name", flat=True)
+            )
+        elif not names:
+            raise serializers.ValidationError("Provide drugs and/or patient.")
+
+        # Normalize and de-duplicate, keeping the caller's order
+        drugs = []
+        for name in names:
+            d = normalize_drug(name or "")
+            if d and d not in drugs:
+                drugs.append(d)
+
+        if len(drugs) < 2:
+            raise serializers.ValidationError("At least two distinct drugs are required.")
+        if len(drugs) > MAX_BATCH_DRUGS:
+            raise serializers.ValidationError(f"At most {MAX_BATCH_DRUGS} drugs per batch.")
+
+        data["drugs"] = drugs
+        return data
@@ -0,0 +1,31 @@
+# interactions/signals.py
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import AdminProfile, ProfessionalProfile, User
+from . import dashboard
+from .models import DDICheck
+
+
+@receiver(post_save, sender=DDICheck)
+def check_saved(sender, instance, created, **kwargs):
+    if created:
+        dashboard.invalidate(dashboard.hospital_of(instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # e.g. a 2FA code being issued
+    if update_fields is not None and not dashboard.USER_FIELDS.intersection(update_fields):
+        return
+    dashboard.invalidate(dashboard.hospital_of(instance.pk))
+
+
+@receiver(post_save, sender=AdminProfile)
+@receiver(post_save, sender=ProfessionalProfile)
+@receiver(post_delete, sender=AdminProfile)
+@receiver(post_delete, sender=ProfessionalProfile)
+def profile_changed(sender, instance, **kwargs):
+    # a new profile is how a new user joins a hospital
+    dashboard.forget_user(instance.user_id)
+    dashboard.invalidate(instance.hospital_id)
@@ -0,0 +1,113 @@
+# interactions/singleflight.py
+import time
+import uuid
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key inside one process: the
+    first caller runs fn, later callers wait for and share its outcome
+    (result or exception). Nothing is remembered once the call finishes.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns (value, shared); shared is True for callers that joined."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result(), True
+
+        try:
+            value = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class SharedLock:
+    """
+    Best-effort lock in Django's cache, used to coalesce work across gunicorn
+    workers. Only effective when CACHES points at a shared backend (see
+    REDIS_URL in settings); with the default per-process cache it degrades to
+    a no-op beyond what SingleFlight already covers.
+    """
+
+    def __init__(self, prefix: str, ttl_s: int, wait_s: float, poll_s: float = 0.5):
+        self.prefix = prefix
+        self.ttl_s = ttl_s
+        self.wait_s = wait_s
+        self.poll_s = poll_s
+
+    def _cache_key(self, key: str) -> str:
+        # drug names contain spaces; keep keys memcached/redis safe
+        return f"{self.prefix}:{hashlib.sha1(key.encode()).hexdigest()}"
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[bool]:
+        """Yields True if this caller owns the lock, False if someone else does."""
+        ck = self._cache_key(key)
+        token = uuid.uuid4().hex
+        try:
+            acquired = cache.add(ck, token, timeout=self.ttl_s)
+        except Exception as e:
+            logger.warning("Shared lock unavailable (%s); continuing without it", e)
+            acquired = True
+            token = None
+        try:
+            yield acquired
+        finally:
+            if acquired and token is not None:
+                try:
+                    if cache.get(ck) == token:
+                        cache.delete(ck)
+                except Exception:
+                    pass
+
+    def wait(self, key: str, probe: Callable[[], Optional[Any]]) -> Optional[Any]:
+        """
+        Polls probe() until it returns a value, the lock is released or
+        wait_s elapses. Returns the probed value or None.
+        """
+        ck = self._cache_key(key)
+        deadline = time.monotonic() + self.wait_s
+        while True:
+            value = probe()
+            if value is not None:
+                return value
+            try:
+                released = cache.get(ck) is None
+            except Exception:
+                released = True
+            if released:
+                return probe()
+            if time.monotonic() >= deadline:
+                return None
+            time.sleep(self.poll_s)
@@ -0,0 +1,22 @@
+# interactions/stats.py
+"""Summary statistics shared by the dashboard timings, rollups and the benchmark."""
+import math
+from typing import Dict, List, Optional
+
+
+def percentiles(samples: List[float]) -> Dict[str, Optional[float]]:
+    """Nearest-rank p50/p95/p99 plus mean/max, like resilience.LatencyTracker."""
+    if not samples:
+        return {"p50": None, "p95": None, "p99": None, "mean": None, "max": None}
+    ordered = sorted(samples)
+
+    def rank(pct: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(pct / 100.0 * len(ordered)) - 1))]
+
+    return {
+        "p50": round(rank(50), 2),
+        "p95": round(rank(95), 2),
+        "p99": round(rank(99), 2),
+        "mean": round(sum(ordered) / len(ordered), 2),
+        "max": round(ordered[-1], 2),
+    }
@@ -1,3 +1,747 @@
-from django.test import TestCase
+import json
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from itertools import combinations
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import AdminProfile, Hospital, ProfessionalProfile, User
+from . import dashboard, gateway as gateway_module, jobs, precompute, rollups, views
+from .backends import FakeBackend, HttpBackend, set_backend
+from .gateway import FREDA_SIGNATURES, InferenceGateway, Model, parse_severity
+from .cache import result_cache
+from .models import DailyDDIStats, DDICheck, DDIJob, InteractionResult, PrecomputedInteraction
+from .resilience import CircuitBreaker, CircuitOpenError, TargetRegistry
+from .singleflight import SingleFlight
+from .utils import pair_key
+
+
+class AdminDashboardQueryCountTests(TestCase):
+    """The dashboard runs the same few queries however big the hospital is."""
+
+    def setUp(self):
+        cache.clear()
+        self.hospital = Hospital.objects.create(name="General")
+        self.admin = User.objects.create_user("admin@example.com", role="ADMIN")
+        AdminProfile.objects.create(user=self.admin, first_name="A", last_name="Admin",
+                                    hospital=self.hospital, position="Head")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.other_hospital = Hospital.objects.create(name="Elsewhere")
+        self.outsider = self._add_professional(self.other_hospital)
+
+    def _add_professional(self, hospital):
+        n = User.objects.count()
+        user = User.objects.create_user(f"doc{n}@example.com")
+        ProfessionalProfile.objects.create(user=user, first_name="D", last_name=str(n),
+                                           professional_role="DOCTOR", license_number=str(n),
+                                           hospital=hospital)
+        return user
+
+    def _add_check(self, user, age, status="success"):
+        result = InteractionResult.store("warfarin", "aspirin", "v1", {"severity": "Major"})
+        DDICheck.objects.create(user=user, drug1="warfarin", drug2="aspirin", severity="Major",
+                                result=result, status=status, created_at=timezone.now() - age)
+
+    def _get(self, queries, cache_status="MISS"):
+        with self.assertNumQueries(queries):
+            response = self.client.get("/api/admin/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Dashboard-Cache"], cache_status)
+        return response.data
+
+    def test_query_count_does_not_grow_with_hospital(self):
+        doctor = self._add_professional(self.hospital)
+        self._add_check(doctor, timedelta(hours=1))
+        small = self._get(7)
+
+        for i in range(20):
+            user = self._add_professional(self.hospital)
+            self._add_check(user, timedelta(hours=2), status="error" if i % 4 == 0 else "success")
+            self._add_check(user, timedelta(days=3))
+        large = self._get(7)
+
+        self.assertEqual(small["metrics"]["users"], 2)
+        self.assertEqual(large["metrics"]["users"], 22)
+        self.assertEqual(large["metrics"]["ddi_checks_24h"], 21)
+        self.assertEqual(large["metrics"]["error_rate_24h"], round(5 / 21 * 100, 1))
+        self.assertEqual(sum(large["ddi_checks_7d"]), 41)
+
+    def test_counts_anonymous_checks_but_not_other_hospitals(self):
+        self._add_check(self.outsider, timedelta(hours=1))
+        self._add_check(None, timedelta(hours=1))
+        data = self._get(7)
+        self.assertEqual(data["metrics"]["ddi_checks_24h"], 1)
+        self.assertEqual(data["ddi_checks_7d"][-1] + data["ddi_checks_7d"][-2], 1)
+
+    def test_past_days_are_read_from_rollups(self):
+        doctor = self._add_professional(self.hospital)
+        for _ in range(3):
+            self._add_check(doctor, timedelta(days=3))
+        self._add_check(doctor, timedelta(days=3), status="error")
+        self._add_check(self.outsider, timedelta(days=3))
+        day = timezone.localdate(timezone.now() - timedelta(days=3))
+        rollups.rollup_day(day)
+
+        mine = DailyDDIStats.objects.get(hospital=self.hospital, date=day)
+        self.assertEqual((mine.checks, mine.errors, mine.unique_users), (4, 1, 1))
+        self.assertEqual(mine.severity, {"Major": 3})
+
+        # the dashboard no longer needs the raw rows for that day
+        DDICheck.objects.all().delete()
+        data = self._get(7)
+        self.assertEqual(data["ddi_checks_7d"][3], 4)
+
+    def test_cached_until_a_hospital_check_is_saved(self):
+        doctor = self._add_professional(self.hospital)
+        self._get(7)
+        # only the admin's hospital is looked up
+        self._get(1, cache_status="HIT")
+        self._add_check(self.outsider, timedelta(minutes=1))
+        self.assertEqual(self._get(1, cache_status="HIT")["metrics"]["ddi_checks_24h"], 0)
+        self._add_check(doctor, timedelta(minutes=1))
+        self.assertEqual(self._get(7)["metrics"]["ddi_checks_24h"], 1)
+
+    def test_only_saves_of_shown_user_fields_invalidate(self):
+        doctor = self._add_professional(self.hospital)
+        self._get(7)
+        doctor.generate_email_2fa_code()
+        self._get(1, cache_status="HIT")
+        update_last_login(None, doctor)
+        self.assertIsNotNone(self._get(7)["recent_users"][0]["last_login"])
+        doctor.role = "PHARMACIST"
+        doctor.save(update_fields=["role"])
+        self.assertEqual(self._get(7)["recent_users"][0]["role"], "PHARMACIST")
+
+    def test_hospital_memo_follows_other_workers(self):
+        doctor = self._add_professional(self.hospital)
+        self.assertEqual(dashboard.hospital_of(doctor.pk), self.hospital.pk)
+        # moved without signals here, as if by another worker
+        ProfessionalProfile.objects.filter(user=doctor).update(hospital=self.other_hospital)
+        with self.assertNumQueries(0):
+            self.assertEqual(dashboard.hospital_of(doctor.pk), self.hospital.pk)
+        # whose forget_user() moved the shared generation on
+        cache.set(dashboard._MEMO_GENERATION_KEY, "elsewhere", timeout=None)
+        self.assertEqual(dashboard.hospital_of(doctor.pk), self.other_hospital.pk)
+
+
+class FakePipelineTestCase(TestCase):
+    """Checks end to end against the fake backend, with fresh breakers and empty caches."""
+
+    def setUp(self):
+        set_backend(FakeBackend(latency_ms=5, sigma=0, error_rate=0, timeout_rate=0))
+        self.addCleanup(set_backend, None)
+        patcher = mock.patch.object(gateway_module, "resilience_targets", TargetRegistry())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache.clear()
+        result_cache.clear()
+        self.addCleanup(result_cache.clear)
+        self.client = APIClient()
+
+    def check(self, drug1, drug2):
+        response = self.client.post("/api/ddi/check/", {"drug1": drug1, "drug2": drug2}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    @staticmethod
+    def expected_severity(drug1, drug2):
+        return FakeBackend.output("/lambda", f"{drug1}, {drug2}")
+
+
+class ResultCacheTests(FakePipelineTestCase):
+
+    def test_either_drug_order_hits_the_same_entry(self):
+        response = self.check("Warfarin", "aspirin")
+        self.assertEqual(response["X-DDI-Cache"], "MISS")
+        self.assertEqual(response.data["severity"], self.expected_severity("warfarin", "aspirin"))
+
+        response = self.check("aspirin", "warfarin")
+        self.assertEqual((response["X-DDI-Cache"], response["X-DDI-Cache-Source"]), ("HIT", "memory"))
+        self.assertEqual(response.data["severity"], self.expected_severity("warfarin", "aspirin"))
+
+        # a restarted worker finds it in the DDICheck log
+        result_cache.clear()
+        response = self.check("warfarin", "aspirin")
+        self.assertEqual((response["X-DDI-Cache"], response["X-DDI-Cache-Source"]), ("HIT", "db"))
+        self.assertEqual(list(DDICheck.objects.order_by("created_at").values_list("cache_source", flat=True)),
+                         ["", "memory", "db"])
+
+    def test_entries_are_per_model_version(self):
+        self.check("warfarin", "aspirin")
+        version = views.DDI_MODEL_VERSION
+        self.assertEqual(result_cache.get("aspirin", "warfarin", version)[1], "memory")
+        self.assertEqual(result_cache.get("aspirin", "warfarin", "retrained"), (None, ""))
+        result_cache.clear()
+        self.assertEqual(result_cache.get("aspirin", "warfarin", "retrained"), (None, ""))
+        self.assertEqual(result_cache.get("aspirin", "warfarin", version)[1], "db")
+
+        with mock.patch.object(views, "DDI_MODEL_VERSION", "retrained"):
+            self.assertEqual(self.check("warfarin", "aspirin")["X-DDI-Cache"], "MISS")
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def _race(self, fn, callers=2):
+        """Runs fn from several threads, the others starting once the first is inside _slow."""
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(fn())
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(callers)]
+        threads[0].start()
+        self.assertTrue(self.entered.wait(2))
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.05)  # let them join
+        self.release.set()
+        for thread in threads:
+            thread.join(2)
+        return outcomes
+
+    def setUp(self):
+        self.entered, self.release = threading.Event(), threading.Event()
+        self.calls = 0
+
+    def _slow(self, value):
+        self.calls += 1
+        self.entered.set()
+        self.release.wait(2)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        outcomes = self._race(lambda: flight.do("k", lambda: self._slow("answer")), callers=3)
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(outcomes, key=lambda o: o[1]), [("answer", False), ("answer", True), ("answer", True)])
+
+    def test_failure_is_shared_and_not_remembered(self):
+        flight = SingleFlight()
+        outcomes = self._race(lambda: flight.do("k", lambda: self._slow(ValueError("boom"))))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual([type(o) for o in outcomes], [ValueError, ValueError])
+        self.assertEqual(flight.do("k", lambda: 1), (1, False))
+
+    def test_identical_pair_checks_call_the_spaces_once(self):
+        cache.clear()
+        result_cache.clear()
+        self.addCleanup(result_cache.clear)
+        logged = []
+        answer = {"severity": "Major", "description": "", "extended_explanation": "", "recommendation": ""}
+        with mock.patch.object(views, "_submit_pair"), \
+                mock.patch.object(views, "_collect_pair", lambda futures: (self._slow(answer), "success", "")), \
+                mock.patch.object(views, "_log_check", lambda *a, cache_source="", **kw: logged.append(cache_source)):
+            outcomes = self._race(lambda: views._finish_pair(None, "warfarin", "aspirin", None))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(source for _, _, source in outcomes), ["", "coalesced"])
+        self.assertEqual(sorted(logged), ["", "coalesced"])
+        self.assertEqual(result_cache.get("aspirin", "warfarin", views.DDI_MODEL_VERSION)[0], answer)
+
+class GatewayTestCase(SimpleTestCase):
+    """The gateway against the fake backend, with its own breakers and latency trackers."""
+
+    SLOW, FAST = "fake://slow", "fake://fast"
+
+    def setUp(self):
+        # no jitter; SLOW answers after 2s, FAST after 20ms
+        set_backend(FakeBackend(latency_ms=20, sigma=0, error_rate=0, timeout_rate=0,
+                                cold_targets=[self.SLOW], cold_factor=100))
+        self.addCleanup(set_backend, None)
+        self.targets = TargetRegistry()
+        patcher = mock.patch.object(gateway_module, "resilience_targets", self.targets)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.gateway = InferenceGateway()
+
+    def model(self, retries=1, hedge=False):
+        return Model("FREDA", lambda: [], FREDA_SIGNATURES, parse_severity,
+                     timeout_s=5, retries=retries, backoff=0.01, hedge=hedge)
+
+    def open_breaker(self, target, reset_s=0.05) -> CircuitBreaker:
+        breaker = self.targets.breaker(target)
+        breaker.reset_s = reset_s
+        for _ in range(breaker.failure_threshold):
+            breaker.record_failure()
+        return breaker
+
+
+class GatewayHedgeTests(GatewayTestCase):
+
+    @mock.patch.object(gateway_module, "DDI_HEDGE_DELAY_S", 0.05)
+    def test_cancelled_half_open_probe_frees_the_breaker(self):
+        breaker = self.open_breaker(self.SLOW)
+        self.assertFalse(breaker.allow())
+        time.sleep(breaker.retry_after_s() + 0.01)
+
+        # SLOW gets the half-open probe, FAST is hedged in and wins
+        targets = [("URL", self.SLOW), ("URL", self.FAST)]
+        out = self.gateway.call(self.model(hedge=True), "warfarin", "aspirin", attempts_targets=targets)
+        self.assertIn(out, ("Minor", "Moderate", "Major"))
+        self.assertEqual(self.gateway.stats()["FREDA"]["hedge_wins"], 1)
+
+        # once the cancelled probe has wound down, its slot is free again
+        # (without the release the breaker stayed half-open and refused for good)
+        freed_by = time.monotonic() + 1.0
+        while not breaker.allow() and time.monotonic() < freed_by:
+            time.sleep(0.01)
+        self.assertEqual(breaker.snapshot()["state"], CircuitBreaker.HALF_OPEN)
+        self.assertLess(time.monotonic(), freed_by)
+
+
+class AsyncGatewayTests(GatewayTestCase):
+
+    @mock.patch.object(gateway_module, "DDI_HEDGE_DELAY_S", 0.05)
+    def test_hedges_and_frees_the_cancelled_probe(self):
+        breaker = self.open_breaker(self.SLOW)
+        time.sleep(breaker.retry_after_s() + 0.01)
+        targets = [("URL", self.SLOW), ("URL", self.FAST)]
+
+        started = time.monotonic()
+        out = asyncio.run(self.gateway.acall(self.model(hedge=True), "warfarin", "aspirin",
+                                             attempts_targets=targets))
+        self.assertIn(out, ("Minor", "Moderate", "Major"))
+        self.assertLess(time.monotonic() - started, 1)  # SLOW takes 2s
+        self.assertEqual(self.gateway.stats()["FREDA"]["hedge_wins"], 1)
+        # the cancelled SLOW probe gave its slot back
+        self.assertTrue(breaker.allow())
+
+    def test_skips_open_circuits(self):
+        self.open_breaker(self.SLOW, reset_s=60)
+        targets = [("URL", self.SLOW), ("URL", self.FAST)]
+        started = time.monotonic()
+        asyncio.run(self.gateway.acall(self.model(), "warfarin", "aspirin", attempts_targets=targets))
+        self.assertLess(time.monotonic() - started, 1)
+        with self.assertRaises(CircuitOpenError):
+            asyncio.run(self.gateway.acall(self.model(), "warfarin", "aspirin", attempts_targets=targets[:1]))
+
+    def test_lifespan_shutdown_closes_the_http_client(self):
+        from .async_views import lifespan
+
+        backend = HttpBackend()
+        set_backend(backend)
+        sent = []
+
+        async def run():
+            client = backend._ahttp()
+            messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+
+            async def receive():
+                return next(messages)
+
+            async def send(message):
+                sent.append(message["type"])
+
+            await lifespan({"type": "lifespan"}, receive, send)
+            return client
+
+        client = asyncio.run(run())
+        self.assertTrue(client.is_closed)
+        self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+
+
+class CircuitBreakerTests(GatewayTestCase):
+
+    def test_open_half_open_closed(self):
+        breaker = self.open_breaker(self.FAST)
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+        time.sleep(breaker.retry_after_s() + 0.01)
+
+        # one probe at a time
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertEqual(breaker.snapshot()["state"], CircuitBreaker.HALF_OPEN)
+        breaker.record_success()
+        self.assertEqual(breaker.snapshot(), {"state": CircuitBreaker.CLOSED, "consecutive_failures": 0})
+        self.assertTrue(breaker.allow())
+
+    def test_failed_probe_opens_it_again(self):
+        breaker = self.open_breaker(self.FAST)
+        time.sleep(breaker.retry_after_s() + 0.01)
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open)
+        self.assertFalse(breaker.allow())
+
+    def test_gateway_probes_and_closes_it(self):
+        breaker = self.open_breaker(self.FAST)
+        model, targets = self.model(), [("URL", self.FAST)]
+        with self.assertRaises(CircuitOpenError):
+            self.gateway.call(model, "warfarin", "aspirin", attempts_targets=targets)
+        time.sleep(breaker.retry_after_s() + 0.01)
+        self.assertIn(self.gateway.call(model, "warfarin", "aspirin", attempts_targets=targets),
+                      ("Minor", "Moderate", "Major"))
+        self.assertEqual(breaker.snapshot()["state"], CircuitBreaker.CLOSED)
+
+class JobLifecycleTests(FakePipelineTestCase):
+
+    def test_queued_job_runs_and_a_repeat_is_answered_from_cache(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post("/api/ddi/jobs/", {"drug1": "warfarin", "drug2": "aspirin"}, format="json")
+        self.assertEqual((response.status_code, response.data["status"]), (202, "queued"))
+        self.assertEqual(len(callbacks), 1)
+        job_id = response.data["id"]
+
+        # what the pool thread does (it can't see this test's transaction)
+        jobs._run_job(job_id)
+        data = self.client.get(f"/api/ddi/jobs/{job_id}/").data
+        self.assertEqual(data["status"], "done")
+        self.assertEqual(data["result"]["severity"], self.expected_severity("warfarin", "aspirin"))
+        self.assertFalse(data["result"]["cached"])
+        self.assertIsNotNone(data["finished_at"])
+        # already claimed: running it again does nothing
+        jobs._run_job(job_id)
+        self.assertEqual(DDICheck.objects.count(), 1)
+
+        response = self.client.post("/api/ddi/jobs/", {"drug1": "aspirin", "drug2": "warfarin"}, format="json")
+        self.assertEqual((response.status_code, response.data["status"]), (200, "done"))
+        self.assertTrue(response.data["result"]["cached"])
+
+    def test_lost_job_is_failed(self):
+        job = DDIJob.objects.create(drug1="warfarin", drug2="aspirin",
+                                    created_at=timezone.now() - timedelta(seconds=jobs.DDI_JOB_STALE_S + 1))
+        data = self.client.get(f"/api/ddi/jobs/{job.pk}/").data
+        self.assertEqual(data["status"], "failed")
+        self.assertIn("resubmit", data["error"])
+
+
+class JobStreamTests(TestCase):
+    def _events(self, job):
+        response = APIClient().get(f"/api/ddi/jobs/{job.pk}/stream/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        body = b"".join(response.streaming_content).decode()
+        events = []
+        for block in filter(None, body.split("\n\n")):
+            fields = dict(line.split(": ", 1) for line in block.split("\n"))
+            events.append((fields.get("event", "retry" if "retry" in fields else ""),
+                           json.loads(fields["data"]) if "data" in fields else fields.get("retry")))
+        return events
+
+    def test_finished_job_streams_its_result(self):
+        job = DDIJob.objects.create(drug1="warfarin", drug2="aspirin", status=DDIJob.STATUS_DONE,
+                                    result={"severity": "Major"}, finished_at=timezone.now())
+        events = self._events(job)
+        self.assertEqual([name for name, _ in events], ["retry", "result"])
+        self.assertEqual(events[0][1], str(views.DDI_JOB_RETRY_MS))
+        self.assertEqual(events[1][1]["status"], "done")
+
+    @mock.patch.object(views, "DDI_JOB_POLL_S", 0)
+    @mock.patch.object(views, "DDI_JOB_STREAM_MAX_S", 0)
+    def test_long_running_job_asks_the_client_to_reconnect(self):
+        job = DDIJob.objects.create(drug1="warfarin", drug2="aspirin")
+        events = self._events(job)
+        self.assertEqual([name for name, _ in events], ["retry", "status", "reconnect"])
+        self.assertEqual(events[2][1]["poll"], f"/api/ddi/jobs/{job.pk}/")
+        self.assertEqual(events[2][1]["status"], "queued")
+
+
+class PrecomputedLookupTests(FakePipelineTestCase):
+
+    def test_precompute_lookup(self):
+        PrecomputedInteraction.objects.create(drug1="aspirin", drug2="warfarin", severity="Major",
+                                              model_version="v1")
+        PrecomputedInteraction.objects.create(drug1="ibuprofen", drug2="warfarin", severity="Moderate",
+                                              model_version="v2")
+        self.assertEqual(precompute.lookup("warfarin", "aspirin", "v1")["severity"], "Major")
+        self.assertEqual(precompute.lookup("aspirin", "warfarin", "v1")["severity"], "Major")
+        self.assertIsNone(precompute.lookup("warfarin", "aspirin", "v2"))
+        with self.assertNumQueries(1):
+            found = precompute.lookup_many([("warfarin", "aspirin"), ("aspirin", "warfarin"),
+                                            ("warfarin", "ibuprofen"), ("aspirin", "ibuprofen")], "v1")
+        self.assertEqual(list(found), [("warfarin", "aspirin"), ("aspirin", "warfarin")])
+
+    def test_check_is_answered_from_the_table(self):
+        PrecomputedInteraction.objects.create(drug1="aspirin", drug2="warfarin", severity="Major",
+                                              description="d", model_version=views.DDI_MODEL_VERSION)
+        response = self.check("warfarin", "aspirin")
+        self.assertEqual((response["X-DDI-Cache"], response["X-DDI-Cache-Source"]), ("HIT", "precomputed"))
+        self.assertEqual((response.data["severity"], response.data["description"]), ("Major", "d"))
+
+    def test_precomputed_rows_are_kept_in_memory(self):
+        PrecomputedInteraction.objects.create(drug1="aspirin", drug2="warfarin", severity="Major",
+                                              description="d", model_version=views.DDI_MODEL_VERSION)
+        with self.assertNumQueries(1):
+            result, source, refreshing = views._cached_result("warfarin", "aspirin")
+        self.assertEqual((result["severity"], source, refreshing), ("Major", "precomputed", False))
+        # memory first: no query, still reported as precomputed, either drug order
+        with self.assertNumQueries(0):
+            result, source, _ = views._cached_result("aspirin", "warfarin")
+        self.assertEqual((result["description"], source), ("d", "precomputed"))
+
+    @mock.patch.object(precompute, "DDI_PRECOMPUTE_QUEUE_PER_WORKER", 2)
+    def test_precompute_submits_a_bounded_window_of_pairs(self):
+        pairs = precompute.pairs_from_drugs(["warfarin", "aspirin", "ibuprofen", "metformin", "lisinopril", "digoxin"])
+        in_flight, peak = [0], [0]
+
+        class Pool(ThreadPoolExecutor):
+            def __init__(pool, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                pool.counts_pairs = kwargs["thread_name_prefix"] == "ddi-precompute"
+
+            def submit(pool, fn, *args, **kwargs):
+                if pool.counts_pairs:
+                    in_flight[0] += 1
+                    peak[0] = max(peak[0], in_flight[0])
+                return super().submit(fn, *args, **kwargs)
+
+        def progress(pair, status, error):
+            in_flight[0] -= 1
+
+        result = dict.fromkeys(precompute.RESULT_FIELDS, "x")
+        with mock.patch.object(precompute, "ThreadPoolExecutor", Pool), \
+                mock.patch.object(views, "_submit_pair"), \
+                mock.patch.object(views, "_collect_pair", return_value=(result, "success", "")):
+            counts = precompute.precompute_pairs(pairs, "v1", 3, progress)
+        self.assertEqual(counts, {"stored": len(pairs), "failed": 0})
+        self.assertEqual(PrecomputedInteraction.objects.filter(model_version="v1").count(), len(pairs))
+        self.assertLessEqual(peak[0], 3 * 2)
+
+
+class StaleWhileRevalidateTests(FakePipelineTestCase):
+    FAILED = {"severity": f"{views.FREDA_ERROR_PREFIX} down", "description": "",
+              "extended_explanation": f"{views.BERNICE_ERROR_PREFIX} down", "recommendation": ""}
+
+    def test_old_result_is_served_and_refreshed_in_the_background(self):
+        self.check("warfarin", "aspirin")
+        self.assertEqual(self.check("warfarin", "aspirin")["X-DDI-Cache-State"], "fresh")
+
+        with mock.patch.object(result_cache, "fresh_s", -1), \
+                mock.patch.object(views, "_schedule_refresh") as schedule:
+            response = self.check("aspirin", "warfarin")
+        self.assertEqual((response["X-DDI-Cache"], response["X-DDI-Cache-State"]), ("HIT", "refreshing"))
+        schedule.assert_called_once_with("aspirin", "warfarin")
+
+    def test_precomputed_results_are_never_stale(self):
+        PrecomputedInteraction.objects.create(drug1="aspirin", drug2="warfarin", severity="Major",
+                                              model_version=views.DDI_MODEL_VERSION)
+        with mock.patch.object(result_cache, "fresh_s", -1), \
+                mock.patch.object(views, "_schedule_refresh") as schedule:
+            self.assertEqual(self.check("warfarin", "aspirin")["X-DDI-Cache-State"], "fresh")
+        schedule.assert_not_called()
+
+    @mock.patch.object(result_cache, "error_ttl_s", 1)
+    def test_failures_are_replayed_until_they_expire(self):
+        with mock.patch.object(views, "_submit_pair"), \
+                mock.patch.object(views, "_collect_pair", return_value=(self.FAILED, "error", "down")) as collect:
+            self.assertEqual(self.check("warfarin", "aspirin")["X-DDI-Cache"], "MISS")
+            response = self.check("aspirin", "warfarin")
+            self.assertEqual(response["X-DDI-Cache"], "NEGATIVE")
+            self.assertEqual(response.data["severity"], self.FAILED["severity"])
+            self.assertEqual(collect.call_count, 1)
+
+            time.sleep(1.1)
+            self.assertEqual(self.check("warfarin", "aspirin")["X-DDI-Cache"], "MISS")
+            self.assertEqual(collect.call_count, 2)
+        self.assertEqual(list(DDICheck.objects.order_by("created_at").values_list("cache_source", flat=True)),
+                         ["", "negative", ""])
+
+
+class ServerTimingTests(FakePipelineTestCase):
+
+    @staticmethod
+    def stages(response):
+        return {part.split(";dur=")[0]: float(part.split(";dur=")[1])
+                for part in response["Server-Timing"].split(", ")}
+
+    def test_live_check_reports_its_stages(self):
+        stages = self.stages(self.check("warfarin", "aspirin"))
+        for stage in ("cache", "freda", "freda_inference", "bernice", "db", "total"):
+            self.assertIn(stage, stages)
+        self.assertGreaterEqual(stages["total"], stages["freda"])
+        # the row keeps what was known before its own insert
+        timings = DDICheck.objects.get().timings
+        self.assertIn("freda", timings)
+        self.assertNotIn("db", timings)
+
+    def test_cache_hit_skips_the_models(self):
+        self.check("warfarin", "aspirin")
+        stages = self.stages(self.check("warfarin", "aspirin"))
+        self.assertNotIn("freda", stages)
+        self.assertIn("cache", stages)
+
+
+class InteractionResultTests(TestCase):
+    MAJOR = {"severity": "Major", "description": "Bleeding risk."}
+
+    def test_pair_key_is_normalized_and_order_independent(self):
+        self.assertEqual(pair_key(" Warfarin", "ASPIRIN "), "aspirin|warfarin")
+        self.assertEqual(pair_key("aspirin", "warfarin"), pair_key("warfarin", "aspirin"))
+        check = DDICheck.objects.create(drug1="Warfarin", drug2="aspirin", severity="Major",
+                                        result=InteractionResult.store("warfarin", "aspirin", "v1", self.MAJOR))
+        self.assertEqual(check.pair_key, "aspirin|warfarin")
+
+    def test_same_texts_are_stored_once(self):
+        first = InteractionResult.store("warfarin", "aspirin", "v1", self.MAJOR)
+        self.assertEqual(InteractionResult.store("aspirin", "warfarin", "v1", dict(self.MAJOR)), first)
+        # other texts, or another model version, get their own row
+        self.assertNotEqual(InteractionResult.store("aspirin", "warfarin", "v1", {"severity": "Minor"}), first)
+        self.assertNotEqual(InteractionResult.store("aspirin", "warfarin", "v2", self.MAJOR), first)
+        self.assertEqual(InteractionResult.objects.count(), 3)
+
+    def test_store_many_matches_store(self):
+        first = InteractionResult.store("warfarin", "aspirin", "v1", self.MAJOR)
+        rows = InteractionResult.store_many("v1", [("aspirin", "warfarin", self.MAJOR),
+                                                   ("warfarin", "ibuprofen", {"severity": "Moderate"}),
+                                                   ("ibuprofen", "warfarin", {"severity": "Moderate"})])
+        self.assertEqual(rows[0], first)
+        self.assertEqual(rows[1], rows[2])
+        self.assertEqual(InteractionResult.objects.count(), 2)
+        with self.assertNumQueries(1):
+            InteractionResult.store_many("v1", [("warfarin", "ibuprofen", {"severity": "Moderate"})])
+
+
+class CheckLogTests(FakePipelineTestCase):
+
+    def _check_with(self, result, status, error_message=""):
+        with mock.patch.object(views, "_submit_pair"), \
+                mock.patch.object(views, "_collect_pair", return_value=(result, status, error_message)):
+            self.check("warfarin", "aspirin")
+        return DDICheck.objects.select_related("result").get()
+
+    def test_failed_check_keeps_its_whole_error(self):
+        message = "Freda timed out after 150s. " + "The Space may be cold or busy. " * 5
+        failed = {"severity": f"{views.FREDA_ERROR_PREFIX} {message}", "description": "",
+                  "extended_explanation": "", "recommendation": ""}
+        row = self._check_with(failed, "error", message)
+        self.assertEqual((row.severity, row.error_message), ("Error", message))
+        self.assertEqual(row.result.severity, failed["severity"])
+
+    def test_overlong_severity_is_truncated_with_a_warning(self):
+        answer = {"severity": "Major " * 30, "description": "", "extended_explanation": "", "recommendation": ""}
+        with self.assertLogs("interactions.views", "WARNING") as logs:
+            row = self._check_with(answer, "success")
+        self.assertEqual(row.severity, answer["severity"][:views.SEVERITY_LABEL_MAX_LENGTH])
+        self.assertIn("truncated", logs.output[0])
+
+
+class BatchCheckTests(TestCase):
+    DRUGS = ["warfarin", "aspirin", "ibuprofen", "metformin", "lisinopril", "digoxin", "amiodarone", "simvastatin"]
+
+    def setUp(self):
+        result_cache.clear()
+        self.addCleanup(result_cache.clear)
+        self.user = User.objects.create_user("batch@example.com", role="DOCTOR")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _precompute(self, drugs):
+        for a, b in combinations(sorted(drugs), 2):
+            PrecomputedInteraction.objects.create(drug1=a, drug2=b, severity=f"{a}+{b}",
+                                                  model_version=views.DDI_MODEL_VERSION)
+
+    def _batch(self, drugs):
+        response = self.client.post("/api/ddi/batch/", {"drugs": drugs}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_cached_pairs_are_looked_up_and_logged_in_bulk(self):
+        self._precompute(self.DRUGS)
+        response = self._batch(self.DRUGS)
+        self.assertEqual(response["X-DDI-Cache"], "HIT=28 MISS=0")
+        data = response.data
+        i, j = self.DRUGS.index("warfarin"), self.DRUGS.index("aspirin")
+        self.assertEqual(data["matrix"][i][j], "aspirin+warfarin")
+        self.assertEqual(data["matrix"][j][i], "aspirin+warfarin")
+        self.assertEqual(DDICheck.objects.filter(cache_source="precomputed").count(), 28)
+        self.assertEqual(DDICheck.objects.get(drug1="warfarin", drug2="aspirin").pair_key, "aspirin|warfarin")
+
+        # all 28 from memory now: their stored results, then the log insert
+        with self.assertNumQueries(2):
+            self._batch(self.DRUGS)
+        self.assertEqual(InteractionResult.objects.count(), 28)
+
+    @mock.patch.object(views, "DDI_BATCH_DEADLINE_S", 0.3)
+    def test_deadline_returns_the_pairs_answered_so_far(self):
+        self._precompute(self.DRUGS[:2])
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def stuck(user, drug1, drug2, executor):
+            release.wait(5)
+            return {"severity": "late"}, "success", ""
+
+        started = time.monotonic()
+        with mock.patch.object(views, "_finish_pair", stuck):
+            data = self._batch(self.DRUGS[:3]).data
+        self.assertLess(time.monotonic() - started, 2)
+        statuses = {(p["drug1"], p["drug2"]): p["status"] for p in data["pairs"]}
+        self.assertEqual(statuses, {("warfarin", "aspirin"): "success",
+                                    ("warfarin", "ibuprofen"): "timeout",
+                                    ("aspirin", "ibuprofen"): "timeout"})
+        self.assertEqual(data["summary"]["timeouts"], 2)
+
+
+class KeepWarmDiscoveryTests(GatewayTestCase):
+
+    @mock.patch.object(gateway_module, "FREDA_REPO_ID", "")
+    def test_cold_space_is_rediscovered(self):
+        from . import keepwarm
+        from .gateway import FREDA
+
+        # remembered from before the Space was redeployed
+        stale = FREDA.signatures[-1]
+        self.gateway._signatures[("FREDA", self.SLOW)] = stale
+        with mock.patch.object(gateway_module, "FREDA_URL", self.SLOW), \
+                mock.patch.object(gateway_module, "gateway", self.gateway):
+            keepwarm._discover(self.SLOW)
+            self.assertEqual(self.gateway.known_signature(FREDA, self.SLOW), stale)
+            keepwarm._discover(self.SLOW, again=True)
+        self.assertEqual(self.gateway.known_signature(FREDA, self.SLOW), FREDA.signatures[0])
+
+
+class KeepWarmCommandTests(SimpleTestCase):
+
+    def test_requires_a_shared_cache(self):
+        from django.core.management import CommandError, call_command
+
+        with self.assertRaisesMessage(CommandError, "REDIS_URL"):
+            call_command("ddi_keepwarm", "--once")
+        with mock.patch("interactions.management.commands.ddi_keepwarm.ping_all", return_value=[]) as ping:
+            call_command("ddi_keepwarm", "--once", "--local", stdout=StringIO())
+        ping.assert_called_once_with()
+        with self.settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache",
+                                               "LOCATION": "redis://localhost:6379"}}):
+            from .keepwarm import shared_cache
+            self.assertTrue(shared_cache())
+
+
+class AsyncCheckViewTests(FakePipelineTestCase):
+
+    async def _check(self, drug1, drug2):
+        from .async_views import ddi_check_async
+
+        request = AsyncRequestFactory().post("/api/ddi/check/", {"drug1": drug1, "drug2": drug2},
+                                             content_type="application/json")
+        response = await ddi_check_async(request)
+        self.assertEqual(response.status_code, 200)
+        return response, json.loads(response.content)
+
+    async def test_checks_go_through_the_gateway(self):
+        calls = gateway_module.gateway.stats()["FREDA"]["calls"]
+        response, data = await self._check("warfarin", "aspirin")
+        self.assertEqual(response["X-DDI-Cache"], "MISS")
+        self.assertEqual(data["severity"], self.expected_severity("warfarin", "aspirin"))
+        self.assertTrue(data["description"].startswith("Simulated interaction"))
+        self.assertEqual(gateway_module.gateway.stats()["FREDA"]["calls"], calls + 1)
+        self.assertIn("freda_inference;dur=", response["Server-Timing"])
+        self.assertIn("bernice;dur=", response["Server-Timing"])
+
+        response, _ = await self._check("aspirin", "warfarin")
+        self.assertEqual((response["X-DDI-Cache"], response["X-DDI-Cache-Source"]), ("HIT", "memory"))
+        self.assertIn("cache;dur=", response["Server-Timing"])
+        self.assertNotIn("freda", response["Server-Timing"])
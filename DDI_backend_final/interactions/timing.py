@@ -0,0 +1,129 @@
+# interactions/timing.py
+"""
+Per-stage timings for one DDI check.
+
+DDICheckView opens a recorder for the request; code further down adds spans
+to it without the recorder being passed around (a context variable, copied
+into the model threads by `submit`). Without an open recorder every call
+here is a no-op, so batch checks, jobs and refreshes pay nothing.
+
+Stages (milliseconds, summed when a stage runs more than once):
+  cache             precomputed / result cache / negative cache lookups
+  coalesce          waiting for an identical check already in flight
+  db                DDICheck / ErrorLog writes
+  <model>           one model's whole call, retries included
+  <model>_client    getting (building, on first use) the Space client
+  <model>_discover  reading the Space's API description (view_api)
+  <model>_submit    handing the call to the Space
+  <model>_queue     waiting in the Space's queue (gradio backend only)
+  <model>_inference running; includes queue wait where it can't be told apart
+  <model>_backoff   sleeping between retries
+  total             the request so far
+
+Freda and Bernice run side by side, so stages add up to more than total.
+"""
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .stats import percentiles
+
+_timings: contextvars.ContextVar[Optional["Timings"]] = contextvars.ContextVar("ddi_timings", default=None)
+_prefix: contextvars.ContextVar[str] = contextvars.ContextVar("ddi_timings_prefix", default="")
+
+
+class Timings:
+    """Stage -> milliseconds for one request; safe to add to from several threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._ms: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._ms[stage] = self._ms.get(stage, 0.0) + seconds * 1000.0
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            out = {stage: round(ms, 1) for stage, ms in self._ms.items()}
+        out["total"] = round((time.perf_counter() - self.started) * 1000.0, 1)
+        return out
+
+    def server_timing(self) -> str:
+        """Value for the Server-Timing response header."""
+        return ", ".join(f"{stage};dur={ms}" for stage, ms in self.as_dict().items())
+
+
+@contextmanager
+def record() -> Iterator[Timings]:
+    """Opens a recorder for the code inside the block (and the model threads it submits to)."""
+    timings = Timings()
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+def current() -> Optional[Timings]:
+    return _timings.get()
+
+
+def snapshot() -> Optional[Dict[str, float]]:
+    timings = _timings.get()
+    return timings.as_dict() if timings is not None else None
+
+
+def _stage(stage: str) -> str:
+    prefix = _prefix.get()
+    return f"{prefix}_{stage}" if prefix else stage
+
+
+def add(stage: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(_stage(stage), seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    name = _stage(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+@contextmanager
+def model(name: str) -> Iterator[None]:
+    """Spans inside the block are recorded as '<name>_<stage>'; the block itself as '<name>'."""
+    with span(name):
+        token = _prefix.set(name)
+        try:
+            yield
+        finally:
+            _prefix.reset(token)
+
+
+def submit(executor: Executor, fn: Callable[..., Any], *args: Any) -> Future:
+    """executor.submit that carries the caller's recorder (and model prefix) into the pool thread."""
+    return executor.submit(contextvars.copy_context().run, fn, *args)
+
+
+def aggregate(rows: Iterable[Optional[Dict[str, float]]]) -> Dict[str, Dict[str, Any]]:
+    """Per-stage p50/p95/p99/mean/max (ms) and sample count over stored timings."""
+    samples: Dict[str, list] = {}
+    for row in rows:
+        for stage, ms in (row or {}).items():
+            if isinstance(ms, (int, float)):
+                samples.setdefault(stage, []).append(float(ms))
+    return {stage: dict(percentiles(values), count=len(values)) for stage, values in sorted(samples.items())}
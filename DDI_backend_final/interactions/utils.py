@@ -0,0 +1,22 @@
+# interactions/utils.py
+from typing import Optional, Tuple
+
+
+def normalize_drug(drug: str) -> str:
+    return " ".join(drug.strip().lower().split())
+
+def canonical_pair(drug1: str, drug2: str) -> Tuple[str, str]:
+    """Normalized, order-independent pair: ("warfarin","aspirin") -> ("aspirin","warfarin")."""
+    a, b = sorted((normalize_drug(drug1), normalize_drug(drug2)))
+    return a, b
+
+def pair_key(drug1: str, drug2: str) -> str:
+    return "|".join(canonical_pair(drug1, drug2))
+
+def repo_to_url(repo_id: str) -> Optional[str]:
+    """'Owner/name' -> 'https://owner-name.hf.space' (None if not a repo id)."""
+    if "/" not in repo_id:
+        return None
+    owner, name = repo_id.split("/", 1)
+    sub = f"{owner.strip().lower()}-{name.strip().lower()}".replace("_", "-")
+    return f"https://{sub}.hf.space"
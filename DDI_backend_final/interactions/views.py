@@ -1,157 +1,430 @@
 # interactions/views.py
 import os
-import io
+import json
 import time
+import hashlib
 import logging
-import contextlib
-from typing import Dict, Tuple, Any, Optional
+import threading
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, wait
+from itertools import combinations
+from typing import Dict, List, Tuple, Any, Optional
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.db import models
+from django.db import connections, models
+from django.db.models.functions import TruncDate
 from datetime import timedelta
 
-from gradio_client import Client
-
-from .serializers import PairCheckSerializer
-from .models import DDICheck, ErrorLog
+from .serializers import PairCheckSerializer, BatchCheckSerializer
+from .models import DailyDDIStats, DDICheck, DDIJob, ErrorLog, InteractionResult
+from . import dashboard, precompute, rollups, timing
+from .jobs import submit_job, refresh_job, job_payload
+from .cache import result_cache
+from .gateway import (
+    BERNICE_API_NAME, BERNICE_URL, DDI_DEADLINE_S, FREDA_API_NAME, FREDA_REPO_ID, FREDA_TIMEOUT_S, FREDA_URL,
+    gateway,
+)
+from .client_pool import client_pool
+from .singleflight import SingleFlight, SharedLock
+from .resilience import Deadline, targets as resilience_targets
+from .keepwarm import snapshot as warmth_snapshot
+from .utils import normalize_drug, pair_key
 
 logger = logging.getLogger(__name__)
 
 # -----------------------------------------------------------------------------
-# HF Space config (override via environment variables)
+# Config (override via environment variables); Space URLs, timeouts and
+# retries live in interactions/gateway.py
 # -----------------------------------------------------------------------------
-# Bernice
-BERNICE_URL       = os.getenv("BERNICE_URL", "https://bernice775-transformer-model-ddi.hf.space")
-BERNICE_API_NAME  = "/run_interaction_check"    # param: drug_input
-BERNICE_TIMEOUT_S = int(os.getenv("BERNICE_TIMEOUT_S", "120"))
-BERNICE_RETRIES   = int(os.getenv("BERNICE_RETRIES", "2"))
-
-# Freda — SIX 'a's
-FREDA_URL         = os.getenv("FREDA_URL", "https://fredaaaaaa-severity.hf.space")
-FREDA_REPO_ID     = os.getenv("FREDA_REPO_ID", "Fredaaaaaa/severity")
-FREDA_API_NAME    = "/lambda"                   # param: x
-FREDA_TIMEOUT_S   = int(os.getenv("FREDA_TIMEOUT_S", "150"))
-FREDA_RETRIES     = int(os.getenv("FREDA_RETRIES", "3"))
-
-# If Spaces are private/gated, set a read token:
-HF_TOKEN          = os.getenv("HF_TOKEN")  # hf_****************
-DEBUG_LOG_SPACES  = os.getenv("DEBUG_LOG_SPACES", "0") == "1"  # log endpoints
+# Freda and Bernice run side by side on this pool (2 threads per check)
+DDI_MODEL_WORKERS = int(os.getenv("DDI_MODEL_WORKERS", "8"))
+# Uncached pairs checked at once by batch requests in this worker; each has
+# a pair thread and two model threads, so no pair waits for a model thread
+DDI_BATCH_CONCURRENCY = int(os.getenv("DDI_BATCH_CONCURRENCY", "32"))
+# One deadline for a whole batch request; pairs without an answer by then are
+# returned as 'timeout' (keep it under the gunicorn --timeout)
+DDI_BATCH_DEADLINE_S = float(os.getenv("DDI_BATCH_DEADLINE_S", str(min(DDI_DEADLINE_S, 100))))
+
+# Cross-worker coalescing: how long a peer waits for another worker's result
+DDI_COALESCE_LOCK_S = int(os.getenv("DDI_COALESCE_LOCK_S", str(FREDA_TIMEOUT_S + 30)))
+
+# "sync" (DRF view on a gunicorn thread) or "async" (native async view on the
+# gateway's async path, see interactions/async_views.py; serve with an ASGI server)
+DDI_CHECK_IMPL = os.getenv("DDI_CHECK_IMPL", "sync").lower()
+
+# Background refreshes of stale cached results (stale-while-revalidate)
+DDI_REFRESH_WORKERS = int(os.getenv("DDI_REFRESH_WORKERS", "2"))
+
+# Async jobs: SSE poll interval and max stream duration. A stream holds one
+# gunicorn thread, so it is kept well under the worker timeout (120s); the
+# client then reconnects (EventSource does) or polls the job.
+DDI_JOB_POLL_S       = float(os.getenv("DDI_JOB_POLL_S", "1"))
+DDI_JOB_STREAM_MAX_S = int(os.getenv("DDI_JOB_STREAM_MAX_S", "25"))
+DDI_JOB_RETRY_MS     = int(os.getenv("DDI_JOB_RETRY_MS", "2000"))
+
+# Admin dashboard: stage percentiles are computed over at most this many recent checks
+DASHBOARD_TIMING_ROWS = int(os.getenv("DASHBOARD_TIMING_ROWS", "5000"))
+
+# Cached results are only reused for the same model deployment. Bump
+# DDI_MODEL_VERSION when a Space is retrained behind an unchanged URL.
+DDI_MODEL_VERSION = os.getenv("DDI_MODEL_VERSION") or hashlib.sha1(
+    f"{FREDA_URL}|{FREDA_REPO_ID}{FREDA_API_NAME}|{BERNICE_URL}{BERNICE_API_NAME}".encode()
+).hexdigest()[:16]
 
 # -----------------------------------------------------------------------------
 # Utilities
 # -----------------------------------------------------------------------------
-def _normalize(drug: str) -> str:
-    return " ".join(drug.strip().lower().split())
-
-def _quiet_call(fn, *args, **kwargs):
-    """Suppress stdout/stderr (avoids Windows '✔' charmap crashes)."""
-    buf_out, buf_err = io.StringIO(), io.StringIO()
-    with contextlib.redirect_stdout(buf_out), contextlib.redirect_stderr(buf_err):
-        return fn(*args, **kwargs)
-
-def _client(target: str) -> Client:
-    logger.info("Initializing HF client for %s", target)
-    c: Client = _quiet_call(Client, target, hf_token=HF_TOKEN)
-    # Warm up Space and list endpoints; this also wakes cold starts
-    if DEBUG_LOG_SPACES:
+_model_pool = ThreadPoolExecutor(max_workers=DDI_MODEL_WORKERS, thread_name_prefix="ddi-model")
+
+# Shared by every batch request, so concurrent batches split the capacity
+# instead of each starting threads of its own
+_batch_pool = ThreadPoolExecutor(max_workers=DDI_BATCH_CONCURRENCY, thread_name_prefix="ddi-batch")
+_batch_model_pool = ThreadPoolExecutor(max_workers=2 * DDI_BATCH_CONCURRENCY, thread_name_prefix="ddi-batch-model")
+
+# Coalescing of identical in-flight pair checks (see _finish_pair)
+_inflight = SingleFlight()
+_pair_locks = SharedLock("ddi:inflight", ttl_s=DDI_COALESCE_LOCK_S, wait_s=DDI_COALESCE_LOCK_S)
+
+# Stale-while-revalidate: pairs with a refresh queued or running in this process
+_refresh_pool = ThreadPoolExecutor(max_workers=DDI_REFRESH_WORKERS, thread_name_prefix="ddi-refresh")
+_refreshing: set = set()
+_refreshing_lock = threading.Lock()
+
+# -----------------------------------------------------------------------------
+# Pair pipeline (shared by the single and batch views)
+# -----------------------------------------------------------------------------
+PairFutures = Tuple[Future, Future]
+
+def _submit_pair(executor: Executor, drug1: str, drug2: str) -> PairFutures:
+    # Both Spaces are independent: run them concurrently so wall time is
+    # max(Freda, Bernice) rather than the sum.
+    return (
+        timing.submit(executor, gateway.severity, drug1, drug2),
+        timing.submit(executor, gateway.details, drug1, drug2),
+    )
+
+FREDA_ERROR_PREFIX = "Error from Freda model:"
+BERNICE_ERROR_PREFIX = "Error from Bernice model:"
+# DDICheck.severity is the short label shown in listings
+SEVERITY_LABEL_MAX_LENGTH = DDICheck._meta.get_field("severity").max_length
+
+def _both_models_failed(result: Dict[str, str]) -> bool:
+    return (result["severity"].startswith(FREDA_ERROR_PREFIX)
+            and result["extended_explanation"].startswith(BERNICE_ERROR_PREFIX))
+
+def _collect_pair(futures: PairFutures) -> Tuple[Dict[str, str], str, str]:
+    """
+    Waits for both model calls and maps failures to user-facing text.
+    Returns (result, status, error_message). Runs on the request thread so
+    ErrorLog writes use the request's DB connection.
+    """
+    freda_future, bernice_future = futures
+
+    # --- Freda: severity ---
+    try:
+        severity = freda_future.result()
+        check_status = 'success'
+        error_msg = ''
+    except Exception as e:
+        msg = str(e)
+        if any(x in msg for x in ["401", "Repository Not Found", "Invalid username or password"]):
+            msg = (
+                "Freda auth/endpoint issue. Verify FREDA_REPO_ID is 'Fredaaaaaa/severity' "
+                "or set FREDA_URL to 'https://fredaaaaaa-severity.hf.space', "
+                "and provide HF_TOKEN if the Space is private."
+            )
+        elif "timed out" in msg.lower():
+            msg = (
+                f"Freda timed out after {FREDA_TIMEOUT_S}s. The Space may be cold or busy. "
+                f"Increase FREDA_TIMEOUT_S or FREDA_RETRIES, or try again."
+            )
+        severity = f"{FREDA_ERROR_PREFIX} {msg}"
+        check_status = 'error'
+        error_msg = msg
         try:
-            api = _quiet_call(c.view_api)
-            endpoints = [a["api_name"] for a in api.get("named_endpoints", [])]
-            logger.info("Space ready at %s; endpoints: %s", target, endpoints)
-        except Exception as e:
-            logger.warning("view_api() failed for %s: %s", target, e)
-    else:
-        # even if DEBUG off, do a silent warm-up once
+            with timing.span("db"):
+                ErrorLog.objects.create(source="Freda", message=msg)
+        except Exception:
+            pass
+
+    # --- Bernice: details ---
+    description = extended = recommendation = ""
+    try:
+        details: Dict[str, Any] = bernice_future.result()
+        description = details.get("interaction", "") or ""
+        extended = details.get("explanation", "") or ""
+        recommendation = details.get("recommendations", "") or ""
+    except Exception as e:
+        description = ""
+        extended = f"{BERNICE_ERROR_PREFIX} {e}"
+        recommendation = ""
+        if check_status == 'success':
+            check_status = 'error'
+            error_msg = f"Bernice error: {e}"
         try:
-            _quiet_call(c.view_api)
+            with timing.span("db"):
+                ErrorLog.objects.create(source="Bernice", message=str(e))
         except Exception:
             pass
-    return c
 
-def _repo_to_url(repo_id: str) -> Optional[str]:
-    if "/" not in repo_id:
-        return None
-    owner, name = repo_id.split("/", 1)
-    sub = f"{owner.strip().lower()}-{name.strip().lower()}".replace("_", "-")
-    return f"https://{sub}.hf.space"
+    result = {
+        "severity": str(severity),
+        "description": description,
+        "extended_explanation": extended,
+        "recommendation": recommendation,
+    }
+    return result, check_status, error_msg
 
-# -----------------------------------------------------------------------------
-# Robust queued calls with retries/backoff
-# -----------------------------------------------------------------------------
-def _call_space_with_queue(client: Client, api_name: str, timeout_s: int, **kwargs):
+def _finish_pair(user, drug1: str, drug2: str, executor: Executor) -> Tuple[Dict[str, str], str, str]:
+    """
+    Live check for a cache miss. Identical pairs already in flight are
+    coalesced: within this process via single-flight, across workers via a
+    lock in the shared cache (the waiting side picks the result up from the
+    result cache's DB tier). The computing side persists and caches the
+    result; joiners only log their own check.
+
+    When both models fail the failure is cached for DDI_CACHE_ERROR_TTL_S,
+    and retries inside that window get it back without calling the Spaces.
+
+    Returns (result, status, cache_source) where cache_source is '' for the
+    caller that actually hit the Spaces, 'coalesced' for joiners, 'negative'
+    for a cached failure and 'stale' when an expired result was served
+    because the circuit is open.
     """
-    Uses the queue API (submit) and waits for result with a timeout.
+    key = f"{pair_key(drug1, drug2)}|{DDI_MODEL_VERSION}"
+
+    def recent_failure():
+        with timing.span("cache"):
+            failed = result_cache.get_failure(drug1, drug2, DDI_MODEL_VERSION)
+        if failed is None:
+            return None
+        _log_check(user, drug1, drug2, failed["result"], status=failed["status"],
+                   error_message=failed["error_message"], cache_source="negative")
+        return failed["result"], failed["status"], "negative"
+
+    def compute():
+        failed = recent_failure()
+        if failed is not None:
+            return failed
+        with _pair_locks.hold(key) as owner:
+            if not owner:
+                with timing.span("coalesce"):
+                    cached = _pair_locks.wait(
+                        key, lambda: result_cache.get(drug1, drug2, DDI_MODEL_VERSION, record=False)[0]
+                    )
+                if cached is not None:
+                    _log_check(user, drug1, drug2, cached, status="success", cache_source="coalesced")
+                    return cached, "success", "coalesced"
+                # the other worker's call failed: share its failure too
+                failed = recent_failure()
+                if failed is not None:
+                    return failed
+            if not gateway.spaces_available():
+                # Freda's circuits are open: an expired answer beats a fast failure
+                stale = result_cache.last_known(drug1, drug2, DDI_MODEL_VERSION)
+                if stale is not None:
+                    _log_check(user, drug1, drug2, stale, status="success", cache_source="stale")
+                    return stale, "success", "stale"
+            result, check_status, error_msg = _collect_pair(_submit_pair(executor, drug1, drug2))
+            _log_check(user, drug1, drug2, result, status=check_status, error_message=error_msg)
+            if check_status == 'success':
+                result_cache.set(drug1, drug2, DDI_MODEL_VERSION, result)
+            elif _both_models_failed(result):
+                result_cache.set_failure(drug1, drug2, DDI_MODEL_VERSION, result, check_status, error_msg)
+            return result, check_status, ""
+
+    started = time.perf_counter()
+    (result, check_status, source), shared = _inflight.do(key, compute)
+    if shared:
+        timing.add("coalesce", time.perf_counter() - started)
+        _log_check(user, drug1, drug2, result, status=check_status, cache_source="coalesced")
+        source = "coalesced"
+    return result, check_status, source
+
+def _finish_pair_in_thread(user, drug1: str, drug2: str, executor: Executor):
+    try:
+        return _finish_pair(user, drug1, drug2, executor)
+    finally:
+        # pool threads open their own DB connections; don't leak them
+        connections.close_all()
+
+def _cached_result(drug1: str, drug2: str) -> Tuple[Optional[Dict[str, str]], str, bool]:
     """
-    job = _quiet_call(client.submit, api_name=api_name, **kwargs)
-    # Wait for completion with timeout
-    return job.result(timeout=timeout_s)
+    The result cache's memory tier, then the precomputed table (whose rows
+    are then kept in memory too), then the cache's DB tier. Returns (result,
+    source, refreshing); a cached result older than DDI_CACHE_FRESH_S is
+    still returned, with a background refresh scheduled and refreshing=True.
+    Precomputed results are never stale.
+    """
+    return _cached_results([(drug1, drug2)]).get((drug1, drug2), (None, "", False))
+
+def _cached_results(pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[Dict[str, str], str, bool]]:
+    """_cached_result for many pairs, with one query per tier; misses are left out."""
+    found = result_cache.lookup_many(pairs, DDI_MODEL_VERSION, memory_only=True)
+    rest = [pair for pair in pairs if pair not in found]
+    if rest:
+        for (d1, d2), result in precompute.lookup_many(rest, DDI_MODEL_VERSION).items():
+            result_cache.set(d1, d2, DDI_MODEL_VERSION, result, source="precomputed")
+            found[(d1, d2)] = (result, "precomputed", None)
+        rest = [pair for pair in rest if pair not in found]
+    if rest:
+        found.update(result_cache.lookup_many(rest, DDI_MODEL_VERSION))
+
+    out = {}
+    for (d1, d2), (result, source, age_s) in found.items():
+        refreshing = source != "precomputed" and not result_cache.is_fresh(age_s)
+        if refreshing:
+            _schedule_refresh(d1, d2)
+        out[(d1, d2)] = (result, source, refreshing)
+    return out
+
+def _schedule_refresh(drug1: str, drug2: str) -> None:
+    key = pair_key(drug1, drug2)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _refresh_pool.submit(_refresh_pair, drug1, drug2)
+
+def _refresh_pair(drug1: str, drug2: str) -> None:
+    """Recomputes a stale pair; the new row in DDICheck refreshes every worker's DB tier."""
+    key = f"{pair_key(drug1, drug2)}|{DDI_MODEL_VERSION}"
+    try:
+        with _pair_locks.hold(key) as owner:
+            if not owner or not gateway.spaces_available():
+                return
+            # another worker may have refreshed it already
+            result_cache.invalidate(drug1, drug2, DDI_MODEL_VERSION)
+            _, _, age_s = result_cache.lookup(drug1, drug2, DDI_MODEL_VERSION, record=False)
+            if result_cache.is_fresh(age_s):
+                return
+            result, check_status, _ = _collect_pair(_submit_pair(_model_pool, drug1, drug2))
+            if check_status == 'success':
+                _log_check(None, drug1, drug2, result, status=check_status, cache_source="refresh")
+                result_cache.set(drug1, drug2, DDI_MODEL_VERSION, result)
+    except Exception:
+        logger.exception("Background refresh of %s + %s failed", drug1, drug2)
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(pair_key(drug1, drug2))
+        connections.close_all()
+
+def _check_label(drug1: str, drug2: str, result: Dict[str, str], error_message: str) -> Tuple[str, str]:
+    """
+    DDICheck's (severity, error_message) for a result: a failed Freda call is
+    labelled "Error" and its text kept whole in error_message.
+    """
+    severity = result["severity"]
+    if severity.startswith(FREDA_ERROR_PREFIX):
+        return "Error", error_message or severity
+    if len(severity) > SEVERITY_LABEL_MAX_LENGTH:
+        logger.warning("Severity of %s + %s truncated from %d characters: %r",
+                       drug1, drug2, len(severity), severity)
+        severity = severity[:SEVERITY_LABEL_MAX_LENGTH]
+    return severity, error_message
+
+def _log_check(user, drug1: str, drug2: str, result: Dict[str, str], *,
+               status: str, error_message: str = "", cache_source: str = "") -> None:
+    # Stage timings so far when DDICheckView is recording (this insert only
+    # shows up in its Server-Timing header)
+    timings = timing.snapshot()
+    severity, error_message = _check_label(drug1, drug2, result, error_message)
+    try:
+        with timing.span("db"):
+            DDICheck.objects.create(
+                user=user,
+                drug1=drug1,
+                drug2=drug2,
+                # full texts are in the shared result row
+                severity=severity,
+                result=InteractionResult.store(drug1, drug2, DDI_MODEL_VERSION, result),
+                status=status,
+                error_message=error_message,
+                model_version=DDI_MODEL_VERSION,
+                cache_source=cache_source,
+                timings=timings,
+            )
+    except Exception as e:
+        logger.warning("Failed to log DDICheck: %s", e)
 
-def _freda_predict_pair(drug1: str, drug2: str) -> str:
+def _log_checks(user, rows: List[Tuple[str, str, Dict[str, str], str, str, str]]) -> None:
     """
-    Calls Freda (severity) with retries/backoff. Tries URL -> repo_id -> derived URL.
-    Uses queue submit to tolerate cold starts and long inferences.
+    _log_check for many (drug1, drug2, result, status, error_message,
+    cache_source) rows: their InteractionResult rows are looked up / stored
+    together and the log rows go in with one insert.
     """
-    attempts_targets = []
-    if FREDA_URL:
-        attempts_targets.append(("URL", FREDA_URL))
-    if FREDA_REPO_ID:
-        attempts_targets.append(("REPO_ID", FREDA_REPO_ID))
-        derived = _repo_to_url(FREDA_REPO_ID)
-        if derived and (not FREDA_URL or derived != FREDA_URL):
-            attempts_targets.append(("DERIVED_URL", derived))
-
-    last_err: Optional[Exception] = None
-    backoff = 2.0
-    for kind, target in attempts_targets:
-        for attempt in range(1, FREDA_RETRIES + 1):
-            try:
-                logger.info("FREDA attempt %d/%d (%s): %s", attempt, FREDA_RETRIES, kind, target)
-                client = _client(target)
-                return _call_space_with_queue(
-                    client,
-                    api_name=FREDA_API_NAME,
-                    timeout_s=FREDA_TIMEOUT_S,
-                    x=f"{drug1},{drug2}",
+    if not rows:
+        return
+    timings = timing.snapshot()
+    try:
+        with timing.span("db"):
+            results = InteractionResult.store_many(DDI_MODEL_VERSION, [(d1, d2, result) for d1, d2, result, *_ in rows])
+            DDICheck.objects.bulk_create([
+                DDICheck(
+                    user=user,
+                    drug1=d1,
+                    drug2=d2,
+                    pair_key=pair_key(d1, d2),  # bulk_create skips save()
+                    severity=severity,
+                    result=stored,
+                    status=status,
+                    error_message=error_message,
+                    model_version=DDI_MODEL_VERSION,
+                    cache_source=cache_source,
+                    timings=timings,
                 )
-            except Exception as e:
-                last_err = e
-                logger.warning("FREDA call failed (attempt %d, %s): %s", attempt, kind, e)
-                if attempt < FREDA_RETRIES:
-                    time.sleep(backoff)
-                    backoff *= 1.6
-        # next target kind
-
-    # All attempts failed
-    raise last_err if last_err else RuntimeError("Freda client creation failed")
-
-def _bernice_generate_for_pair(drug1: str, drug2: str) -> Dict[str, str]:
-    last_err: Optional[Exception] = None
-    backoff = 1.6
-    for attempt in range(1, BERNICE_RETRIES + 1):
-        try:
-            client = _client(BERNICE_URL)
-            out: Tuple[str, str, str] = _call_space_with_queue(
-                client,
-                api_name=BERNICE_API_NAME,
-                timeout_s=BERNICE_TIMEOUT_S,
-                drug_input=f"{drug1},{drug2}",
-            )
-            interaction, explanation, recommendations = out
-            return {
-                "interaction": interaction or "",
-                "explanation": explanation or "",
-                "recommendations": recommendations or "",
-            }
-        except Exception as e:
-            last_err = e
-            logger.warning("Bernice call failed (attempt %d): %s", attempt, e)
-            if attempt < BERNICE_RETRIES:
-                time.sleep(backoff)
-                backoff *= 1.6
-    raise last_err if last_err else RuntimeError("Bernice call failed")
+                for (d1, d2, result, status, error_message, cache_source), stored in zip(rows, results)
+                for severity, error_message in [_check_label(d1, d2, result, error_message)]
+            ])
+        # and post_save: what signals.check_saved would have done
+        dashboard.invalidate(dashboard.hospital_of(user.pk if user is not None else None))
+    except Exception as e:
+        logger.warning("Failed to log DDIChecks: %s", e)
+
+def _parse_pair(request) -> Tuple[str, str]:
+    return _parse_pair_payload(request.data.copy())
+
+def _parse_pair_payload(payload) -> Tuple[str, str]:
+    if "selected_pair" in payload and ("drug1" not in payload or "drug2" not in payload):
+        parts = [p.strip() for p in str(payload["selected_pair"]).split(",") if p.strip()]
+        if len(parts) >= 2:
+            payload["drug1"], payload["drug2"] = parts[0], parts[1]
+
+    s = PairCheckSerializer(data=payload)
+    s.is_valid(raise_exception=True)
+    return normalize_drug(s.validated_data["drug1"]), normalize_drug(s.validated_data["drug2"])
+
+def _pair_payload(drug1: str, drug2: str, result: Dict[str, str]) -> Dict[str, str]:
+    return {
+        "drug1": drug1,
+        "drug2": drug2,
+        "severity": result["severity"],
+        "description": result["description"],
+        "extended_explanation": result["extended_explanation"],
+        "recommendation": result["recommendation"],
+    }
+
+def _pair_response(drug1: str, drug2: str, result: Dict[str, str], *,
+                   cache_status: str, cache_source: str = "", cache_state: str = "") -> Response:
+    return _set_cache_headers(
+        Response(_pair_payload(drug1, drug2, result)),
+        cache_status=cache_status, cache_source=cache_source, cache_state=cache_state,
+    )
+
+def _set_cache_headers(response, *, cache_status: str, cache_source: str = "", cache_state: str = ""):
+    # HIT/MISS so clients and access logs can track the cache hit rate
+    response["X-DDI-Cache"] = cache_status
+    if cache_source:
+        response["X-DDI-Cache-Source"] = cache_source
+    # fresh | refreshing (stale, refresh running in the background) | stale
+    if cache_state:
+        response["X-DDI-Cache-State"] = cache_state
+    return response
 
 # -----------------------------------------------------------------------------
 # Views
@@ -165,145 +438,301 @@ class DDICheckView(APIView):
           { "drug1": "...", "drug2": "..." }
         or:
           { "selected_pair": "drug A, drug B" }
+
+        Per-stage timings (see interactions/timing.py) are stored on the
+        DDICheck row and returned in the Server-Timing header.
         """
-        payload = request.data.copy()
-        if "selected_pair" in payload and ("drug1" not in payload or "drug2" not in payload):
-            parts = [p.strip() for p in str(payload["selected_pair"]).split(",") if p.strip()]
-            if len(parts) >= 2:
-                payload["drug1"], payload["drug2"] = parts[0], parts[1]
+        d1, d2 = _parse_pair(request)
+        user = request.user if request.user.is_authenticated else None
+
+        with timing.record() as timings:
+            response = self._check(user, d1, d2)
+        response["Server-Timing"] = timings.server_timing()
+        return response
+
+    @staticmethod
+    def _check(user, d1: str, d2: str) -> Response:
+        # --- Precomputed pair, or same canonical pair + model version answered recently ---
+        with timing.span("cache"):
+            cached, source, refreshing = _cached_result(d1, d2)
+        if cached is not None:
+            _log_check(user, d1, d2, cached, status="success", cache_source=source)
+            return _pair_response(d1, d2, cached, cache_status="HIT", cache_source=source,
+                                  cache_state="refreshing" if refreshing else "fresh")
+
+        result, _, source = _finish_pair(user, d1, d2, _model_pool)
+        if source:
+            return _pair_response(d1, d2, result, cache_status=source.upper(), cache_source=source,
+                                  cache_state="stale" if source == "stale" else "")
+        return _pair_response(d1, d2, result, cache_status="MISS")
+
+
+class DDIBatchCheckView(APIView):
+    """
+    Checks a whole regimen at once.
+
+    POST { "drugs": ["warfarin", "aspirin", ...] }  and/or  { "patient": <id> }
+    (the patient's current medications). Every unique unordered pair is served
+    from cache where possible (one query per cache tier, one insert for the
+    log); the misses all start at once on the shared batch pools, so a
+    regimen takes roughly as long as its slowest uncached pair. The whole
+    request has one deadline, DDI_BATCH_DEADLINE_S: pairs still without an
+    answer then come back with status 'timeout' (those already running
+    finish in the background and are cached for the next check).
+    """
+    permission_classes = [IsAuthenticated]
 
-        s = PairCheckSerializer(data=payload)
+    TIMEOUT_MESSAGE = "No answer within the {:.0f}s batch deadline; check this pair again shortly."
+
+    def post(self, request):
+        deadline = Deadline(DDI_BATCH_DEADLINE_S)
+        s = BatchCheckSerializer(data=request.data, context={"request": request})
         s.is_valid(raise_exception=True)
-        d1 = _normalize(s.validated_data["drug1"])
-        d2 = _normalize(s.validated_data["drug2"])
+        drugs = s.validated_data["drugs"]
+        user = request.user
+
+        pairs = list(combinations(drugs, 2))
+        results: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        cached = _cached_results(pairs)
+        for (d1, d2), (result, _, refreshing) in cached.items():
+            results[(d1, d2)] = dict(result, status="success", cached=True, refreshing=refreshing)
+        misses = [pair for pair in pairs if pair not in cached]
+        log_rows = [(d1, d2, result, "success", "", source) for (d1, d2), (result, source, _) in cached.items()]
+
+        if misses:
+            submitted = {
+                _batch_pool.submit(_finish_pair_in_thread, user, d1, d2, _batch_model_pool): (d1, d2)
+                for d1, d2 in misses
+            }
+            done, not_done = wait(submitted, timeout=deadline.remaining())
+            for future in done:
+                result, check_status, source = future.result()
+                results[submitted[future]] = dict(result, status=check_status, cached=bool(source), refreshing=False)
+            message = self.TIMEOUT_MESSAGE.format(DDI_BATCH_DEADLINE_S)
+            for future in not_done:
+                d1, d2 = submitted[future]
+                result = {"severity": message, "description": "", "extended_explanation": "", "recommendation": ""}
+                results[(d1, d2)] = dict(result, status="timeout", cached=False, refreshing=False)
+                # a pair that never started is logged here; a running one logs itself when it ends
+                if future.cancel():
+                    log_rows.append((d1, d2, result, "timeout", message, ""))
+        _log_checks(user, log_rows)
+
+        index = {d: i for i, d in enumerate(drugs)}
+        matrix: List[List[Optional[str]]] = [[None] * len(drugs) for _ in drugs]
+        pair_rows = []
+        for d1, d2 in pairs:
+            r = results[(d1, d2)]
+            i, j = index[d1], index[d2]
+            matrix[i][j] = matrix[j][i] = r["severity"]
+            pair_rows.append({"drug1": d1, "drug2": d2, **r})
+
+        response = Response({
+            "drugs": drugs,
+            "matrix": matrix,
+            "pairs": pair_rows,
+            "summary": {
+                "pairs": len(pairs),
+                "cached": len(cached),
+                "errors": sum(1 for r in pair_rows if r["status"] != "success"),
+                "timeouts": sum(1 for r in pair_rows if r["status"] == "timeout"),
+            },
+        })
+        response["X-DDI-Cache"] = f"HIT={len(cached)} MISS={len(misses)}"
+        return response
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = "text/event-stream"
+    format = "event-stream"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
 
+class DDIJobCreateView(APIView):
+    """
+    POST same body as /api/ddi/check/ -> 202 { "id": ..., "status": "queued", ... }
+
+    The check runs on the local job pool; fetch the outcome from
+    /api/ddi/jobs/<id>/ (polling) or /api/ddi/jobs/<id>/stream/ (SSE).
+    The job id is an unguessable UUID and is all that is needed to read it.
+    """
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        d1, d2 = _parse_pair(request)
         user = request.user if request.user.is_authenticated else None
+        job = submit_job(user, d1, d2)
+        http_status = 200 if job.is_finished else 202
+        return Response(job_payload(job), status=http_status)
 
-        # --- Freda: severity ---
-        try:
-            severity = _freda_predict_pair(d1, d2)
-            check_status = 'success'
-            error_msg = ''
-        except Exception as e:
-            msg = str(e)
-            if any(x in msg for x in ["401", "Repository Not Found", "Invalid username or password"]):
-                msg = (
-                    "Freda auth/endpoint issue. Verify FREDA_REPO_ID is 'Fredaaaaaa/severity' "
-                    "or set FREDA_URL to 'https://fredaaaaaa-severity.hf.space', "
-                    "and provide HF_TOKEN if the Space is private."
-                )
-            elif "timed out" in msg.lower():
-                msg = (
-                    f"Freda timed out after {FREDA_TIMEOUT_S}s. The Space may be cold or busy. "
-                    f"Increase FREDA_TIMEOUT_S or FREDA_RETRIES, or try again."
-                )
-            severity = f"Error from Freda model: {msg}"
-            check_status = 'error'
-            error_msg = msg
-            try:
-                ErrorLog.objects.create(source="Freda", message=msg)
-            except Exception:
-                pass
 
-        # --- Bernice: details ---
-        description = extended = recommendation = ""
-        try:
-            details: Dict[str, Any] = _bernice_generate_for_pair(d1, d2)
-            description = details.get("interaction", "") or ""
-            extended = details.get("explanation", "") or ""
-            recommendation = details.get("recommendations", "") or ""
-        except Exception as e:
-            description = ""
-            extended = f"Error from Bernice model: {e}"
-            recommendation = ""
-            if check_status == 'success':
-                check_status = 'error'
-                error_msg = f"Bernice error: {e}"
-            try:
-                ErrorLog.objects.create(source="Bernice", message=str(e))
-            except Exception:
-                pass
+class DDIJobDetailView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(DDIJob, pk=job_id)
+        return Response(job_payload(refresh_job(job)))
+
+
+class DDIJobStreamView(APIView):
+    """
+    Server-sent events for one job: a `status` event whenever the status
+    changes, then a final `result` event. Each poll is a short DB read; the
+    stream closes when the job finishes or after DDI_JOB_STREAM_MAX_S. In the
+    latter case a `reconnect` event comes last: EventSource reconnects by
+    itself after `retry` ms (and gets the current status first), other
+    clients can poll the job URL it carries.
+    """
+    permission_classes = [AllowAny]
+    renderer_classes = [EventStreamRenderer, JSONRenderer]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(DDIJob, pk=job_id)
+
+        def events():
+            last_status = None
+            started = last_sent = time.monotonic()
+            current = job
+            yield f"retry: {DDI_JOB_RETRY_MS}\n\n"
+            while True:
+                current = refresh_job(current)
+                if current.status != last_status:
+                    last_status = current.status
+                    last_sent = time.monotonic()
+                    event = "result" if current.is_finished else "status"
+                    yield f"event: {event}\ndata: {json.dumps(job_payload(current))}\n\n"
+                if current.is_finished:
+                    return
+                if time.monotonic() - started >= DDI_JOB_STREAM_MAX_S:
+                    data = {"id": str(current.pk), "status": current.status,
+                            "poll": f"/api/ddi/jobs/{current.pk}/", "retry_ms": DDI_JOB_RETRY_MS}
+                    yield f"event: reconnect\ndata: {json.dumps(data)}\n\n"
+                    return
+                time.sleep(DDI_JOB_POLL_S)
+                if time.monotonic() - last_sent > 15:
+                    last_sent = time.monotonic()
+                    yield ": keep-alive\n\n"
+                current = DDIJob.objects.get(pk=current.pk)
+
+        response = StreamingHttpResponse(events(), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+class DDIStatusView(APIView):
+    """Per-process health of the DDI pipeline: breakers, latency, pool, warmth, cache and precompute stats."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({
+            "spaces_available": gateway.spaces_available(),
+            "deadline_s": DDI_DEADLINE_S,
+            "targets": resilience_targets.snapshot(),
+            "clients": client_pool.stats(),
+            "gateway": gateway.stats(),
+            "coalescing": {"in_flight": _inflight.in_flight()},
+            "warmth": warmth_snapshot(),
+            "cache": result_cache.stats(),
+            "precompute": precompute.coverage(DDI_MODEL_VERSION),
+        })
 
-        # Persist the check
-        try:
-            DDICheck.objects.create(
-                user=user,
-                drug1=d1,
-                drug2=d2,
-                severity=str(severity),
-                description=description,
-                extended_explanation=extended,
-                recommendation=recommendation,
-                status=check_status,
-                error_message=error_msg,
-            )
-        except Exception as e:
-            logger.warning("Failed to log DDICheck: %s", e)
-
-        return Response(
-            {
-                "drug1": d1,
-                "drug2": d2,
-                "severity": severity,
-                "description": description,
-                "extended_explanation": extended,
-                "recommendation": recommendation,
-            }
-        )
 
 class AdminDashboardView(APIView):
+    """
+    Hospital admin overview. A fixed handful of queries whatever the
+    hospital's size: hospital users are a subquery, not an ID list; past days
+    come from the DailyDDIStats rollups, and only the last 24h (plus any day
+    not rolled up since it ended) is counted from the DDICheck log, in one
+    grouped, conditionally aggregated query. The assembled payload is cached
+    per hospital (interactions/dashboard.py); X-Dashboard-Cache says whether
+    this response was computed (MISS), cached (HIT) or shared (COALESCED).
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from accounts.models import User, AdminProfile, ProfessionalProfile
+        from accounts.models import AdminProfile
 
         # Get admin's hospital
         try:
-            admin_profile = AdminProfile.objects.get(user=request.user)
-            hospital = admin_profile.hospital
+            hospital_id = AdminProfile.objects.values_list('hospital_id', flat=True).get(user=request.user)
         except AdminProfile.DoesNotExist:
             return Response({'error': 'Admin profile not found'}, status=403)
 
+        data, cache_status = dashboard.payload(hospital_id, lambda: self._payload(hospital_id))
+        response = Response(data)
+        response["X-Dashboard-Cache"] = cache_status
+        return response
+
+    @staticmethod
+    def _payload(hospital_id) -> Dict[str, Any]:
+        from accounts.models import User, AdminProfile, ProfessionalProfile
+
         now = timezone.now()
         last_24h = now - timedelta(hours=24)
         last_7d = now - timedelta(days=7)
+        # ddi_checks_7d: the last 7 calendar days, today included
+        today = timezone.localdate(now)
+        days = [today - timedelta(days=6 - i) for i in range(7)]
 
         # Filter users by hospital - only users associated with this hospital
         hospital_users = User.objects.filter(
-            models.Q(admin_profile__hospital=hospital) |
-            models.Q(professional_profile__hospital=hospital)
-        ).distinct()
-
-        total_users = hospital_users.count()
-        new_signups_7d = hospital_users.filter(date_joined__gte=last_7d).count()
+            models.Q(pk__in=AdminProfile.objects.filter(hospital_id=hospital_id).values('user')) |
+            models.Q(pk__in=ProfessionalProfile.objects.filter(hospital_id=hospital_id).values('user'))
+        )
+        user_counts = hospital_users.aggregate(
+            total=models.Count('id'),
+            new_7d=models.Count('id', filter=models.Q(date_joined__gte=last_7d)),
+        )
+        total_users = user_counts['total']
+        new_signups_7d = user_counts['new_7d']
 
         # Filter DDI checks by users from this hospital
-        hospital_user_ids = list(hospital_users.values_list('id', flat=True))
-        user_filter = models.Q(user__in=hospital_user_ids) | models.Q(user__isnull=True)
-
-        ddi_checks_24h = DDICheck.objects.filter(
-            created_at__gte=last_24h
-        ).filter(user_filter).count()
-
-        total_checks_24h = ddi_checks_24h
-        error_checks_24h = DDICheck.objects.filter(
-            created_at__gte=last_24h,
-            status='error'
-        ).filter(user_filter).count()
-        error_rate_24h = (error_checks_24h / total_checks_24h * 100) if total_checks_24h > 0 else 0
-
-        ddi_checks_7d = []
-        for i in range(7):
-            day = last_7d + timedelta(days=i)
-            next_day = day + timedelta(days=1)
-            ddi_checks_7d.append(
-                DDICheck.objects.filter(
-                    created_at__gte=day,
-                    created_at__lt=next_day
-                ).filter(user_filter).count()
+        user_filter = models.Q(user__in=hospital_users.values('pk')) | models.Q(user__isnull=True)
+
+        # Past days whose rollup was computed after the day ended (manage.py ddi_rollup)
+        rolled_up = {}
+        for row in (
+            DailyDDIStats.objects
+            .filter(models.Q(hospital_id=hospital_id) | models.Q(hospital__isnull=True), date__in=days[:-1])
+            .values('date').order_by()
+            .annotate(checks=models.Sum('checks'), computed_at=models.Min('computed_at'))
+        ):
+            if row['computed_at'] >= rollups.day_bounds(row['date'])[1]:
+                rolled_up[row['date']] = row['checks']
+
+        # Everything else in one grouped query over the log
+        live = models.Q(created_at__gte=last_24h)
+        for day in days[:-1]:
+            if day not in rolled_up:
+                start, end = rollups.day_bounds(day)
+                live |= models.Q(created_at__gte=start, created_at__lt=end)
+        per_day = (
+            rollups.counted_checks().filter(live).filter(user_filter)
+            .annotate(day=TruncDate('created_at')).values('day').order_by()
+            .annotate(
+                checks=models.Count('id'),
+                checks_24h=models.Count('id', filter=models.Q(created_at__gte=last_24h)),
+                errors_24h=models.Count('id', filter=models.Q(created_at__gte=last_24h, status='error')),
             )
-
-        recent_users = hospital_users.select_related('admin_profile', 'professional_profile').order_by('-date_joined')[:10]
+        )
+        by_day = {}
+        ddi_checks_24h = error_checks_24h = 0
+        for row in per_day:
+            by_day[row['day']] = row['checks']
+            ddi_checks_24h += row['checks_24h']
+            error_checks_24h += row['errors_24h']
+        ddi_checks_7d = [rolled_up[day] if day in rolled_up else by_day.get(day, 0) for day in days]
+        error_rate_24h = (error_checks_24h / ddi_checks_24h * 100) if ddi_checks_24h > 0 else 0
+
+        # Where check time goes, per stage (ms), over the last 24h's recorded checks
+        stage_rows = DDICheck.objects.filter(
+            created_at__gte=last_24h, timings__isnull=False
+        ).filter(user_filter).order_by('-created_at').values_list('timings', flat=True)[:DASHBOARD_TIMING_ROWS]
+        stage_timings_24h = timing.aggregate(stage_rows)
+
+        recent_users = hospital_users.order_by('-date_joined')[:10]
         users_data = [{
             'id': u.id,
             'email': u.email,
@@ -315,7 +744,7 @@ class AdminDashboardView(APIView):
 
         recent_ddi_checks = DDICheck.objects.select_related('user').filter(
             user_filter
-        ).order_by('-created_at')[:20]
+        ).only('created_at', 'drug1', 'drug2', 'severity', 'status', 'user__email').order_by('-created_at')[:20]
         ddi_checks_data = [{
             'id': c.id,
             'time': c.created_at.isoformat(),
@@ -325,7 +754,7 @@ class AdminDashboardView(APIView):
             'status': c.status,
         } for c in recent_ddi_checks]
 
-        return Response({
+        return {
             'metrics': {
                 'users': total_users,
                 'new_signups_7d': new_signups_7d,
@@ -333,6 +762,7 @@ class AdminDashboardView(APIView):
                 'error_rate_24h': round(error_rate_24h, 1),
             },
             'ddi_checks_7d': ddi_checks_7d,
+            'stage_timings_24h': stage_timings_24h,
             'recent_users': users_data,
             'recent_ddi_checks': ddi_checks_data,
-        })
+        }
@@ -1,11 +1,13 @@
 # notifications/serializers.py
 from rest_framework import serializers
+from DDI_backend_final.listing import SparseFieldsetSerializerMixin
 from .models import Notification
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     is_read = serializers.BooleanField(read_only=True)
 
     class Meta:
         model = Notification
         fields = ["id", "title", "message", "patient_id", "medication_id", "created_at", "read_at", "is_read"]
         read_only_fields = fields
+        deferrable = ["message"]
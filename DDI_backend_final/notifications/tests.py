@@ -1,3 +1,56 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import User
+from .models import Notification
+
+
+class NotificationListingTests(TestCase):
+    """?page_size= / ?cursor= / ?fields= on the notification list."""
+
+    def setUp(self):
+        self.doctor = User.objects.create_user("doctor@example.com", role="DOCTOR")
+        self.client = APIClient()
+
+    def _add_notifications(self, n, recipient=None):
+        for _ in range(n):
+            i = Notification.objects.count()
+            Notification.objects.create(recipient=recipient or self.doctor, title=f"Notice {i}",
+                                        message="A medication was substituted.")
+
+    def _page(self, path):
+        self.client.force_authenticate(User.objects.get(pk=self.doctor.pk))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(queries), 1)
+        return response.data, queries[0]["sql"]
+
+    def test_plain_list_is_unchanged(self):
+        self._add_notifications(3)
+        data, _ = self._page("/api/notifications/")
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[0]["message"], "A medication was substituted.")
+
+    def test_pages_are_stable_under_inserts_and_only_mine(self):
+        self._add_notifications(4)
+        self._add_notifications(1, recipient=User.objects.create_user("other@example.com", role="DOCTOR"))
+        first, _ = self._page("/api/notifications/?page_size=2")
+        self.assertEqual([n["title"] for n in first["results"]], ["Notice 3", "Notice 2"])
+
+        self._add_notifications(1)
+        second, _ = self._page(first["next"])
+        self.assertEqual([n["title"] for n in second["results"]], ["Notice 1", "Notice 0"])
+        self.assertIsNone(second["next"])
+
+    def test_fields_defer_the_message(self):
+        self._add_notifications(2)
+        data, sql = self._page("/api/notifications/?fields=title,is_read")
+        self.assertEqual(set(data[0]), {"id", "title", "is_read"})
+        self.assertNotIn('"message"', sql)
+
+        data, sql = self._page("/api/notifications/?page_size=1&fields=title,message")
+        self.assertEqual([set(n) for n in data["results"]], [{"id", "title", "message"}])
+        self.assertIn('"message"', sql)
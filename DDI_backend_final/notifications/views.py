@@ -2,19 +2,20 @@
 from django.utils import timezone
 from rest_framework import viewsets, permissions, decorators
 from rest_framework.response import Response
+from DDI_backend_final.listing import ListingViewMixin
 from .models import Notification
 from .serializers import NotificationSerializer
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(ListingViewMixin, viewsets.ReadOnlyModelViewSet):
     """
-    GET /api/notifications/         → list my notifications
+    GET /api/notifications/         → list my notifications (?page_size= / ?cursor= / ?fields=)
     POST /api/notifications/{id}/read/ → mark as read
     """
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return self.only_visible(Notification.objects.filter(recipient=self.request.user))
 
     @decorators.action(methods=["post"], detail=True, url_path="read")
     def mark_read(self, request, pk=None):
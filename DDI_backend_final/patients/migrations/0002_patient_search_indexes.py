@@ -0,0 +1,51 @@
+# Indexes for patients/search.py. They depend on the database, so they are
+# built here rather than declared on Patient.Meta.
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import BtreeGinExtension, TrigramExtension
+from django.db import migrations, models
+from django.db.models import F
+from django.db.models.functions import Lower
+
+# (index name, indexed expression)
+SEARCH_COLUMNS = [
+    ('patient_search_name', Lower('full_name')),
+    ('patient_search_pid', Lower('patient_id')),
+    ('patient_search_email', Lower('email')),
+    ('patient_search_phone', F('phone')),
+]
+
+
+def search_indexes(vendor):
+    if vendor == 'postgresql':
+        # trigram GIN serves prefix, word-prefix and fuzzy matching alike;
+        # btree_gin lets hospital_id lead the index
+        return [GinIndex(F('hospital'), OpClass(expr, name='gin_trgm_ops'), name=f'{name}_trgm')
+                for name, expr in SEARCH_COLUMNS]
+    # plain (hospital, expression) btrees: prefix matching through range scans
+    return [models.Index(F('hospital'), expr, name=f'{name}_prefix') for name, expr in SEARCH_COLUMNS]
+
+
+def create_search_indexes(apps, schema_editor):
+    Patient = apps.get_model('patients', 'Patient')
+    for index in search_indexes(schema_editor.connection.vendor):
+        schema_editor.add_index(Patient, index)
+
+
+def drop_search_indexes(apps, schema_editor):
+    Patient = apps.get_model('patients', 'Patient')
+    for index in search_indexes(schema_editor.connection.vendor):
+        schema_editor.remove_index(Patient, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        # no-ops on other databases
+        TrigramExtension(),
+        BtreeGinExtension(),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,89 @@
+# patients/search.py
+"""
+Ranked patient search over full_name, patient_id, phone and email.
+
+The queryset passed in is already scoped to the caller's hospital; the
+indexes from migration 0002 lead with hospital_id for that reason.
+
+PostgreSQL (pg_trgm): prefix of the name, prefix of any word of the name,
+prefix of an identifier, and fuzzy matches (typos, word_similarity), all
+served by the trigram GIN indexes. Other databases (SQLite in development):
+prefix of the name or of an identifier only, each a range scan on a
+(hospital, column) index.
+
+Results are ranked exact identifier > name prefix > word prefix >
+identifier prefix > fuzzy; then by similarity (PostgreSQL), name and id.
+"""
+import os
+
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, QuerySet, Value, When
+from django.db.models.functions import Lower
+
+# -----------------------------------------------------------------------------
+# Config (override via environment variables)
+# -----------------------------------------------------------------------------
+SEARCH_MIN_LENGTH = int(os.getenv("PATIENT_SEARCH_MIN_LENGTH", "2"))
+SEARCH_LIMIT = int(os.getenv("PATIENT_SEARCH_LIMIT", "20"))
+SEARCH_MAX_LIMIT = 100
+
+# rank buckets, best first
+EXACT, NAME_PREFIX, WORD_PREFIX, ID_PREFIX, FUZZY = range(5)
+
+# upper bound of a prefix range: sorts after any string starting with the prefix
+_PREFIX_END = "\U0010ffff"
+
+
+def normalize_query(q: str) -> str:
+    return " ".join(q.strip().lower().split())
+
+
+def search(queryset: QuerySet, q: str, limit: int = SEARCH_LIMIT) -> QuerySet:
+    """The best `limit` matches for q, as a sliced queryset (empty if q is too short)."""
+    q = normalize_query(q)
+    if len(q) < SEARCH_MIN_LENGTH:
+        return queryset.none()
+    # same expressions as the indexes
+    qs = queryset.alias(name_l=Lower("full_name"), pid_l=Lower("patient_id"), email_l=Lower("email"))
+    qs = _trigram(qs, q) if connection.vendor == "postgresql" else _prefix(qs, q)
+    return qs[:limit]
+
+
+def _exact(q: str) -> Q:
+    return Q(pid_l=q) | Q(email_l=q) | Q(phone=q)
+
+
+def _starts(field: str, q: str) -> Q:
+    # a range rather than LIKE: SQLite only uses an index for LIKE on NOCASE columns
+    return Q(**{f"{field}__gte": q, f"{field}__lt": q + _PREFIX_END})
+
+
+def _prefix(qs: QuerySet, q: str) -> QuerySet:
+    rank = Case(
+        When(_exact(q), then=Value(EXACT)),
+        When(_starts("name_l", q), then=Value(NAME_PREFIX)),
+        default=Value(ID_PREFIX),
+        output_field=IntegerField(),
+    )
+    match = _starts("name_l", q) | _starts("pid_l", q) | _starts("email_l", q) | _starts("phone", q)
+    return qs.filter(match).annotate(search_rank=rank).order_by("search_rank", "name_l", "id")
+
+
+def _trigram(qs: QuerySet, q: str) -> QuerySet:
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    ids = Q(pid_l__startswith=q) | Q(email_l__startswith=q) | Q(phone__startswith=q)
+    rank = Case(
+        When(_exact(q), then=Value(EXACT)),
+        When(name_l__startswith=q, then=Value(NAME_PREFIX)),
+        When(name_l__contains=f" {q}", then=Value(WORD_PREFIX)),
+        When(ids, then=Value(ID_PREFIX)),
+        default=Value(FUZZY),
+        output_field=IntegerField(),
+    )
+    match = Q(name_l__startswith=q) | Q(name_l__contains=f" {q}") | Q(name_l__trigram_word_similar=q) | ids
+    return (
+        qs.filter(match)
+        .annotate(search_rank=rank, similarity=TrigramWordSimilarity(q, "name_l"))
+        .order_by("search_rank", "-similarity", "name_l", "id")
+    )
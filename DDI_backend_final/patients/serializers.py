@@ -1,5 +1,6 @@
 # patients/serializers.py
 from rest_framework import serializers
+from DDI_backend_final.listing import SparseFieldsetSerializerMixin
 from .models import Patient
 from prescriptions.models import Medication
 
@@ -27,7 +28,7 @@ class PatientMedicationInlineSerializer(serializers.ModelSerializer):
         )
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     # Add nested list of medications on patient detail
     medications = serializers.SerializerMethodField()
 
@@ -53,13 +54,18 @@ class PatientSerializer(serializers.ModelSerializer):
             "medications",
         )
         read_only_fields = ("patient_id", "hospital")
+        # left out of paginated / fields= responses unless ?expand=medications
+        expandable = ("medications",)
+        # free text, not loaded when fields= leaves it out
+        deferrable = ("allergies", "past_adverse_reactions", "medical_conditions", "genetic_info")
 
     def get_medications(self, obj):
-        qs = (
-            Medication.objects
-            .filter(patient=obj)
-            .order_by("-id")
-        )
+        # PatientViewSet prefetches them newest first; a freshly created or
+        # updated patient has no prefetch and is queried directly
+        if "medications" in getattr(obj, "_prefetched_objects_cache", {}):
+            qs = obj.medications.all()
+        else:
+            qs = obj.medications.order_by("-id")
         return PatientMedicationInlineSerializer(qs, many=True).data
 
     def create(self, validated_data):
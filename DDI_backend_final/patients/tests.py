@@ -1,3 +1,199 @@
+from datetime import date
+from statistics import median
+from time import perf_counter
+from unittest import skipUnless
+
+from django.db import connection
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import Hospital, ProfessionalProfile, User
+from prescriptions.models import Medication
+from .models import Patient
+from .search import search
+
+
+class PatientAPITestCase(TestCase):
+    """A pharmacist at one hospital, and patients to list."""
+
+    def setUp(self):
+        self.hospital = Hospital.objects.create(name="General")
+        self.pharmacist = User.objects.create_user("pharma@example.com", role="PHARMACIST")
+        ProfessionalProfile.objects.create(user=self.pharmacist, first_name="P", last_name="Harm",
+                                           professional_role="PHARMACIST", license_number="1",
+                                           hospital=self.hospital)
+        self.client = APIClient()
+
+    def _login(self):
+        # a fresh user per request, as token auth would load it
+        self.client.force_authenticate(User.objects.get(pk=self.pharmacist.pk))
+
+    def _add_patients(self, n, hospital=None):
+        for _ in range(n):
+            i = Patient.objects.count()
+            patient = Patient.objects.create(full_name=f"Patient {i}", dob=date(1980, 1, 1), gender="Other",
+                                             patient_id=f"P{i:06d}", hospital=hospital or self.hospital)
+            for drug in ("warfarin", "aspirin"):
+                Medication.objects.create(patient=patient, drug_name=drug, dosage="10 mg", frequency="od")
+
+
+class PatientListQueryCountTests(PatientAPITestCase):
+    """Listing patients costs the same few queries however many there are."""
+
+    # professional profile lookup, patients, their medications
+    LIST_QUERIES = 3
+
+    def _list(self, path):
+        self._login()
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_query_count_does_not_grow_with_patients(self):
+        for path in ("/api/patients/", "/api/pharmacist/patients/"):
+            with self.subTest(path=path):
+                Patient.objects.all().delete()
+                self._add_patients(2)
+                self.assertEqual(len(self._list(path)), 2)
+                self._add_patients(25)
+                self.assertEqual(len(self._list(path)), 27)
+
+    def test_medications_newest_first_and_only_own_hospital(self):
+        self._add_patients(1)
+        self._add_patients(1, hospital=Hospital.objects.create(name="Elsewhere"))
+        data = self._list("/api/patients/")
+        self.assertEqual(len(data), 1)
+        self.assertEqual([m["drug_name"] for m in data[0]["medications"]], ["aspirin", "warfarin"])
+
+    def test_retrieve_uses_the_prefetch(self):
+        self._add_patients(1)
+        patient = Patient.objects.get()
+        self._login()
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(f"/api/pharmacist/patient/{patient.pk}/")
+        self.assertEqual(len(response.data["medications"]), 2)
+
+
+class PatientListingTests(PatientAPITestCase):
+    """?page_size= / ?cursor= / ?fields= / ?expand= on the patient list."""
+
+    def _page(self, path, queries):
+        self._login()
+        with self.assertNumQueries(queries):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_are_light_and_stable_under_inserts(self):
+        self._add_patients(5)
+        # professional profile lookup, one page of patients; no medications
+        first = self._page("/api/patients/?page_size=2", 2)
+        self.assertEqual([p["full_name"] for p in first["results"]], ["Patient 4", "Patient 3"])
+        self.assertNotIn("medications", first["results"][0])
+        self.assertIn("allergies", first["results"][0])
+
+        self._add_patients(1)
+        second = self._page(first["next"], 2)
+        self.assertEqual([p["full_name"] for p in second["results"]], ["Patient 2", "Patient 1"])
+
+    def test_fields_and_expand(self):
+        self._add_patients(2)
+        data = self._page("/api/patients/?fields=full_name,dob", 2)
+        self.assertEqual(set(data[0]), {"id", "full_name", "dob"})
+
+        data = self._page("/api/patients/?page_size=10&fields=full_name&expand=medications", 3)
+        self.assertEqual(set(data["results"][0]), {"id", "full_name", "medications"})
+        self.assertEqual(len(data["results"][0]["medications"]), 2)
+
+
+class PatientSearchTestCase(PatientAPITestCase):
+
+    def _patient(self, full_name, patient_id, hospital=None, **extra):
+        return Patient.objects.create(full_name=full_name, dob=date(1980, 1, 1), gender="Other",
+                                      patient_id=patient_id, hospital=hospital or self.hospital, **extra)
+
+    def _search(self, query):
+        self._login()
+        response = self.client.get(f"/api/patients/search/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def _many_patients(self, n, hospitals):
+        """n patients with common names and identifiers, spread over the hospitals, then ANALYZE."""
+        first = ["Ama", "Yaw", "Akosua", "Kwame", "Abena", "Kojo", "Efua", "Kwaku"]
+        last = ["Owusu", "Boateng", "Asante", "Osei", "Annan", "Appiah", "Addo", "Darko"]
+        Patient.objects.bulk_create([
+            Patient(full_name=f"{first[i % 8]} {last[i // 8 % 8]}", dob=date(1980, 1, 1), gender="Other",
+                    patient_id=f"X{i:07d}", phone=f"020{i:07d}", email=f"p{i}@example.com",
+                    hospital=hospitals[i % len(hospitals)])
+            for i in range(n)
+        ], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+class PatientSearchTests(PatientSearchTestCase):
+    """GET /api/patients/search/ (on any database)."""
+
+    def test_ranked_prefix_matches_in_own_hospital(self):
+        self._patient("Kofi Mensah", "KO0000001", email="kofi@example.com")
+        self._patient("Ama Owusu", "KOFI000002")
+        self._patient("kofi Annan", "A000000003")
+        self._patient("Kofi Boateng", "A000000004", hospital=Hospital.objects.create(name="Elsewhere"))
+        self._patient("Yaw Osei", "KOFI")
+
+        data = self._search("q=KOFI")
+        # exact identifier, then name prefixes by name, then identifier prefixes
+        self.assertEqual([p["full_name"] for p in data], ["Yaw Osei", "kofi Annan", "Kofi Mensah", "Ama Owusu"])
+        self.assertNotIn("medications", data[0])
+
+        self.assertEqual([p["full_name"] for p in self._search("q=kofi%40ex")], ["Kofi Mensah"])
+        self.assertEqual(len(self._search("q=kofi&limit=2")), 2)
+        self.assertEqual(self._search("q=k"), [])
+
+    def test_expand_medications(self):
+        self._add_patients(1)
+        data = self._search("q=patient&expand=medications")
+        self.assertEqual(len(data[0]["medications"]), 2)
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite prefix indexes")
+class PatientPrefixSearchPlanTests(PatientSearchTestCase):
+
+    def test_every_branch_is_an_index_range_scan(self):
+        self._many_patients(2000, [self.hospital, Hospital.objects.create(name="Elsewhere")])
+        plan = search(Patient.objects.filter(hospital=self.hospital), "kofi").explain()
+        for index in ("name", "pid", "email", "phone"):
+            self.assertIn(f"USING INDEX patient_search_{index}_prefix (hospital_id=?", plan)
+        self.assertNotIn("SCAN patients_patient", plan)
+
+
+@skipUnless(connection.vendor == "postgresql",
+            "trigram search: run with DATABASE_URL=postgres://... python manage.py test patients")
+class PatientTrigramSearchTests(PatientSearchTestCase):
+    """The PostgreSQL path: word prefixes, typos, the GIN indexes and the 50 ms target."""
+
+    def test_word_prefix_and_typos(self):
+        self._patient("Kofi Mensah", "A000000001")
+        self._patient("Ama Owusu", "A000000002")
+        self._patient("Mensah Kofi", "A000000003")
+        # name prefix before a later word's prefix
+        self.assertEqual([p["full_name"] for p in self._search("q=mens")], ["Mensah Kofi", "Kofi Mensah"])
+        # one letter too many
+        self.assertEqual([p["full_name"] for p in self._search("q=owwusu")], ["Ama Owusu"])
+
+    def test_trigram_indexes_serve_the_search_in_under_50ms(self):
+        self._many_patients(50000, [self.hospital, Hospital.objects.create(name="Elsewhere")])
+        self._patient("Kofi Mensah", "A000000001")
+        qs = search(Patient.objects.filter(hospital=self.hospital), "mensah")
+        plan = qs.explain()
+        self.assertIn("patient_search_name_trgm", plan)
+        self.assertNotIn("Seq Scan", plan)
 
-# Create your tests here.
+        timings = []
+        for _ in range(10):
+            started = perf_counter()
+            self.assertEqual([p.full_name for p in qs.all()], ["Kofi Mensah"])
+            timings.append(perf_counter() - started)
+        self.assertLess(median(timings), 0.05)
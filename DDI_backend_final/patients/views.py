@@ -1,12 +1,19 @@
 # patients/views.py
+from django.db.models import Prefetch
 from rest_framework import viewsets
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from accounts.permissions import IsAdmin, IsDoctorOrPharmacist
+from DDI_backend_final.listing import ListingViewMixin
+from .search import SEARCH_LIMIT, SEARCH_MAX_LIMIT, search as search_patients
 from .models import Patient
 from .serializers import PatientSerializer
+from prescriptions.models import Medication
 
-class PatientViewSet(viewsets.ModelViewSet):
+class PatientViewSet(ListingViewMixin, viewsets.ModelViewSet):
     serializer_class = PatientSerializer
+    lightweight_actions = ("search",)
 
     def get_permissions(self):
         """
@@ -21,11 +28,34 @@ class PatientViewSet(viewsets.ModelViewSet):
         return [permission() for permission in permission_classes]
 
     def get_queryset(self):
+        qs = self.only_visible(self._hospital_patients())
+        if not self.includes("medications"):
+            return qs
+        # Medications for every listed patient in one extra query, newest first
+        # (PatientSerializer.get_medications reads them from the prefetch)
+        return qs.prefetch_related(
+            Prefetch("medications", queryset=Medication.objects.order_by("-id"))
+        )
+
+    @action(detail=False, methods=["get"], url_path="search")
+    def search(self, request):
+        """
+        GET /api/patients/search/?q=smi&limit=20 → best matches in my hospital, ranked
+        (no medications unless ?expand=medications)
+        """
+        try:
+            limit = min(max(int(request.query_params.get("limit", SEARCH_LIMIT)), 1), SEARCH_MAX_LIMIT)
+        except ValueError:
+            limit = SEARCH_LIMIT
+        patients = search_patients(self.get_queryset(), request.query_params.get("q", ""), limit)
+        return Response(self.get_serializer(patients, many=True).data)
+
+    def _hospital_patients(self):
         user = self.request.user
         if hasattr(user, "professional_profile"):
-            return Patient.objects.filter(hospital=user.professional_profile.hospital)
+            return Patient.objects.filter(hospital_id=user.professional_profile.hospital_id)
         if hasattr(user, "admin_profile"):
-            return Patient.objects.filter(hospital=user.admin_profile.hospital)
+            return Patient.objects.filter(hospital_id=user.admin_profile.hospital_id)
         if user.is_superuser:
             return Patient.objects.all()
         return Patient.objects.none()
@@ -1,8 +1,9 @@
 # prescriptions/serializers.py
 from rest_framework import serializers
+from DDI_backend_final.listing import SparseFieldsetSerializerMixin
 from .models import Medication
 
-class MedicationSerializer(serializers.ModelSerializer):
+class MedicationSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Medication
         fields = (
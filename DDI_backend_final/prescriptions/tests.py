@@ -1,3 +1,70 @@
+from datetime import date
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from accounts.models import Hospital, ProfessionalProfile, User
+from patients.models import Patient
+from .models import Medication
+
+
+class MedicationListingTests(TestCase):
+    """?page_size= / ?cursor= / ?fields= on the medication list."""
+
+    # professional profile lookup, its hospital, one page of medications
+    LIST_QUERIES = 3
+
+    def setUp(self):
+        self.hospital = Hospital.objects.create(name="General")
+        self.pharmacist = User.objects.create_user("pharma@example.com", role="PHARMACIST")
+        ProfessionalProfile.objects.create(user=self.pharmacist, first_name="P", last_name="Harm",
+                                           professional_role="PHARMACIST", license_number="1",
+                                           hospital=self.hospital)
+        self.patient = self._patient("P000001", self.hospital)
+        self.client = APIClient()
+
+    def _patient(self, patient_id, hospital):
+        return Patient.objects.create(full_name=f"Patient {patient_id}", dob=date(1980, 1, 1), gender="Other",
+                                      patient_id=patient_id, hospital=hospital)
+
+    def _add_medications(self, n, patient=None):
+        for _ in range(n):
+            i = Medication.objects.count()
+            Medication.objects.create(patient=patient or self.patient, drug_name=f"drug {i}",
+                                      dosage="10 mg", frequency="od")
+
+    def _page(self, path):
+        # a fresh user per request, as token auth would load it
+        self.client.force_authenticate(User.objects.get(pk=self.pharmacist.pk))
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_plain_list_is_unchanged(self):
+        self._add_medications(3)
+        data = self._page("/api/medications/")
+        self.assertEqual(len(data), 3)
+        self.assertIn("prescribed_by", data[0])
+
+    def test_pages_are_stable_under_inserts_and_only_own_hospital(self):
+        self._add_medications(5)
+        self._add_medications(1, patient=self._patient("P000002", Hospital.objects.create(name="Elsewhere")))
+        first = self._page("/api/medications/?page_size=2")
+        self.assertEqual([m["drug_name"] for m in first["results"]], ["drug 4", "drug 3"])
+
+        self._add_medications(1)
+        second = self._page(first["next"])
+        self.assertEqual([m["drug_name"] for m in second["results"]], ["drug 2", "drug 1"])
+        third = self._page(second["next"])
+        self.assertEqual([m["drug_name"] for m in third["results"]], ["drug 0"])
+        self.assertIsNone(third["next"])
+
+    def test_fields(self):
+        self._add_medications(2)
+        data = self._page("/api/medications/?fields=drug_name,dosage")
+        self.assertEqual(set(data[0]), {"id", "drug_name", "dosage"})
 
-# Create your tests here.
+        data = self._page("/api/medications/?page_size=1&fields=drug_name")
+        self.assertEqual([set(m) for m in data["results"]], [{"id", "drug_name"}])
+        self.assertIsNotNone(data["next"])
@@ -6,6 +6,7 @@ from django.conf import settings
 
 from accounts.permissions import IsDoctorOrPharmacist
 from accounts.models import Roles
+from DDI_backend_final.listing import ListingViewMixin
 from .models import Medication
 from .serializers import MedicationSerializer
 
@@ -13,7 +14,7 @@ from .serializers import MedicationSerializer
 from notifications.models import Notification
 
 
-class MedicationViewSet(viewsets.ModelViewSet):
+class MedicationViewSet(ListingViewMixin, viewsets.ModelViewSet):
     serializer_class = MedicationSerializer
     permission_classes = [IsAuthenticated, IsDoctorOrPharmacist]
 